@@ -1,36 +1,93 @@
 # backend/main.py
 
 import json
-import re
-from pathlib import Path
+import logging
+from contextlib import asynccontextmanager
 import asyncio
 import os
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Literal, Optional
 import uvicorn
 
-import anthropic  # Anthropic SDK
-
 # import our helper modules
-from scraper import scrape_website
-from filter_css import filter_css_from_html_and_css
-from recreate_site import (
-    build_summary_and_minimal_html,
-    build_critical_css,
-    format_prompt
+import llm
+from jobs import TERMINAL, Job, QueueFull, get_job_manager
+from batch import (
+    BATCH_BROWSER_CONCURRENCY,
+    BATCH_CONCURRENCY,
+    BATCH_CSS_CONCURRENCY,
+    BATCH_LLM_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    cancel_batches,
+    get_batch,
+    start_batch,
+)
+from http_client import close_session
+from browser_pool import close_browser_pool, get_browser_pool
+from cpu_pool import close_cpu_pool, get_cpu_pool
+from screenshots import flush_screenshots
+from http_cache import get_http_cache
+from html_parsers import get_parser
+from generation_cache import get_generation_cache
+from artifacts import get_artifact_store
+from assets import asset_stats
+from log import setup_logging
+from metrics import STAGE_SECONDS, render_prometheus
+from output import (
+    OUTPUT_COMPRESS_MIN_BYTES,
+    body_etag,
+    encoded_bodies,
+    etag_matches,
+    negotiate_encoding,
+    shape_result,
 )
-from inline_css import inline_css
+from summarize_utils import close_summarizer_pool, summary_cache
 
 
 load_dotenv()
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-connect the warm browsers before the first request arrives
+    try:
+        await get_browser_pool().start()
+    except Exception as e:
+        logger.warning("Browser pool warm-up failed: %s", e)
+    try:
+        await get_cpu_pool().start()
+    except Exception as e:
+        logger.warning("CPU pool warm-up failed: %s", e)
+    try:
+        await get_artifact_store().sweep()   # also counts the job directories for /health
+    except Exception as e:
+        logger.warning("Artifact sweep failed: %s", e)
+    get_job_manager().start()
+    yield
+    # Shared resources live across requests; release them on shutdown
+    await get_job_manager().stop()
+    await cancel_batches()
+    await flush_screenshots()
+    await close_browser_pool()
+    await close_session()
+    await llm.close_client()
+    close_summarizer_pool()
+    close_cpu_pool()
+
 
 app = FastAPI(
     title="Orchids Challenge API",
     description="Backend with a /generate endpoint that reuses scraper, filter_css, recreate_site, inline_css",
     version="1.2.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -44,94 +101,189 @@ app.add_middleware(
 
 class URLSubmit(BaseModel):
     url: HttpUrl
+    bypass_cache: bool = False   # force a fresh generation (the result is still cached)
+
+
+# Response shape: combined_html + html + css, the preview page only, or the parts only
+ResponseShape = Literal["full", "combined", "parts"]
+
+
+def encoded_json(request: Request, data: dict, conditional: bool = False) -> Response:
+    """
+    Compact JSON with a weak ETag, gzip/brotli-encoded when the client
+    accepts it and the body is worth it. With `conditional` (GET routes),
+    a matching If-None-Match gets an empty 304.
+    """
+    body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    etag = body_etag(body)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if conditional and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= OUTPUT_COMPRESS_MIN_BYTES:
+        body = encoded_bodies.get(body, etag, encoding)   # memoized; bodies are small
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @app.post("/generate")
-async def generate(payload: URLSubmit):
+async def generate(payload: URLSubmit, request: Request, shape: ResponseShape = "full"):
     """
     1) Scrape the given URL (full HTML + raw CSS)
-    2) Save raw context to generated/context.json
+    2) Save raw context (compressed) to the job's artifact directory
     3) Filter CSS to include only selectors present in HTML
     4) Build summary + minimal HTML snippet
     5) Build critical CSS from filtered CSS
     6) Format an Anthropic prompt
     7) Send prompt to Claude → receive two code fences: ```html``` + ```css```
-    8) Extract those fences, inline CSS into HTML, and write generated files
-    9) Return JSON { combined_html, html, css } to the caller
+    8) Extract those fences, prune unused CSS, minify both and inline the CSS
+       into the preview page (combined_html), and write them as job artifacts
+    9) Return JSON { combined_html, html, css } to the caller (`shape`
+       picks the fields), compressed when the client accepts it
+    Steps 2–8 are skipped when the generation cache has a result for the
+    scrape or the prompt input (unless `bypass_cache` is set). The run goes
+    through the job workers, so it shares their concurrency limit.
     """
-    url = str(payload.url)
+    job = submit_job(payload)
+    await job.wait()
+    return job_result_response(job, request, shape)
 
-    # ─── 1) Scrape ─────────────────────────────
+
+def job_result_response(job: Job, request: Request, shape: ResponseShape, conditional: bool = False) -> Response:
+    if job.status != "succeeded":
+        raise HTTPException(status_code=job.status_code or 500, detail=job.error or f"Job {job.status}")
+    return encoded_json(request, shape_result(job.result, shape), conditional)
+
+
+def submit_job(payload: URLSubmit) -> Job:
     try:
-        context = await scrape_website(url)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Scraping failed: {e}")
+        job, _ = get_job_manager().submit(str(payload.url), payload.bypass_cache)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Too many pending jobs: {e}", headers={"Retry-After": "30"})
+    return job
 
-    context_dict = context.model_dump()  # dict with keys: title, images, summary, css_contents, html, …
 
-    # Create “generated” folder if not already present
-    gen_dir = Path("generated")
-    gen_dir.mkdir(exist_ok=True)
+@app.post("/jobs", status_code=202)
+async def create_job(payload: URLSubmit):
+    """Queue a generation and return its id immediately (identical in-flight URLs share a job)."""
+    return submit_job(payload).snapshot()
 
-    # ─── 2) Save raw context.json ─────────────────────────────
-    Path(gen_dir / "context.json").write_text(
-        json.dumps(context_dict, indent=2, default=str)
-    )
 
-    # ─── 3) Filter CSS ─────────────────────────────
-    full_html = context_dict.get("html", "")
-    raw_css = context_dict.get("css_contents", "")
-    filtered_css = filter_css_from_html_and_css(full_html, raw_css)
+def get_job_or_404(job_id: str) -> Job:
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-    # ─── 4) Build summary + minimal HTML snippet ─────────────────────────────
-    summary_json_obj, minimal_html = build_summary_and_minimal_html(context_dict)
 
-    # ─── 5) Build critical CSS from filtered CSS ─────────────────────────────
-    critical_css = build_critical_css(filtered_css)
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    return get_job_or_404(job_id).snapshot()
 
-    # ─── 6) Format prompt for Claude ─────────────────────────────
-    prompt = format_prompt(summary_json_obj, minimal_html, critical_css)
 
-    # ─── 7) Send prompt to Claude ─────────────────────────────
-    client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=4096,
+@app.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str, request: Request, shape: ResponseShape = "full"):
+    """A finished job's result, as /generate returns it; revalidate with If-None-Match."""
+    job = get_job_or_404(job_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job_result_response(job, request, shape, conditional=True)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    get_job_or_404(job_id)
+    return get_job_manager().cancel(job_id).snapshot()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """SSE progress stream: one `progress` event per stage change, ending with the final state."""
+    job = get_job_or_404(job_id)
+
+    async def events():
+        async for snapshot in job.events():
+            yield sse_event("progress", snapshot)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # ─── 8) Extract raw Claude output, then pull out HTML/CSS fences ─────────────────────────────
-    raw_output = "".join(part.text for part in response.content if hasattr(part, "text"))
-
-    def extract_code(block_type: str, text: str) -> str:
-        fence_pattern = rf"```{block_type}\s*(.*?)\s*```"
-        match = re.search(fence_pattern, text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        if block_type == "css":
-            start_pattern = r"```css\s*(.*)$"
-            match2 = re.search(start_pattern, text, re.DOTALL)
-            if match2:
-                return match2.group(1).strip()
-        return ""
-
-    html_generated = extract_code("html", raw_output)
-    css_generated = extract_code("css", raw_output)
-
-    # ─── 9) Inline CSS into the generated HTML ─────────────────────────────
-    combined_html = inline_css(html_generated, css_generated)
-
-    # Write files into “generated/”
-    Path(gen_dir / "recreated_page.html").write_text(html_generated)
-    Path(gen_dir / "styles.css").write_text(css_generated)
-    Path(gen_dir / "recreated_combined.html").write_text(combined_html)
-
-    # ─── 10) Return JSON for your React frontend ─────────────────────────────
-    return {
-        "combined_html": combined_html,
-        "html": html_generated,
-        "css": css_generated,
-    }
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class BatchSubmit(BaseModel):
+    urls: List[HttpUrl] = Field(min_length=1)
+    name: Optional[str] = None     # re-submit with the same name to resume
+    bypass_cache: bool = False
+    concurrency: int = Field(BATCH_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    browser_concurrency: int = Field(BATCH_BROWSER_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    css_concurrency: int = Field(BATCH_CSS_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    llm_concurrency: int = Field(BATCH_LLM_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+
+
+@app.post("/batch", status_code=202)
+async def create_batch(payload: BatchSubmit):
+    """
+    Recreate many URLs in the background. Per-URL output and a streamed
+    results.jsonl land in BATCH_DIR/<id>/ (backend/generated/batches by
+    default); URLs that already succeeded under the same `name` are skipped.
+    """
+    urls = list(dict.fromkeys(str(u) for u in payload.urls))
+    try:
+        batch = start_batch(
+            urls,
+            name=payload.name,
+            bypass_cache=payload.bypass_cache,
+            concurrency=payload.concurrency,
+            browser_concurrency=payload.browser_concurrency,
+            css_concurrency=payload.css_concurrency,
+            llm_concurrency=payload.llm_concurrency,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return batch.snapshot()
+
+
+@app.get("/batch/{batch_id}")
+async def read_batch(batch_id: str):
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch.snapshot()
+
+
+@app.post("/generate/stream")
+async def generate_stream(payload: URLSubmit, shape: ResponseShape = "full"):
+    """
+    Streaming variant of /generate (Server-Sent Events), run as a job like
+    /generate (same workers, 429 when the queue is full, identical URLs
+    joined). Emits `progress` events, `html` / `css` events with fence-body
+    chunks as the model writes them, then a final `done` event carrying
+    the same JSON as /generate (or `error`).
+    """
+    job = submit_job(payload)
+
+    async def events():
+        async for event, data in job.stream_events():
+            if event != "progress":
+                yield sse_event(event, data)
+            elif data["status"] == "succeeded":
+                yield sse_event("done", shape_result(data["result"], shape))
+            elif data["status"] in TERMINAL:
+                yield sse_event("error", {"detail": data["error"] or f"Job {data['status']}"})
+            else:
+                yield sse_event("progress", data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/")
@@ -141,7 +293,28 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "orchids-challenge-api"}
+    cache = get_http_cache()
+    return {
+        "status": "healthy",
+        "service": "orchids-challenge-api",
+        "http_cache": cache.stats.as_dict() if cache else None,
+        "browser_pool": get_browser_pool().stats(),
+        "cpu_pool": get_cpu_pool().stats(),
+        "generation_cache": get_generation_cache().stats(),
+        "artifacts": get_artifact_store().stats(),
+        "stages": STAGE_SECONDS.summary(),
+        "jobs": get_job_manager().stats(),
+        "summaries": summary_cache.stats(),
+        "html_parser": get_parser().name,
+        "encoded_responses": encoded_bodies.stats(),
+        "assets": asset_stats.as_dict(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timings, payload sizes and LLM token counts as Prometheus histograms."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
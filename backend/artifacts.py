@@ -0,0 +1,226 @@
+# backend/artifacts.py
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional, Set
+
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = Path(os.getenv("ARTIFACTS_DIR", Path(__file__).parent / "generated" / "artifacts"))
+ARTIFACT_COMPRESSION = os.getenv("ARTIFACT_COMPRESSION", "auto")          # auto | zstd | gzip | none
+ARTIFACT_RETENTION = float(os.getenv("ARTIFACT_RETENTION", str(24 * 3600)))  # seconds
+ARTIFACT_MAX_JOBS = int(os.getenv("ARTIFACT_MAX_JOBS", "200"))
+ARTIFACT_GC_INTERVAL = float(os.getenv("ARTIFACT_GC_INTERVAL", "300"))     # seconds between sweeps
+
+SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+
+def resolve_codec(codec: str = ARTIFACT_COMPRESSION) -> str:
+    """Map "auto" to zstd when the zstandard package is installed, else gzip."""
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if codec == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed; compressing artifacts with gzip")
+        return "gzip"
+    if codec not in SUFFIXES:
+        raise ValueError(f"Unknown artifact compression: {codec}")
+    return codec
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write to a temp file in the same directory, then rename over `path`."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class JobArtifacts:
+    """
+    The files of one job, all under `directory`. Every write happens in a
+    worker thread (serialization and compression included) and lands
+    atomically, so readers never see a half-written file and concurrent
+    jobs never share a path.
+    """
+
+    def __init__(self, directory: Path, codec: str = ARTIFACT_COMPRESSION,
+                 on_close: Optional[Callable[[], None]] = None):
+        self.directory = Path(directory)
+        self.codec = resolve_codec(codec)
+        self._on_close = on_close
+
+    def close(self) -> None:
+        """The job is done writing; its directory may be swept from now on."""
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    async def write_bytes(self, name: str, data: bytes) -> Path:
+        path = self.path(name)
+        await asyncio.to_thread(_atomic_write, path, data)
+        return path
+
+    async def write_text(self, name: str, text: str) -> Path:
+        path = self.path(name)
+        await asyncio.to_thread(lambda: _atomic_write(path, text.encode("utf-8")))   # encoded off the loop too
+        return path
+
+    async def write_json(self, name: str, data: Any, compressed: bool = False) -> Path:
+        """
+        Compact JSON; with `compressed`, encoded with the store's codec and
+        saved as e.g. `context.json.zst`.
+        """
+        codec = self.codec if compressed else "none"
+        path = self.path(name + SUFFIXES[codec])
+
+        def encode_and_write() -> None:
+            raw = json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+            _atomic_write(path, compress(raw, codec))
+
+        await asyncio.to_thread(encode_and_write)
+        return path
+
+    def read_json(self, name: str) -> Optional[Any]:
+        """Read `name` back in whichever encoding it was written."""
+        for codec, suffix in SUFFIXES.items():
+            path = self.path(name + suffix)
+            if path.exists():
+                return json.loads(decompress(path.read_bytes(), codec))
+        return None
+
+
+class ArtifactStore:
+    """
+    One directory per job id under `root`. Job directories older than
+    `retention` seconds are removed, and beyond `max_jobs` the oldest go
+    first; sweeps run off the event loop at most every `gc_interval`.
+    Directories opened and not yet closed (running jobs) are never swept.
+    """
+
+    def __init__(
+        self,
+        root: Path = ARTIFACTS_DIR,
+        retention: float = ARTIFACT_RETENTION,
+        max_jobs: int = ARTIFACT_MAX_JOBS,
+        gc_interval: float = ARTIFACT_GC_INTERVAL,
+        codec: str = ARTIFACT_COMPRESSION,
+    ):
+        self.root = Path(root)
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self.gc_interval = gc_interval
+        self.codec = resolve_codec(codec)
+        self.removed = 0
+        self.jobs: Optional[int] = None   # as of the last sweep, plus jobs opened since
+        self._active: Set[str] = set()
+        self._last_gc = 0.0
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    async def open(self, job_id: str) -> JobArtifacts:
+        """
+        Create the job's directory, sweeping old jobs first when due. The
+        directory is kept by sweeps until the returned JobArtifacts is closed.
+        """
+        self._active.add(job_id)
+        if time.monotonic() - self._last_gc >= self.gc_interval:
+            await self.sweep()
+        directory = self.job_dir(job_id)
+
+        def create() -> bool:
+            if directory.is_dir():
+                return False
+            directory.mkdir(parents=True, exist_ok=True)
+            return True
+
+        try:
+            created = await asyncio.to_thread(create)
+        except BaseException:
+            self._active.discard(job_id)
+            raise
+        if created and self.jobs is not None:
+            self.jobs += 1
+        return JobArtifacts(directory, self.codec, on_close=lambda: self._active.discard(job_id))
+
+    async def sweep(self) -> int:
+        """Run `gc` off the event loop now."""
+        self._last_gc = time.monotonic()
+        return await asyncio.to_thread(self.gc)
+
+    def gc(self) -> int:
+        """Delete expired and surplus job directories; returns how many were removed."""
+        if not self.root.exists():
+            self.jobs = 0
+            return 0
+        active = set(self._active)
+        jobs = sorted(
+            ((p, p.stat().st_mtime) for p in self.root.iterdir() if p.is_dir()),
+            key=lambda job: job[1],
+            reverse=True,
+        )
+        cutoff = time.time() - self.retention
+        # Running jobs are kept, and count toward max_jobs, so older ones go first
+        doomed = [p for i, (p, mtime) in enumerate(jobs)
+                  if p.name not in active and (i >= self.max_jobs or mtime < cutoff)]
+        for path in doomed:
+            shutil.rmtree(path, ignore_errors=True)
+        self.removed += len(doomed)
+        self.jobs = len(jobs) - len(doomed)
+        if doomed:
+            logger.info("Artifact store: removed %d old job directories", len(doomed))
+        return len(doomed)
+
+    def stats(self) -> dict:
+        """Counters only; nothing here touches the disk (it is served from /health)."""
+        return {"jobs": self.jobs, "active": len(self._active), "removed": self.removed, "codec": self.codec}
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
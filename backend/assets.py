@@ -0,0 +1,485 @@
+# backend/assets.py
+#
+# The asset stage: downloads the images a generated page references,
+# stores each distinct image once (downscaled and recompressed when Pillow
+# is installed) under the job's `assets/` directory and points the page's
+# <img>/<source> src and srcset and CSS url() references at those local
+# copies. Off unless ASSETS_ENABLED=1.
+#
+#   cd backend
+#   python assets.py generated/artifacts/<job> --base-url https://example.com/
+
+import argparse
+import asyncio
+import hashlib
+import html as html_lib
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from dotenv import load_dotenv
+
+from artifacts import JobArtifacts, _atomic_write
+from cpu_pool import get_cpu_pool
+from http_cache import get_http_cache
+from http_client import close_session, get_session
+from log import setup_logging
+from metrics import observe_bytes, observe_stage
+
+try:
+    from PIL import Image
+except ImportError:  # optional; images are kept as downloaded
+    Image = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ASSETS_ENABLED = os.getenv("ASSETS_ENABLED", "0") not in ("0", "false", "False")
+ASSET_CONCURRENCY = int(os.getenv("ASSET_CONCURRENCY", "8"))
+ASSET_FETCH_TIMEOUT = float(os.getenv("ASSET_FETCH_TIMEOUT", "10"))   # seconds per image
+ASSET_BUDGET = float(os.getenv("ASSET_BUDGET", "20"))                 # seconds for the whole page
+ASSET_MAX_IMAGES = int(os.getenv("ASSET_MAX_IMAGES", "100"))          # per page
+ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", str(10 * 1024 * 1024)))   # larger downloads are skipped
+ASSET_MAX_DIMENSION = int(os.getenv("ASSET_MAX_DIMENSION", "1920"))   # px, width and height
+ASSET_FORMAT = os.getenv("ASSET_FORMAT", "webp")                      # webp | jpeg | png
+ASSET_QUALITY = int(os.getenv("ASSET_QUALITY", "80"))                 # jpeg/webp, 1-100
+ASSET_CACHE_DIR = Path(os.getenv("ASSET_CACHE_DIR", Path(__file__).parent / "generated" / "asset_cache"))
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+ASSET_DIR = "assets"   # inside the job directory
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "webp": "webp", "avif": "avif",
+              "svg": "svg", "ico": "ico", "bmp": "bmp"}
+PIL_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+# Formats Pillow decodes that are worth re-encoding (SVG and AVIF are kept)
+RECOMPRESSIBLE = {"jpeg", "png", "gif", "webp", "bmp"}
+
+_IMG_TAG = re.compile(r"<(?:img|source)\b[^>]*>", re.IGNORECASE)
+_SRC_ATTR = re.compile(r"""(\ssrc\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+_SRCSET_ATTR = re.compile(r"""(\ssrcset\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+# One srcset candidate: URL, optional width/density descriptor
+_SRCSET_CANDIDATE = re.compile(r"\s*([^\s,][^\s]*?)(\s+[^,]*)?\s*(?:,|$)")
+_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", re.IGNORECASE)
+
+
+# ───────────────────────────── References ─────────────────────────────
+
+def resolve_ref(ref: str, base_url: str) -> Optional[str]:
+    """The absolute http(s) URL a src/url() value points at, or None (data:, fragments, …)."""
+    ref = html_lib.unescape(ref).strip()
+    if not ref or ref.startswith(("data:", "blob:", "#")):
+        return None
+    absolute = urljoin(base_url, ref)
+    return absolute if urlsplit(absolute).scheme in ("http", "https") else None
+
+
+def _src_value(match: re.Match) -> str:
+    return next(g for g in match.groups()[1:] if g is not None)
+
+
+def _srcset_urls(srcset: str) -> List[str]:
+    return [m.group(1).rstrip(",") for m in _SRCSET_CANDIDATE.finditer(srcset) if m.group(1)]
+
+
+def referenced_images(page: str, base_url: str) -> List[str]:
+    """Absolute URLs of <img>/<source> src and srcset and CSS url() references in `page`, in order."""
+    refs = []
+    for tag in _IMG_TAG.finditer(page):
+        src = _SRC_ATTR.search(tag.group())
+        if src:
+            refs.append(_src_value(src))
+        srcset = _SRCSET_ATTR.search(tag.group())
+        if srcset:
+            refs.extend(_srcset_urls(_src_value(srcset)))
+    refs.extend(m.group(2) for m in _URL_RE.finditer(page))
+    return list(dict.fromkeys(u for u in (resolve_ref(r, base_url) for r in refs) if u))
+
+
+def rewrite_references(page: str, base_url: str, local: Dict[str, str]) -> str:
+    """`page` with every src, srcset candidate and url() found in `local` (absolute URL → path) replaced."""
+    def src(m: re.Match) -> str:
+        url = resolve_ref(_src_value(m), base_url)
+        return f'{m.group(1)}"{local[url]}"' if url in local else m.group()
+
+    def candidate(m: re.Match) -> str:
+        ref = m.group(1).rstrip(",")
+        url = resolve_ref(ref, base_url)
+        return m.group().replace(ref, local[url], 1) if url in local else m.group()
+
+    def srcset(m: re.Match) -> str:
+        return f'{m.group(1)}"{_SRCSET_CANDIDATE.sub(candidate, _src_value(m))}"'
+
+    def img(tag: re.Match) -> str:
+        return _SRCSET_ATTR.sub(srcset, _SRC_ATTR.sub(src, tag.group(), count=1), count=1)
+
+    def css_url(m: re.Match) -> str:
+        url = resolve_ref(m.group(2), base_url)
+        return f'url("{local[url]}")' if url in local else m.group()
+
+    return _URL_RE.sub(css_url, _IMG_TAG.sub(img, page))
+
+
+def collect_image_urls(context: dict) -> List[str]:
+    """
+    Image URLs of a scraped page, likeliest to be used first: the detailed
+    images (the hero comes first), testimonial avatars, then every <img>.
+    """
+    base_url = str(context.get("url") or "")
+    summary = context.get("summary") or {}
+    refs = [i.get("src") for i in summary.get("images_detailed") or []]
+    refs += [t.get("avatar") for t in summary.get("testimonials") or []]
+    refs += context.get("images") or []
+    urls = (resolve_ref(r, base_url) for r in refs if isinstance(r, str))
+    return list(dict.fromkeys(u for u in urls if u))
+
+
+# ───────────────────────────── Images ─────────────────────────────
+
+def sniff_image(data: bytes, content_type: str = "") -> Optional[str]:
+    """The image format of `data` from its magic bytes, or None when it is not an image."""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    if data.startswith(b"BM"):
+        return "bmp"
+    head = data[:2048].lstrip().lower()
+    if "svg" in content_type.lower() or head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "svg"
+    return None
+
+
+def resolve_format(fmt: str) -> str:
+    if fmt not in PIL_FORMATS:
+        raise ValueError(f"Unknown asset format: {fmt}")
+    return fmt
+
+
+def optimize_image(data: bytes, kind: str, fmt: str, quality: int, max_dimension: int) -> Tuple[bytes, str]:
+    """
+    `data` downscaled to fit `max_dimension` and re-encoded as `fmt`, with
+    its format; the original when Pillow is missing, the image cannot be
+    decoded or is animated, or re-encoding would not make it smaller.
+    Module-level so it can run in the CPU pool.
+    """
+    if Image is None or kind not in RECOMPRESSIBLE:
+        return data, kind
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if getattr(image, "is_animated", False):
+                return data, kind
+            resized = max(image.size) > max_dimension
+            if resized:
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            target = "png" if fmt == "jpeg" and alpha else fmt   # JPEG has no transparency
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGBA" if alpha else "RGB")
+            out = io.BytesIO()
+            options = {"optimize": True} if target in ("jpeg", "png") else {"method": 4}
+            image.save(out, PIL_FORMATS[target], quality=quality, **options)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.debug("Keeping image as downloaded (%s)", e)
+        return data, kind
+    encoded = out.getvalue()
+    if not resized and len(encoded) >= len(data):
+        return data, kind
+    return encoded, target
+
+
+class AssetCache:
+    """
+    Optimized images on disk, shared by all jobs and keyed by the hash of
+    the downloaded bytes plus the encoding settings, so an image is only
+    recompressed once. The least recently used files are removed once the
+    directory holds more than `max_bytes`.
+    """
+
+    def __init__(self, directory: Path = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        for kind, ext in EXTENSIONS.items():
+            path = self.directory / f"{key}.{ext}"
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                continue
+            os.utime(path)   # recently used
+            with self._lock:
+                self.hits += 1
+            return data, kind
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, kind: str) -> None:
+        _atomic_write(self.directory / f"{key}.{EXTENSIONS[kind]}", data)
+
+    def evict(self) -> int:
+        """Remove the least recently used files until the cache fits `max_bytes`; returns the count."""
+        if not self.directory.exists():
+            return 0
+        files = sorted((p.stat().st_mtime, p.stat().st_size, p) for p in self.directory.iterdir() if p.is_file())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[AssetCache] = None
+
+
+def get_asset_cache() -> AssetCache:
+    global _cache
+    if _cache is None:
+        _cache = AssetCache()
+    return _cache
+
+
+@dataclass
+class AssetStats:
+    downloaded: int = 0       # images fetched (from the network or the HTTP cache)
+    failed: int = 0           # errors, timeouts, non-images and oversized downloads
+    written: int = 0          # distinct files written to job directories
+    deduplicated: int = 0     # references served by a file already written for the page
+    bytes_downloaded: int = 0
+    bytes_written: int = 0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "optimized_cache": get_asset_cache().stats()}
+
+
+asset_stats = AssetStats()
+
+
+# ───────────────────────────── Stage ─────────────────────────────
+
+class AssetStage:
+    """
+    Localizes the images of one generated page. `prefetch` starts
+    downloading the scraped page's images as soon as they are known, so
+    the downloads overlap with generation; `localize` then waits for the
+    images the generated page actually uses (fetching any it did not
+    expect), writes them once each under `assets/` and returns the page
+    with its references rewritten. Downloads go through the shared pool
+    and HTTP cache; each is bounded by `fetch_timeout`, and each phase
+    (the prefetch, then every `localize`) by `budget`, counted from the
+    start of that phase, so a slow generation does not use up the time of
+    the downloads after it. Images that fail stay hotlinked.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        concurrency: int = ASSET_CONCURRENCY,
+        fetch_timeout: float = ASSET_FETCH_TIMEOUT,
+        budget: float = ASSET_BUDGET,
+        max_images: int = ASSET_MAX_IMAGES,
+        fmt: str = ASSET_FORMAT,
+        quality: int = ASSET_QUALITY,
+        max_dimension: int = ASSET_MAX_DIMENSION,
+    ):
+        self.base_url = base_url
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.fetch_timeout = fetch_timeout
+        self.budget = budget
+        self.max_images = max_images
+        self.format = resolve_format(fmt)
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self._downloads: Dict[str, asyncio.Task] = {}
+
+    def _deadline(self) -> float:
+        return asyncio.get_running_loop().time() + self.budget
+
+    def _download(self, url: str, deadline: float) -> asyncio.Task:
+        task = self._downloads.get(url)
+        if task is None:
+            task = self._downloads[url] = asyncio.create_task(self._fetch(url, deadline))
+        return task
+
+    def prefetch(self, urls: Iterable[str]) -> int:
+        """Start downloading up to `max_images` of `urls` in the background; returns how many."""
+        urls = list(urls)[:self.max_images]
+        deadline = self._deadline()
+        for url in urls:
+            self._download(url, deadline)
+        return len(urls)
+
+    async def _fetch(self, url: str, deadline: float) -> Optional[Tuple[bytes, str]]:
+        async with self.semaphore:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                logger.warning("⏱️ Asset budget exhausted, skipping: %s", url)
+                asset_stats.failed += 1
+                return None
+            session = self.session or get_session()
+            timeout = aiohttp.ClientTimeout(total=min(self.fetch_timeout, remaining))
+            cache = get_http_cache()
+            try:
+                if cache is not None:
+                    cached = await cache.fetch(session, url, timeout=timeout)
+                    body, content_type = (cached.body, cached.content_type) if cached else (None, "")
+                else:
+                    async with session.get(url, timeout=timeout) as response:
+                        body = await response.read() if response.status == 200 else None
+                        content_type = response.headers.get("Content-Type", "")
+            except asyncio.TimeoutError:
+                logger.warning("❌ Timed out: %s", url)
+                body = None
+            except Exception as e:
+                logger.warning("❌ Error downloading %s: %s", url, e)
+                body = None
+        if body is None:
+            asset_stats.failed += 1
+            return None
+        kind = sniff_image(body, content_type)
+        if kind is None or len(body) > ASSET_MAX_BYTES:
+            logger.warning("❌ Not an image or too large (%d bytes): %s", len(body), url)
+            asset_stats.failed += 1
+            return None
+        asset_stats.downloaded += 1
+        asset_stats.bytes_downloaded += len(body)
+        return body, kind
+
+    async def _optimize(self, data: bytes, kind: str, digest: str) -> Tuple[bytes, str]:
+        if Image is None or kind not in RECOMPRESSIBLE:
+            return data, kind
+        cache = get_asset_cache()
+        key = f"{digest}-{self.format}-q{self.quality}-{self.max_dimension}"
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+        data, kind = await get_cpu_pool().run(
+            optimize_image, data, kind, self.format, self.quality, self.max_dimension,
+        )
+        await asyncio.to_thread(cache.put, key, data, kind)
+        return data, kind
+
+    async def _store(self, artifacts: JobArtifacts, data: bytes, kind: str, digest: str) -> dict:
+        optimized, out_kind = await self._optimize(data, kind, digest)
+        name = f"{ASSET_DIR}/{digest[:20]}.{EXTENSIONS[out_kind]}"
+        await artifacts.write_bytes(name, optimized)
+        asset_stats.written += 1
+        asset_stats.bytes_written += len(optimized)
+        observe_bytes("asset", len(optimized))
+        return {"file": name, "bytes": len(optimized), "original_bytes": len(data)}
+
+    async def localize(self, artifacts: JobArtifacts, result: dict) -> dict:
+        """
+        Write the images `result` ({combined_html, html, css}) references
+        to `artifacts` and return a copy of `result` that uses them. An
+        `assets.json` manifest maps each image URL to its file.
+        """
+        start = time.perf_counter()
+        try:
+            pages = {key: result.get(key) or "" for key in ("html", "css", "combined_html")}
+            urls = list(dict.fromkeys(u for page in pages.values() for u in referenced_images(page, self.base_url)))
+            urls = urls[:self.max_images]
+            deadline = self._deadline()   # images not prefetched get a budget of their own
+            downloads = await asyncio.gather(*(self._download(u, deadline) for u in urls))
+
+            # One file per distinct image, however many URLs serve it
+            by_digest: Dict[str, asyncio.Task] = {}
+            entries: Dict[str, asyncio.Task] = {}
+            for url, download in zip(urls, downloads):
+                if download is None:
+                    continue
+                digest = hashlib.sha256(download[0]).hexdigest()
+                if digest in by_digest:
+                    asset_stats.deduplicated += 1
+                else:
+                    by_digest[digest] = asyncio.create_task(self._store(artifacts, *download, digest))
+                entries[url] = by_digest[digest]
+            manifest = {}
+            if by_digest:
+                await asyncio.gather(*by_digest.values())
+                if Image is not None:
+                    await asyncio.to_thread(get_asset_cache().evict)
+                manifest = {url: task.result() for url, task in entries.items()}
+                await artifacts.write_json("assets.json", manifest)
+
+            local = {url: entry["file"] for url, entry in manifest.items()}
+            localized = {key: rewrite_references(page, self.base_url, local) if local else page
+                         for key, page in pages.items()}
+            if urls:
+                logger.info("Assets: %d of %d images stored locally (%d distinct)",
+                            len(local), len(urls), len(by_digest))
+            return {**result, **localized}
+        finally:
+            self.close()   # prefetched images the page did not use
+            observe_stage("assets", time.perf_counter() - start)
+
+    def close(self) -> None:
+        for task in self._downloads.values():
+            if not task.done():
+                task.cancel()
+
+
+# ───────────────────────────── CLI ─────────────────────────────
+
+PAGE_FILES = {"html": "recreated_page.html", "css": "styles.css", "combined_html": "recreated_combined.html"}
+
+
+async def localize_directory(directory: Path, base_url: str) -> int:
+    """Localize the images of the generated files in a job directory in place; returns the file count."""
+    artifacts = JobArtifacts(directory)
+    result = {key: artifacts.path(name).read_text(encoding="utf-8") if artifacts.path(name).exists() else ""
+              for key, name in PAGE_FILES.items()}
+    stage = AssetStage(base_url)
+    localized = await stage.localize(artifacts, result)
+    await asyncio.gather(*(artifacts.write_text(name, localized[key])
+                           for key, name in PAGE_FILES.items() if artifacts.path(name).exists()))
+    return len(artifacts.read_json("assets.json") or {})
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Download a generated page's images and point it at the local copies.")
+    parser.add_argument("directory", type=Path, help="job directory with recreated_page.html / styles.css")
+    parser.add_argument("--base-url", required=True, help="URL relative image references resolve against")
+    args = parser.parse_args(argv)
+    setup_logging()
+    try:
+        count = await localize_directory(args.directory, args.base_url)
+    finally:
+        await close_session()
+    print(json.dumps({"localized": count, **asdict(asset_stats)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
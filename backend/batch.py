@@ -0,0 +1,244 @@
+# backend/batch.py
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+import llm
+from browser_pool import close_browser_pool
+from cpu_pool import close_cpu_pool
+from http_client import close_session
+from artifacts import JobArtifacts
+from screenshots import flush_screenshots
+from limits import StageLimits
+from log import setup_logging
+from pipeline import PipelineError, run_pipeline
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIR = Path(os.getenv("BATCH_DIR", Path(__file__).parent / "generated" / "batches"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))            # URLs in flight at once
+BATCH_BROWSER_CONCURRENCY = int(os.getenv("BATCH_BROWSER_CONCURRENCY", "4"))
+BATCH_CSS_CONCURRENCY = int(os.getenv("BATCH_CSS_CONCURRENCY", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))   # upper bound for API-submitted batches
+
+RESULTS_FILE = "results.jsonl"
+SUMMARY_FILE = "summary.json"
+
+
+def load_manifest(path: Path) -> List[str]:
+    """
+    URLs from a manifest: one per line (blank lines and `#` comments are
+    ignored), or JSON lines with a "url" key. Duplicates are dropped.
+    """
+    urls: List[str] = []
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["url"]
+        if line not in urls:
+            urls.append(line)
+    return urls
+
+
+def url_slug(url: str) -> str:
+    """Filesystem-safe, stable directory name for a URL (host-path-hash)."""
+    parsed = urlparse(url)
+    readable = re.sub(r"[^a-zA-Z0-9]+", "-", f"{parsed.netloc}{parsed.path}").strip("-")[:60]
+    digest = hashlib.sha256(url.encode()).hexdigest()[:8]
+    return f"{readable or 'page'}-{digest}"
+
+
+def completed_urls(results_path: Path) -> Set[str]:
+    """URLs already recorded as succeeded in a results file (for resuming)."""
+    done: Set[str] = set()
+    if not results_path.exists():
+        return done
+    for line in results_path.read_text().splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue   # torn last line from an interrupted run
+        if record.get("status") == "succeeded":
+            done.add(record["url"])
+    return done
+
+
+class Batch:
+    """
+    Runs the pipeline over many URLs. At most `concurrency` URLs are in
+    flight; within them the browser, CSS-fetch and LLM stages have their
+    own caps. Each finished URL is appended to `<out_dir>/results.jsonl`
+    straight away, so re-running the same batch skips what already
+    succeeded; `summary.json` is written when the run ends.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        out_dir: Path,
+        bypass_cache: bool = False,
+        concurrency: int = BATCH_CONCURRENCY,
+        browser_concurrency: int = BATCH_BROWSER_CONCURRENCY,
+        css_concurrency: int = BATCH_CSS_CONCURRENCY,
+        llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+    ):
+        self.id = Path(out_dir).name
+        self.urls = urls
+        self.out_dir = Path(out_dir)
+        self.bypass_cache = bypass_cache
+        self.concurrency = max(concurrency, 1)
+        self.limits = StageLimits(browser=browser_concurrency, css=css_concurrency, llm=llm_concurrency)
+        self.status = "pending"      # pending | running | finished | cancelled
+        self.counts: Dict[str, int] = {"succeeded": 0, "failed": 0, "skipped": 0}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def results_path(self) -> Path:
+        return self.out_dir / RESULTS_FILE
+
+    def _append(self, line: str) -> None:
+        with open(self.results_path, "a") as f:
+            f.write(line)
+
+    async def _record(self, record: dict) -> None:
+        line = json.dumps(record) + "\n"
+        async with self._write_lock:
+            await asyncio.to_thread(self._append, line)
+
+    async def _run_one(self, url: str, slots: asyncio.Semaphore) -> None:
+        async with slots:
+            item_dir = self.out_dir / url_slug(url)
+            start = time.monotonic()
+            record = {"url": url, "output_dir": str(item_dir)}
+            try:
+                await run_pipeline(url, self.bypass_cache, artifacts=JobArtifacts(item_dir), limits=self.limits)
+                record["status"] = "succeeded"
+            except PipelineError as e:
+                record.update(status="failed", stage=e.stage, error=e.detail)
+            except Exception as e:
+                record.update(status="failed", error=str(e))
+            record["duration"] = round(time.monotonic() - start, 3)
+            self.counts[record["status"]] += 1
+            await self._record(record)
+            logger.info("Batch %s: %s %s (%ss)", self.id, record["status"], url, record["duration"])
+
+    async def run(self) -> dict:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.status = "running"
+        self.started_at = time.time()
+        done = await asyncio.to_thread(completed_urls, self.results_path)
+        pending = [url for url in self.urls if url not in done]
+        self.counts["skipped"] = len(self.urls) - len(pending)
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            await asyncio.gather(*(self._run_one(url, slots) for url in pending))
+            self.status = "finished"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        finally:
+            self.finished_at = time.time()
+            summary = self.snapshot()
+            await asyncio.to_thread((self.out_dir / SUMMARY_FILE).write_text, json.dumps(summary, indent=2))
+        return summary
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.urls),
+            **self.counts,
+            "remaining": len(self.urls) - sum(self.counts.values()),
+            "output_dir": str(self.out_dir),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_batches: Dict[str, Batch] = {}
+
+
+def start_batch(urls: List[str], name: Optional[str] = None, **options) -> Batch:
+    """
+    Run a batch in the background of the current event loop. Re-using the
+    `name` of an earlier batch resumes it in the same output directory.
+    """
+    batch_id = re.sub(r"[^a-zA-Z0-9_-]+", "-", name) if name else uuid.uuid4().hex
+    existing = _batches.get(batch_id)
+    if existing is not None and existing.status == "running":
+        raise ValueError(f"Batch {batch_id} is already running")
+    batch = Batch(urls, BATCH_DIR / batch_id, **options)
+    batch.task = asyncio.create_task(batch.run())
+    _batches[batch_id] = batch
+    return batch
+
+
+def get_batch(batch_id: str) -> Optional[Batch]:
+    return _batches.get(batch_id)
+
+
+async def cancel_batches() -> None:
+    tasks = [b.task for b in _batches.values() if b.task is not None and not b.task.done()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recreate every URL in a manifest.")
+    parser.add_argument("manifest", type=Path, help="file with one URL per line (or JSON lines with a \"url\" key)")
+    parser.add_argument("--out", type=Path, help="output directory (default: BATCH_DIR/<manifest name>)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="URLs in flight at once")
+    parser.add_argument("--browser-concurrency", type=int, default=BATCH_BROWSER_CONCURRENCY)
+    parser.add_argument("--css-concurrency", type=int, default=BATCH_CSS_CONCURRENCY)
+    parser.add_argument("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY)
+    parser.add_argument("--llm-rpm", type=float, default=llm.LLM_RATE_LIMIT_RPM, help="LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--bypass-cache", action="store_true", help="ignore cached generations")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    llm.rate_limiter.configure(args.llm_rpm)
+    batch = Batch(
+        load_manifest(args.manifest),
+        args.out or BATCH_DIR / args.manifest.stem,
+        bypass_cache=args.bypass_cache,
+        concurrency=args.concurrency,
+        browser_concurrency=args.browser_concurrency,
+        css_concurrency=args.css_concurrency,
+        llm_concurrency=args.llm_concurrency,
+    )
+    try:
+        summary = await batch.run()
+    finally:
+        await flush_screenshots()
+        await close_browser_pool()
+        await close_session()
+        close_cpu_pool()
+        await llm.close_client()
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
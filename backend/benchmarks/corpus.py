@@ -0,0 +1,133 @@
+# backend/benchmarks/corpus.py
+
+import json
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CAPTURED_CONTEXT = BACKEND_DIR / "generated" / "context.json"
+
+_BODY_RE = re.compile(r"(<body\b[^>]*>)(.*)(</body>)", re.DOTALL | re.IGNORECASE)
+
+WORDS = (
+    "fast secure platform team launch pricing customer growth design build ship scale "
+    "data insight product feature simple modern cloud native reliable global support "
+    "analytics workflow automate integrate deliver trusted partner experience"
+).split()
+
+
+@dataclass
+class Sample:
+    """One benchmark input: a page's HTML and its (unfiltered) CSS."""
+    name: str
+    html: str
+    css: str
+    cache: dict = field(default_factory=dict, repr=False)   # stage inputs derived once per sample
+
+    @property
+    def size(self) -> int:
+        return len(self.html.encode()) + len(self.css.encode())
+
+
+def captured_sample() -> Sample:
+    context = json.loads(CAPTURED_CONTEXT.read_text())
+    return Sample("captured", context["html"], context["css_contents"])
+
+
+def scaled(sample: Sample, factor: int) -> Sample:
+    """Repeat the page body and stylesheet `factor` times (same shape, bigger input)."""
+    match = _BODY_RE.search(sample.html)
+    if match:
+        html = sample.html[:match.start(2)] + match.group(2) * factor + sample.html[match.end(2):]
+    else:
+        html = sample.html * factor
+    return Sample(f"{sample.name}x{factor}", html, "\n".join([sample.css] * factor))
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def synthetic_page(sections: int, seed: int = 0) -> str:
+    """Marketing-style page: nav, hero, then feature/card/testimonial sections."""
+    rng = random.Random(seed)
+    parts = [
+        "<!DOCTYPE html><html><head><title>Synthetic | Bench</title></head><body>",
+        '<header class="site-header"><nav class="main-nav"><ul>',
+    ]
+    for i in range(8):
+        parts.append(f'<li><a href="/page-{i}" class="nav-link">{rng.choice(WORDS).title()}</a></li>')
+    parts.append('</ul></nav></header><section class="hero" id="hero"><div class="hero-text">')
+    parts.append(f"<h1>{_sentence(rng, 6)}</h1><p>{_sentence(rng, 24)}</p>")
+    parts.append('<a class="btn btn-primary" href="/signup">Get started</a></div>'
+                 '<img src="/img/hero.png" alt="hero"></section>')
+    for s in range(sections):
+        kind = ("features", "cards", "testimonials")[s % 3]
+        parts.append(f'<section class="section section-{kind}" id="section-{s}">')
+        parts.append(f"<h2>{_sentence(rng, 5)}</h2><div class=\"grid grid-{s % 4}\">")
+        for c in range(6):
+            if kind == "testimonials":
+                parts.append(
+                    f'<div class="testimonial-card"><img src="/img/avatar-{s}-{c}.jpg" alt="">'
+                    f"<blockquote>{_sentence(rng, 30)}</blockquote>"
+                    f'<span class="author-name">{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}</span></div>'
+                )
+            else:
+                parts.append(
+                    f'<div class="card card-{c % 3}"><img src="/img/{kind}-{s}-{c}.png" alt="">'
+                    f"<h3>{_sentence(rng, 4)}</h3><p>{_sentence(rng, 40)}</p>"
+                    f'<a class="button" href="/more/{s}/{c}">Learn more</a></div>'
+                )
+        parts.append("</div></section>")
+    parts.append('<footer class="site-footer"><div class="footer-links"><ul>')
+    parts.extend(f'<li><a href="/footer-{i}">{rng.choice(WORDS).title()}</a></li>' for i in range(12))
+    parts.append("</ul></div></footer></body></html>")
+    return "".join(parts)
+
+
+def synthetic_css(rules: int, seed: int = 0) -> str:
+    """
+    Stylesheet with a realistic mix: plain rules (about half matching the
+    synthetic page), :root variables, @media blocks, @font-face and keyframes.
+    """
+    rng = random.Random(seed)
+    used = [".card", ".card-0", ".hero", ".hero-text", ".btn", ".btn-primary", ".grid", ".site-header",
+            ".main-nav", ".testimonial-card", ".author-name", ".site-footer", "h1", "h2", "p", "a", "body"]
+    parts = [":root { --brand: #4f46e5; --radius: 8px; --gap: 24px; }",
+             "@font-face { font-family: Inter; src: url(/fonts/inter.woff2) format('woff2'); }",
+             "@keyframes fade { from { opacity: 0 } to { opacity: 1 } }"]
+    for i in range(rules):
+        if rng.random() < 0.5:
+            selector = f"{rng.choice(used)}:hover, .unused-{i} > span" if i % 5 == 0 else rng.choice(used)
+        else:
+            selector = f".unused-{i} .child-{i % 7}"
+        body = (f"color: var(--brand); margin: {i % 32}px; padding: calc(var(--gap) / 2); "
+                f"font-family: Inter, sans-serif; border-radius: var(--radius);")
+        rule = f"{selector} {{ {body} }}"
+        if i % 10 == 0:
+            rule = f"@media (min-width: {600 + i % 600}px) {{ {rule} }}"
+        parts.append(rule)
+    return "\n".join(parts)
+
+
+def synthetic_sample(sections: int, rules: int) -> Sample:
+    return Sample(f"synthetic-{sections}s-{rules}r", synthetic_page(sections), synthetic_css(rules))
+
+
+def load_corpus(quick: bool = False) -> List[Sample]:
+    """
+    The captured page at 1x/4x plus synthetic pages from small to large.
+    `quick` keeps only the smaller inputs for a fast local run.
+    """
+    corpus = []
+    if CAPTURED_CONTEXT.exists():
+        captured = captured_sample()
+        corpus += [captured, scaled(captured, 4)]
+    corpus.append(synthetic_sample(20, 500))
+    if not quick:
+        corpus += [scaled(corpus[0], 16)] if CAPTURED_CONTEXT.exists() else []
+        corpus.append(synthetic_sample(200, 5000))
+    return corpus
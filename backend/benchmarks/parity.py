@@ -0,0 +1,113 @@
+# backend/benchmarks/parity.py
+#
+# Checks that every installed HTML parser backend yields the same page
+# summary and selector set as the bs4 reference.
+#
+#   cd backend
+#   python -m benchmarks.parity            # benchmark corpus + the pages below
+#   python -m benchmarks.parity --quick
+
+import argparse
+import sys
+from typing import List, Optional, Tuple
+
+from benchmarks.corpus import Sample, load_corpus
+from html_document import HTMLDocument
+from html_parsers import available_parsers
+from page_analysis import summarize_document
+
+REFERENCE = "bs4"
+
+# Well-formed pages exercising what backends could disagree on. Malformed
+# markup is not included: html.parser does no tree repair and the HTML5/
+# libxml2 parsers do, so there the trees (and summaries) legitimately differ.
+PARITY_PAGES = {
+    "entities_and_comments": (
+        "<!DOCTYPE html><html><head><title>A &amp; B</title></head><body>"
+        "<!-- banner --><h1>Caf&eacute; &#8212; &quot;best&quot; in town</h1>"
+        "<p>Five words or more&nbsp;here, <!-- inline --> and more after the comment.</p>"
+        "</body></html>"
+    ),
+    "scripts_styles_templates": (
+        "<html><head><style>.x { color: red }</style><script>var a = '<p>not markup</p>';</script></head>"
+        "<body><section class='intro'><h2>Intro</h2><script type='application/ld+json'>{\"a\": 1}</script>"
+        "<template><p>template text</p></template><noscript>Enable JavaScript</noscript></section></body></html>"
+    ),
+    "attributes": (
+        "<html><body><div ID='Main' CLASS='  wrap   wide ' data-x><BUTTON class='btn' disabled style='color: red'>Go</BUTTON>"
+        "<a href>empty href</a><a class='button' href='/b'>As button</a><img src='/a.png' alt>"
+        "<input type='text' required><br><hr/></div></body></html>"
+    ),
+    "nav_and_images": (
+        "<html><body><header class='top'><nav><ul><li><a href='/'>Home</a></li><li><a href='/x'>X</a></li>"
+        "<li><a>No href</a></li></ul></nav><img src='/logo.svg' alt='Logo'></header>"
+        "<article class='post'><div><img src='/in-div.jpg'></div><figure><img src='/fig.jpg'></figure></article>"
+        "<footer><a href='/privacy'>Privacy</a></footer></body></html>"
+    ),
+    "cards_and_components": (
+        "<html><body><section class='testimonials'><div class='testimonial-card'><img src='/a1.jpg'>"
+        "<blockquote>Great product</blockquote><span class='author-name'>Ann</span></div>"
+        "<div class='testimonial-card'><blockquote>Works well</blockquote><p class='name'>Bo</p></div></section>"
+        "<div class='card'><div class='card-body'><h3 class='card-title'>Nested</h3></div></div>"
+        "<ul class='pricing'><li class='plan'><h3>Basic</h3>$9/mo</li><li class='plan'><h3>Pro</h3>$29/mo</li>"
+        "<li class='plan'><h3>Team</h3>$99/mo</li></ul>"
+        "<div class='row'><span><img src='/l1.png'></span><span><img src='/l2.png'></span><span><img src='/l3.png'></span></div>"
+        "</body></html>"
+    ),
+    "inline_svg_and_tables": (
+        "<html><body><svg viewBox='0 0 10 10'><linearGradient id='g'></linearGradient><path d='M0 0'/></svg>"
+        "<table class='specs'><thead><tr><th>Key</th></tr></thead><tbody><tr><td><p>Cell paragraph with enough words.</p></td></tr>"
+        "</tbody></table></body></html>"
+    ),
+    "fragment": "<div class='hero'><h1>Just a fragment</h1><p>No html, head or body tags in this one.</p></div>",
+}
+
+# Wrapper elements the HTML5/libxml2 parsers add to fragments and html.parser does not
+IMPLIED_TAGS = {"html", "head", "body"}
+
+
+def parity_samples(quick: bool = False) -> List[Sample]:
+    return [Sample(name, html, "") for name, html in PARITY_PAGES.items()] + load_corpus(quick=quick)
+
+
+def _describe(doc: HTMLDocument) -> Tuple[dict, set]:
+    return summarize_document(doc), doc.used_selectors - IMPLIED_TAGS
+
+
+def compare(sample: Sample, parser: str) -> List[str]:
+    """Differences between `parser` and the reference on one page, one line each."""
+    ref_summary, ref_selectors = _describe(HTMLDocument(sample.html, streaming=False, parser=REFERENCE))
+    summary, selectors = _describe(HTMLDocument(sample.html, streaming=False, parser=parser))
+    problems = []
+    for key in ref_summary.keys() | summary.keys():
+        expected, got = ref_summary.get(key), summary.get(key)
+        if expected != got:
+            problems.append(f"{key}: {REFERENCE} {str(expected)[:200]} != {parser} {str(got)[:200]}")
+    if selectors != ref_selectors:
+        problems.append(f"selectors: only {REFERENCE} {sorted(ref_selectors - selectors)[:10]}, "
+                        f"only {parser} {sorted(selectors - ref_selectors)[:10]}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends against the bs4 reference.")
+    parser.add_argument("--quick", action="store_true", help="small corpus inputs only")
+    args = parser.parse_args(argv)
+
+    backends = [p for p in available_parsers() if p != REFERENCE]
+    if not backends:
+        print(f"Only {REFERENCE} is installed; nothing to compare.")
+        return 0
+    failed = 0
+    for sample in parity_samples(quick=args.quick):
+        for backend in backends:
+            problems = compare(sample, backend)
+            print(f"{'ok' if not problems else 'DIFF':<5} {backend:<11} {sample.name}")
+            for line in problems:
+                print(f"      {line}")
+            failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# backend/benchmarks/run.py
+#
+# Offline micro-benchmarks for the CPU-bound pipeline stages.
+#
+#   cd backend
+#   python -m benchmarks.run                   # compare against benchmarks/baseline.json
+#   python -m benchmarks.run --save            # (re)write the baseline
+#   python -m benchmarks.run --quick --stages filter_css,critical_css
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import Sample, load_corpus
+from filter_css import filter_css_from_html_and_css
+from html_document import HTMLDocument, clear_document_cache
+from html_parsers import available_parsers
+from html_stream import extract_streaming, iter_chunks
+from inline_css import inline_css
+from output import render_output
+from recreate_site import build_critical_css, build_summary_and_minimal_html, format_prompt
+from scraper import extract_important_pieces
+from summarize_utils import chunk_text, summarize_chunks, summary_cache
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25      # fail when a stage gets 25% slower …
+MIN_REGRESSION_SECONDS = 0.002  # … and at least 2 ms slower (timer noise on tiny inputs)
+
+
+def _summary(sample: Sample) -> dict:
+    if "summary" not in sample.cache:
+        clear_document_cache()
+        sample.cache["summary"] = extract_important_pieces(sample.html)
+    return sample.cache["summary"]
+
+
+def _filtered_css(sample: Sample) -> str:
+    if "filtered_css" not in sample.cache:
+        sample.cache["filtered_css"] = filter_css_from_html_and_css(sample.html, sample.css)
+    return sample.cache["filtered_css"]
+
+
+def _context(sample: Sample) -> dict:
+    summary = _summary(sample)
+    images = [img["src"] for img in summary["images_detailed"] if img.get("src")]
+    return {"title": "Bench | Site", "images": images, "summary": summary, "style_hints": {}}
+
+
+def _main_text(sample: Sample) -> str:
+    return _summary(sample).get("main_content_text") or ""
+
+
+@dataclass
+class Stage:
+    """`setup` derives the stage's inputs from a sample (untimed); `run` is timed."""
+    name: str
+    setup: Callable[[Sample], tuple]
+    run: Callable
+    fresh_parse: bool = False     # clear the shared parse cache before each run
+
+    def input_bytes(self, args: tuple) -> int:
+        return sum(len(a.encode()) for a in args if isinstance(a, str)) or sum(
+            len(json.dumps(a, default=str)) for a in args
+        )
+
+
+def _summarize_uncached(chunks: list) -> list:
+    summary_cache.clear()   # time the backend, not memo hits from the previous run
+    return summarize_chunks(chunks)
+
+
+def _buckets_with(parser: str) -> Callable[[str], object]:
+    # Parse + one bucket traversal with a given backend, trafilatura left out
+    return lambda html: HTMLDocument(html, streaming=False, parser=parser).buckets
+
+
+def _summary_and_html(sample: Sample) -> tuple:
+    summary, minimal_html = build_summary_and_minimal_html(_context(sample))
+    return minimal_html, summary, build_critical_css(_filtered_css(sample))
+
+
+STAGES: List[Stage] = [
+    Stage("extract_important_pieces", lambda s: (s.html,), extract_important_pieces, fresh_parse=True),
+    *(Stage(f"buckets_{parser}", lambda s: (s.html,), _buckets_with(parser)) for parser in available_parsers()),
+    Stage("extract_streaming", lambda s: (s.html,), lambda html: extract_streaming(iter_chunks(html))),
+    Stage("filter_css", lambda s: (s.html, s.css), filter_css_from_html_and_css, fresh_parse=True),
+    Stage("critical_css", lambda s: (_filtered_css(s),), build_critical_css),
+    Stage("summary_and_minimal_html", lambda s: (_context(s),), build_summary_and_minimal_html),
+    Stage("format_prompt", _summary_and_html, format_prompt),
+    Stage("chunk_text", lambda s: (_main_text(s),), chunk_text),
+    Stage("summarize_chunks", lambda s: (chunk_text(_main_text(s)),), _summarize_uncached),
+    Stage("inline_css", lambda s: (s.html, _filtered_css(s)), inline_css),
+    Stage("render_output", lambda s: (s.html, _filtered_css(s)), render_output),
+]
+
+
+def measure(stage: Stage, sample: Sample, repeat: int) -> dict:
+    args = stage.setup(sample)
+    times = []
+    for _ in range(repeat):
+        if stage.fresh_parse:
+            clear_document_cache()
+        gc.collect()
+        gc.disable()   # as timeit does: keep collector pauses out of the numbers
+        try:
+            start = time.perf_counter()
+            stage.run(*args)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    # One extra traced run for peak memory; tracing slows the call, so it is not timed
+    if stage.fresh_parse:
+        clear_document_cache()
+    tracemalloc.start()
+    stage.run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    size = stage.input_bytes(args)
+    return {
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "input_bytes": size,
+        "mb_per_s": round(size / median / 1e6, 2) if median > 0 else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_all(samples: List[Sample], stages: List[Stage], repeat: int) -> Dict[str, Dict[str, dict]]:
+    results: Dict[str, Dict[str, dict]] = {}
+    for stage in stages:
+        results[stage.name] = {}
+        for sample in samples:
+            row = measure(stage, sample, repeat)
+            results[stage.name][sample.name] = row
+            print(
+                f"{stage.name:<26} {sample.name:<22} {row['median_s'] * 1000:>10.2f} ms "
+                f"{row['mb_per_s'] or 0:>9.2f} MB/s {row['peak_kb']:>10.0f} KB peak"
+            )
+    return results
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> List[Tuple[str, str, float, float]]:
+    """(stage, sample, baseline, current) fastest-run seconds for every stage that got slower."""
+    found = []
+    for stage, by_sample in results.items():
+        for sample, row in by_sample.items():
+            before = baseline.get("results", {}).get(stage, {}).get(sample)
+            if before is None:
+                continue
+            old, new = before["min_s"], row["min_s"]   # fastest run: least sensitive to machine noise
+            if new > old * (1 + threshold) and new - old > MIN_REGRESSION_SECONDS:
+                found.append((stage, sample, old, new))
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the CPU-bound pipeline stages offline.")
+    parser.add_argument("--quick", action="store_true", help="small inputs only")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage and sample")
+    parser.add_argument("--stages", help="comma-separated stage names (default: all)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save", type=Path, nargs="?", const=DEFAULT_BASELINE, help="write results as a baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.25")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)   # keep stage debug output out of the timings
+    stages = STAGES
+    if args.stages:
+        wanted = set(args.stages.split(","))
+        unknown = wanted - {s.name for s in STAGES}
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+        stages = [s for s in STAGES if s.name in wanted]
+
+    samples = load_corpus(quick=args.quick)
+    results = run_all(samples, stages, max(args.repeat, 1))
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"Baseline written to {args.save}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    found = regressions(results, json.loads(args.baseline.read_text()), args.threshold)
+    for stage, sample, old, new in found:
+        print(f"REGRESSION {stage} on {sample}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms")
+    if found:
+        return 1
+    print(f"No stage regressed more than {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# backend/browser_pool.py
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Type
+
+from browserbase import Browserbase
+from dotenv import load_dotenv
+from playwright.async_api import Browser, Page, Playwright, async_playwright
+
+from metrics import observe_stage
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BROWSER_BACKEND = os.getenv("BROWSER_BACKEND", "browserbase")   # "browserbase" | "local"
+BROWSER_POOL_MIN = int(os.getenv("BROWSER_POOL_MIN", "1"))
+BROWSER_POOL_MAX = int(os.getenv("BROWSER_POOL_MAX", "4"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "25"))     # recycle after N jobs
+BROWSER_MAX_AGE = float(os.getenv("BROWSER_MAX_AGE", "240"))      # seconds; Browserbase sessions expire
+
+
+class BrowserBackend:
+    """How pooled browsers are obtained. Subclasses implement `launch`."""
+    name = "base"
+
+    async def launch(self, playwright: Playwright) -> Browser:
+        raise NotImplementedError
+
+
+class BrowserbaseBackend(BrowserBackend):
+    """Remote Chromium on Browserbase, connected over CDP."""
+    name = "browserbase"
+
+    def __init__(self):
+        self.bb: Optional[Browserbase] = None
+
+    async def launch(self, playwright: Playwright) -> Browser:
+        if self.bb is None:
+            self.bb = Browserbase(api_key=os.environ["BROWSERBASE_API_KEY"])
+        # The SDK call is blocking HTTP; keep it off the event loop
+        session = await asyncio.to_thread(
+            self.bb.sessions.create, project_id=os.environ["BROWSERBASE_PROJECT_ID"]
+        )
+        return await playwright.chromium.connect_over_cdp(session.connect_url)
+
+
+class LocalChromiumBackend(BrowserBackend):
+    """Locally launched headless Chromium, for development and tests."""
+    name = "local"
+
+    async def launch(self, playwright: Playwright) -> Browser:
+        return await playwright.chromium.launch(headless=True)
+
+
+BACKENDS: Dict[str, Type[BrowserBackend]] = {
+    BrowserbaseBackend.name: BrowserbaseBackend,
+    LocalChromiumBackend.name: LocalChromiumBackend,
+}
+
+
+def register_backend(backend: Type[BrowserBackend]) -> Type[BrowserBackend]:
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+class PooledBrowser:
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.created_at = time.monotonic()
+        self.pages_served = 0
+
+    def is_healthy(self, max_pages: int, max_age: float) -> bool:
+        return (
+            self.browser.is_connected()
+            and self.pages_served < max_pages
+            and time.monotonic() - self.created_at < max_age
+        )
+
+
+class BrowserPool:
+    """
+    Keeps between `min_size` and `max_size` connected browsers warm.
+    Each job borrows a browser, gets a fresh isolated context/page, and
+    hands the browser back; browsers are closed and replaced once they
+    disconnect, exceed `max_pages` jobs or `max_age` seconds.
+    """
+
+    def __init__(
+        self,
+        backend: BrowserBackend,
+        min_size: int = BROWSER_POOL_MIN,
+        max_size: int = BROWSER_POOL_MAX,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_age: float = BROWSER_MAX_AGE,
+    ):
+        self.backend = backend
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self._playwright: Optional[Playwright] = None
+        self._idle: List[PooledBrowser] = []
+        self._slots = asyncio.Semaphore(max_size)
+        self._in_use = 0
+        self._launching = 0   # launches in flight, counted so concurrent callers do not overshoot
+        self._start_lock = asyncio.Lock()
+        self._replenishing: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + self._in_use + self._launching
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        self._schedule_replenish()
+        await asyncio.wait({self._replenishing})
+
+    async def _launch(self) -> PooledBrowser:
+        browser = await self.backend.launch(self._playwright)
+        logger.debug("Browser pool: launched %s browser", self.backend.name)
+        return PooledBrowser(browser)
+
+    async def _replenish(self) -> None:
+        """Top the idle set up to `min_size` warm browsers (only ever run as `_replenishing`)."""
+        missing = self.min_size - self.size
+        if missing <= 0:
+            return
+        self._launching += missing
+        try:
+            results = await asyncio.gather(*(self._launch() for _ in range(missing)), return_exceptions=True)
+        finally:
+            self._launching -= missing
+        for result in results:
+            if isinstance(result, PooledBrowser):
+                self._idle.append(result)
+            else:
+                logger.warning("Browser pool: warm-up launch failed: %s", result)
+
+    def _schedule_replenish(self) -> None:
+        if self._replenishing is None or self._replenishing.done():
+            self._replenishing = asyncio.create_task(self._replenish())
+
+    async def _retire(self, pooled: PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+
+    async def acquire(self) -> PooledBrowser:
+        if self._playwright is None:
+            await self.start()
+        await self._slots.acquire()
+        try:
+            while True:
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if pooled.is_healthy(self.max_pages, self.max_age):
+                        self._in_use += 1
+                        return pooled
+                    await self._retire(pooled)
+                # Warm browsers on the way are not covered by _slots; wait for them rather than launch past max_size
+                if self._replenishing is None or self._replenishing.done():
+                    break
+                await asyncio.wait({self._replenishing})
+            self._launching += 1
+            try:
+                pooled = await self._launch()
+            finally:
+                self._launching -= 1
+            self._in_use += 1
+            return pooled
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, pooled: PooledBrowser, healthy: bool = True) -> None:
+        self._in_use -= 1
+        pooled.pages_served += 1
+        try:
+            if healthy and pooled.is_healthy(self.max_pages, self.max_age):
+                self._idle.append(pooled)
+            else:
+                await self._retire(pooled)
+                self._schedule_replenish()
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Borrow a browser and yield a page in a fresh, isolated context."""
+        start = time.perf_counter()
+        pooled = await self.acquire()
+        healthy = True
+        context = None
+        try:
+            context = await pooled.browser.new_context()
+            page = await context.new_page()
+            observe_stage("browser_connect", time.perf_counter() - start)   # pool wait + launch + context
+            yield page
+        except BaseException:
+            healthy = pooled.browser.is_connected()
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    healthy = False
+            await self.release(pooled, healthy)
+
+    async def close(self) -> None:
+        if self._replenishing is not None:
+            self._replenishing.cancel()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._retire(p) for p in idle))
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "min": self.min_size,
+            "max": self.max_size,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide pool, using the backend named by BROWSER_BACKEND."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool(BACKENDS[BROWSER_BACKEND]())
+    return _pool
+
+
+async def close_browser_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,218 @@
+# backend/components.py
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from html_parsers import Node
+
+CARD_TAGS = {"section", "div", "article"}
+CARD_KEYWORDS = ("testimonial", "review", "card")
+AUTHOR_TAGS = {"span", "div", "p"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4"}
+
+MIN_REPEAT = 3            # siblings sharing tag+classes before they count as a component
+COMPONENT_MAX = 10        # components reported per page
+COMPONENT_MAX_ITEMS = 6   # items described per component
+ITEM_TEXT_CHARS = 160
+LOGO_MAX_TEXT = 40        # a logo item is an image with at most this much text
+
+COMPONENT_KEYWORDS = (
+    ("pricing", ("pric", "plan", "tier")),
+    ("logos", ("logo", "brand", "client", "partner", "sponsor")),
+    ("features", ("feature", "benefit")),
+)
+_PRICE = re.compile(r"[$€£¥₹]\s?\d[\d,.]*|\d[\d,.]*\s?(?:USD|EUR|GBP)\b|/\s?mo(?:nth)?\b", re.IGNORECASE)
+
+
+def is_card(tag: Node) -> bool:
+    return tag.name in CARD_TAGS and any(k in c for c in tag.classes for k in CARD_KEYWORDS)
+
+
+def _is_author(tag: Node) -> bool:
+    return tag.name in AUTHOR_TAGS and any("author" in c or "name" in c for c in tag.classes)
+
+
+class _Stats:
+    """What the bottom-up pass knows about one element's subtree."""
+
+    __slots__ = ("text_len", "top_cards", "img", "author", "heading", "price")
+
+    def __init__(self):
+        self.text_len = 0                    # characters of stripped text
+        self.top_cards = 0                   # card descendants with no card in between
+        self.img: Optional[Node] = None      # first <img> descendant
+        self.author: Optional[Node] = None   # first author/name-classed descendant
+        self.heading: Optional[Node] = None  # first h1-h4 descendant
+        self.price: Optional[str] = None     # first price-looking string
+
+
+def _collect_stats(root: Node) -> Dict[int, _Stats]:
+    """
+    One iterative post-order pass: each element's stats are folded from its
+    children's, so no subtree is walked more than once however deeply
+    cards, card bodies and titles nest.
+    """
+    stats: Dict[int, _Stats] = {}
+    stack: List[Tuple[Node, bool]] = [(root, False)]
+    while stack:
+        tag, children_done = stack.pop()
+        if not children_done:
+            stack.append((tag, True))
+            stack.extend((c, False) for c in reversed(tag.parts()) if isinstance(c, Node))
+            continue
+        s = _Stats()
+        for child in tag.parts():
+            if isinstance(child, Node):
+                c = stats[id(child)]
+                s.text_len += c.text_len
+                s.top_cards += 1 if is_card(child) else c.top_cards
+                if s.img is None:
+                    s.img = child if child.name == "img" else c.img
+                if s.author is None:
+                    s.author = child if _is_author(child) else c.author
+                if s.heading is None:
+                    s.heading = child if child.name in HEADING_TAGS else c.heading
+                if s.price is None:
+                    s.price = c.price
+            else:
+                text = child.strip()
+                s.text_len += len(text)
+                if s.price is None and text:
+                    match = _PRICE.search(text)
+                    s.price = match.group() if match else None
+        stats[id(tag)] = s
+    return stats
+
+
+def _testimonial(card: Node, s: _Stats) -> dict:
+    return {
+        "quote": card.get_text(" ", strip=True),
+        "author": s.author.get_text(strip=True) if s.author is not None else None,
+        "avatar": s.img.get("src") if s.img is not None else None,
+        "classes": card.classes,
+    }
+
+
+def _classify(items: List[Node], stats: Dict[int, _Stats]) -> Optional[str]:
+    if any(stats[id(i)].top_cards >= 2 for i in items):
+        return None   # page sections holding card grids, not items of a component
+    classes = " ".join(c for item in items[:1] for c in item.classes).lower()
+    for kind, keywords in COMPONENT_KEYWORDS:
+        if any(k in classes for k in keywords):
+            return kind
+    if is_card(items[0]):
+        return None   # reported as testimonials/cards
+    majority = len(items) // 2 + 1
+    item_stats = [stats[id(i)] for i in items]
+    if sum(s.price is not None for s in item_stats) >= majority:
+        return "pricing"
+    if sum((s.img is not None or i.name == "img") and s.text_len <= LOGO_MAX_TEXT
+           for i, s in zip(items, item_stats)) >= majority:
+        return "logos"
+    if sum(s.heading is not None and s.text_len > LOGO_MAX_TEXT for s in item_stats) >= majority:
+        return "features"
+    return None
+
+
+def _describe(kind: str, item: Node, s: _Stats) -> dict:
+    img = item if item.name == "img" else s.img
+    if kind == "logos":
+        return {"img": img.get("src") if img is not None else None,
+                "alt": img.get("alt") if img is not None else None}
+    text = item.get_text(" ", strip=True)
+    entry = {
+        "heading": s.heading.get_text(" ", strip=True) if s.heading is not None else None,
+        "text": text[:ITEM_TEXT_CHARS] + ("…" if len(text) > ITEM_TEXT_CHARS else ""),
+    }
+    if kind == "pricing":
+        entry["price"] = s.price
+    if img is not None:
+        entry["img"] = img.get("src")
+    return entry
+
+
+def _repeated_children(tag: Node) -> List[List[Node]]:
+    groups: Dict[tuple, List[Node]] = {}
+    for child in tag.parts():
+        if isinstance(child, Node):
+            groups.setdefault((child.name, tuple(sorted(child.classes))), []).append(child)
+    return [g for g in groups.values() if len(g) >= MIN_REPEAT]
+
+
+def detect_components(root: Node) -> Tuple[List[dict], List[dict]]:
+    """
+    (testimonials, components) for a parsed page.
+
+    Cards are elements whose class mentions card/review/testimonial. Only
+    the outermost card of a nest is kept (a `.card` wins over its
+    `.card-body` and `.card-title`), except that an element holding two or
+    more cards side by side is a container, and its cards are kept instead.
+
+    Components are runs of MIN_REPEAT or more siblings with the same tag and
+    classes, classified as pricing, logos or features by class names first
+    and content second; anything inside a reported component is not
+    searched again.
+    """
+    stats = _collect_stats(root)
+    testimonials: List[dict] = []
+    components: List[dict] = []
+
+    # Pre-order, pruned: below a kept card nothing else is a card, below a
+    # component's items nothing else is a component.
+    stack: List[Tuple[Node, bool, bool]] = [(root, False, False)]
+    while stack:
+        tag, in_card, in_component = stack.pop()
+        s = stats[id(tag)]
+        if not in_card and is_card(tag) and s.top_cards < 2:
+            testimonials.append(_testimonial(tag, s))
+            in_card = True
+        find_components = not in_component and len(components) < COMPONENT_MAX
+        claimed = set()
+        if find_components:
+            for items in _repeated_children(tag):
+                kind = _classify(items, stats)
+                if kind is None:
+                    continue
+                components.append({
+                    "type": kind,
+                    "container_tag": tag.name,
+                    "container_classes": tag.classes,
+                    "count": len(items),
+                    "items": [_describe(kind, i, stats[id(i)]) for i in items[:COMPONENT_MAX_ITEMS]],
+                })
+                claimed.update(id(i) for i in items)
+        elif in_card or s.top_cards == 0:
+            continue   # nothing left to find below
+        for child in reversed(tag.parts()):
+            if isinstance(child, Node):
+                stack.append((child, in_card, in_component or id(child) in claimed))
+    return testimonials, components
+
+
+def image_components(images_detailed: List[dict]) -> List[dict]:
+    """
+    Components guessed from images alone, for pages whose tree was never
+    built (html_stream): MIN_REPEAT or more images under the same parent
+    container form one, typed by the container's classes ("images" when
+    no keyword matches). Entries follow detect_components' logo items.
+    """
+    groups: Dict[tuple, List[dict]] = {}
+    for image in images_detailed:
+        if image.get("parent_tag") is not None:
+            groups.setdefault((image["parent_tag"], tuple(image.get("parent_classes") or ())), []).append(image)
+    components: List[dict] = []
+    for (tag, classes), images in groups.items():
+        if len(images) < MIN_REPEAT:
+            continue
+        names = " ".join(classes).lower()
+        kind = next((k for k, keywords in COMPONENT_KEYWORDS if any(w in names for w in keywords)), "images")
+        components.append({
+            "type": kind,
+            "container_tag": tag,
+            "container_classes": list(classes),
+            "count": len(images),
+            "items": [{"img": i.get("src"), "alt": i.get("alt")} for i in images[:COMPONENT_MAX_ITEMS]],
+        })
+        if len(components) >= COMPONENT_MAX:
+            break
+    return components
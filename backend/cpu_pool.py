@@ -0,0 +1,116 @@
+# backend/cpu_pool.py
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(os.cpu_count() or 1)))   # 0 = threads, no processes
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")  # spawn | forkserver | fork
+
+
+def _init_worker() -> None:
+    # Import the parsers (HTML backend, trafilatura, the CSS parser) and run them once,
+    # so the first page a worker gets is not slowed down by their setup.
+    import page_analysis
+    page_analysis.warm_up()
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class CPUPool:
+    """
+    Runs CPU-bound stage functions (see page_analysis) in worker processes
+    so parsing one large page never blocks the event loop, and concurrent
+    requests use more than one core. Functions must be module-level and
+    should take and return compact, plain data: everything crosses the
+    process boundary pickled.
+
+    With `workers=0` the functions run in a thread instead (no extra
+    processes, but still off the event loop).
+    """
+
+    def __init__(self, workers: int = CPU_POOL_WORKERS, start_method: str = CPU_POOL_START_METHOD):
+        self.workers = max(workers, 0)
+        self.start_method = start_method
+        self.submitted = 0
+        self.active = 0
+        self.restarts = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def start(self) -> None:
+        """Spawn and warm every worker now rather than on the first request."""
+        if self.workers == 0:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        pids = await asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.workers)))
+        logger.info("CPU pool ready: %d worker processes", len(set(pids)))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self.submitted += 1
+        self.active += 1
+        try:
+            if self.workers == 0:
+                return await asyncio.to_thread(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for later calls
+            logger.error("CPU pool worker died running %s; restarting the pool", fn.__name__)
+            self.restarts += 1
+            self.close()
+            raise
+        finally:
+            self.active -= 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "mode": "process" if self.workers else "thread",
+            "start_method": self.start_method if self.workers else None,
+            "submitted": self.submitted,
+            "active": self.active,
+            "restarts": self.restarts,
+        }
+
+
+_pool: Optional[CPUPool] = None
+
+
+def get_cpu_pool() -> CPUPool:
+    global _pool
+    if _pool is None:
+        _pool = CPUPool()
+    return _pool
+
+
+def close_cpu_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
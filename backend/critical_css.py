@@ -0,0 +1,219 @@
+# backend/critical_css.py
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from dotenv import load_dotenv
+
+from css_rules import (
+    AtRule,
+    Rule,
+    StyleRule,
+    matches_any_arguments,
+    parse_stylesheet,
+    selector_all_keys,
+    split_declarations,
+)
+
+load_dotenv()
+
+CRITICAL_CSS_BUDGET = int(os.getenv("CRITICAL_CSS_BUDGET", "16000"))   # bytes of CSS in the prompt
+
+# Tags and classes of the minimal HTML snippet (recreate_site) plus base
+# elements. A rule is critical when any compound of one of its selectors
+# uses one of these keys, e.g. `.site-header nav a:hover` via `.site-header`.
+CRITICAL_KEYS: FrozenSet[str] = frozenset({
+    "html", "body", "h1", "h2", "h3", "a", "button",
+    ".site-header", ".main-nav", ".hero", ".hero-text", ".news-cards",
+    ".news-grid", ".news-card", ".read-more", ".site-footer", ".footer-links",
+})
+
+# Selectors whose custom properties are inherited by the whole document
+_VARIABLE_SCOPES = {":root", "html", "body", ":host"}
+
+_VAR_REF = re.compile(r"var\(\s*(--[-\w]+)")
+_QUOTES = "\"' "
+_QUOTED_TAIL = re.compile(r"[\"'].*$")
+
+
+@dataclass
+class _Candidate:
+    ordinal: int               # document order, so the cascade is preserved
+    path: Tuple[AtRule, ...]   # enclosing @media/@supports/... blocks, outermost first
+    rule: StyleRule
+    size: int
+
+
+def _font_families(value: str) -> Set[str]:
+    """Family names in a `font-family` value or the tail of a `font` shorthand."""
+    return {f.strip(_QUOTES).lower() for f in value.split(",") if f.strip(_QUOTES)}
+
+
+class CriticalCSSExtractor:
+    """
+    Picks the rules the prompt needs from an (already filtered) stylesheet
+    in one pass over its rule tree:
+
+    * style rules with a selector using one of `keys` (other selectors of
+      the same rule are dropped), inside the @media/@supports blocks they
+      came from;
+    * the custom properties those rules reference, transitively, from
+      `:root`-like rules, pruned to just those declarations;
+    * the @font-face rules for the font families they use.
+
+    Output keeps document order and stays within `budget` bytes: rules
+    outside at-rule blocks are preferred over conditional ones, and
+    @font-face rules are the first thing dropped when space runs out.
+    """
+
+    def __init__(self, keys: Iterable[str] = CRITICAL_KEYS, budget: int = CRITICAL_CSS_BUDGET):
+        self.keys = frozenset(keys)
+        self.budget = budget
+
+    def _is_critical(self, selector: str) -> bool:
+        if not self.keys.isdisjoint(selector_all_keys(selector)):
+            return True
+        return any(self._is_critical(arg) for arg in matches_any_arguments(selector))
+
+    def extract(self, css: str) -> str:
+        candidates: List[_Candidate] = []
+        variables: Dict[str, List[Tuple[int, StyleRule, str, str]]] = {}
+        font_faces: List[Tuple[int, AtRule, Set[str]]] = []
+        self._walk(parse_stylesheet(css), (), candidates, variables, font_faces, [0])
+
+        # Reserve room for every dependency any candidate could pull in
+        reserve = self._dependency_size(candidates, variables, font_faces)
+        chosen = self._choose(candidates, max(self.budget - reserve, self.budget // 2))
+
+        var_rules = self._variable_rules(chosen, variables)
+        used = sum(c.size for c in chosen) + sum(c.size for c in var_rules)
+        families = self._families(chosen, var_rules)
+        faces = []
+        for ordinal, rule, names in font_faces:
+            size = len(rule.to_css())
+            if names & families and used + size <= self.budget:
+                faces.append(_Candidate(ordinal, (), rule, size))
+                used += size
+
+        return self._serialize(sorted(var_rules + faces + chosen, key=lambda c: c.ordinal))
+
+    # ─── Collection ─────────────────────────────
+
+    def _walk(self, rules: List[Rule], path, candidates, variables, font_faces, counter) -> None:
+        for rule in rules:
+            counter[0] += 1
+            ordinal = counter[0]
+            if isinstance(rule, AtRule):
+                if rule.children is not None:
+                    self._walk(rule.children, path + (rule,), candidates, variables, font_faces, counter)
+                elif rule.name.lower() == "font-face" and rule.body and not path:
+                    names = {_f for name, value in split_declarations(rule.body)
+                             if name.lower() == "font-family" for _f in _font_families(value)}
+                    font_faces.append((ordinal, rule, names))
+                continue
+            if not path and any(sel in _VARIABLE_SCOPES for sel in rule.selectors):
+                for name, value in split_declarations(rule.body):
+                    if name.startswith("--"):
+                        variables.setdefault(name, []).append((ordinal, rule, name, value))
+            selectors = [sel for sel in rule.selectors if self._is_critical(sel)]
+            if selectors:
+                kept = StyleRule(selectors=selectors, body=rule.body)
+                size = len(kept.to_css()) + sum(len(a.name) + len(a.prelude) + 6 for a in path)
+                candidates.append(_Candidate(ordinal, path, kept, size))
+
+    def _dependency_size(self, candidates, variables, font_faces) -> int:
+        refs = self._referenced_variables((c.rule.body for c in candidates), variables)
+        size = sum(len(name) + len(value) + 3 for name in refs for _, _, name, value in variables[name])
+        families = set()
+        for c in candidates:
+            families |= self._rule_families(c.rule.body)
+        return size + sum(len(r.to_css()) for _, r, names in font_faces if names & families)
+
+    def _choose(self, candidates: List[_Candidate], budget: int) -> List[_Candidate]:
+        chosen = []
+        used = 0
+        # Unconditional rules first, then those inside @media and friends
+        for candidate in sorted(candidates, key=lambda c: (len(c.path) > 0, c.ordinal)):
+            if used + candidate.size <= budget:
+                chosen.append(candidate)
+                used += candidate.size
+        return chosen
+
+    # ─── Dependencies ─────────────────────────────
+
+    @staticmethod
+    def _referenced_variables(bodies: Iterable[str], variables) -> Set[str]:
+        pending = [name for body in bodies for name in _VAR_REF.findall(body)]
+        seen: Set[str] = set()
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in variables:
+                continue
+            seen.add(name)
+            for _, _, _, value in variables[name]:
+                pending.extend(_VAR_REF.findall(value))
+        return seen
+
+    def _variable_rules(self, chosen: List[_Candidate], variables) -> List[_Candidate]:
+        """`:root`-like rules cut down to the custom properties `chosen` needs."""
+        refs = self._referenced_variables((c.rule.body for c in chosen), variables)
+        already_kept = {c.ordinal for c in chosen}   # e.g. an `html` rule kept whole
+        by_rule: Dict[int, Tuple[StyleRule, List[str]]] = {}
+        for name in refs:
+            for ordinal, rule, _, value in variables[name]:
+                if ordinal in already_kept:
+                    continue
+                by_rule.setdefault(ordinal, (rule, []))[1].append(f"{name}: {value}")
+        out = []
+        for ordinal, (rule, decls) in by_rule.items():
+            pruned = StyleRule(selectors=rule.selectors, body=" " + "; ".join(sorted(decls)) + "; ")
+            out.append(_Candidate(ordinal, (), pruned, len(pruned.to_css())))
+        return out
+
+    @staticmethod
+    def _rule_families(body: str) -> Set[str]:
+        families = set()
+        for name, value in split_declarations(body):
+            name = name.lower()
+            if name == "font-family" or name.startswith("--"):
+                families |= _font_families(value)
+            elif name == "font":
+                # `font: italic 700 1rem/1.5 "Open Sans", sans-serif`: the first
+                # family is the quoted tail or last word before the first comma
+                first, _, rest = value.partition(",")
+                quoted = _QUOTED_TAIL.search(first)
+                first = quoted.group() if quoted else (first.split() or [""])[-1]
+                families |= _font_families(f"{first},{rest}")
+        return families
+
+    def _families(self, chosen: List[_Candidate], var_rules: List[_Candidate]) -> Set[str]:
+        families: Set[str] = set()
+        for c in chosen + var_rules:
+            families |= self._rule_families(c.rule.body)
+        return families
+
+    # ─── Output ─────────────────────────────
+
+    @staticmethod
+    def _serialize(picked: List[_Candidate]) -> str:
+        """Rebuild the tree, merging neighbours that share enclosing blocks."""
+        top: List[Rule] = []
+        open_blocks: List[Tuple[AtRule, AtRule]] = []   # (source block, copy being filled)
+        for c in picked:
+            common = 0
+            while (common < len(open_blocks) and common < len(c.path)
+                   and open_blocks[common][0] is c.path[common]):
+                common += 1
+            del open_blocks[common:]
+            for source in c.path[common:]:
+                copy = AtRule(name=source.name, prelude=source.prelude, children=[])
+                (open_blocks[-1][1].children if open_blocks else top).append(copy)
+                open_blocks.append((source, copy))
+            (open_blocks[-1][1].children if open_blocks else top).append(c.rule)
+        return "\n\n".join(rule.to_css().strip() for rule in top)
+
+
+def extract_critical_css(css: str, budget: int = CRITICAL_CSS_BUDGET) -> str:
+    return CriticalCSSExtractor(budget=budget).extract(css)
@@ -0,0 +1,509 @@
+# backend/css_rules.py
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+# At-rules whose block contains further rules (recursed into).
+GROUP_AT_RULES = {
+    "media", "supports", "layer", "container", "document", "-moz-document",
+    "scope", "starting-style",
+}
+
+_COMBINATORS = " \t\n\r\f>+~"
+_HEX = set("0123456789abcdefABCDEF")
+
+# Jump straight to the next character the scanner cares about.
+_PRELUDE_SPECIAL = re.compile(r"[{};\"'\\/()\[\]]")
+_BLOCK_SPECIAL = re.compile(r"[{}\"'\\/]")
+_IDENT_RUN = re.compile(r"[-\w\u0080-\U0010ffff]*")
+_COMBINATOR_RUN = re.compile(r"[\s>+~]+")
+_COMPLEX_SELECTOR = re.compile(r"[\\(\[\"']")
+_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_MATCHES_ANY = re.compile(r":(?:is|where|matches|-webkit-any|-moz-any)\(", re.IGNORECASE)
+_NEGATING = re.compile(r":(?:not|has)\(", re.IGNORECASE)
+
+
+@dataclass
+class StyleRule:
+    """A qualified rule: `selector, selector { body }`."""
+    selectors: List[str]
+    body: str
+
+    @property
+    def selector_text(self) -> str:
+        return ", ".join(self.selectors)
+
+    def to_css(self) -> str:
+        return f"{self.selector_text} {{{self.body}}}"
+
+
+@dataclass
+class AtRule:
+    """
+    An at-rule. Group rules (@media, @supports, ...) carry `children`;
+    descriptor blocks (@font-face, @keyframes, ...) keep their raw `body`;
+    statements (@import, @charset) have neither.
+    """
+    name: str
+    prelude: str
+    body: Optional[str] = None
+    children: Optional[List["Rule"]] = None
+
+    @property
+    def is_group(self) -> bool:
+        return self.children is not None
+
+    def to_css(self) -> str:
+        head = f"@{self.name} {self.prelude}".rstrip()
+        if self.children is not None:
+            inner = "\n\n".join(r.to_css() for r in self.children)
+            return f"{head} {{\n{inner}\n}}"
+        if self.body is not None:
+            return f"{head} {{{self.body}}}"
+        return f"{head};"
+
+
+Rule = Union[StyleRule, AtRule]
+
+
+# ───────────────────────────── Tokenizing parser ─────────────────────────────
+
+def parse_stylesheet(css: str) -> List[Rule]:
+    """Parse a stylesheet into a rule tree in a single left-to-right scan."""
+    rules, _ = _parse_rules(css, 0, nested=False)
+    return rules
+
+
+def _skip_string(css: str, i: int) -> int:
+    """`css[i]` is a quote; return the index just past the closing quote."""
+    quote = css[i]
+    n = len(css)
+    i += 1
+    while i < n:
+        c = css[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == quote or c == "\n":
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_comment(css: str, i: int) -> int:
+    end = css.find("*/", i + 2)
+    return len(css) if end == -1 else end + 2
+
+
+def _read_prelude(css: str, i: int) -> Tuple[str, int, str]:
+    """
+    Read up to the next top-level `{`, `;` or `}`.
+    Returns (prelude, index of the terminator, terminator or "" at EOF).
+    """
+    n = len(css)
+    start = i
+    parens = 0
+    pieces = []
+    while i < n:
+        m = _PRELUDE_SPECIAL.search(css, i)
+        if m is None:
+            break
+        i = m.start()
+        c = css[i]
+        if c == "/" and css.startswith("/*", i):
+            pieces.append(css[start:i])
+            i = _skip_comment(css, i)
+            start = i
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(css, i)
+            continue
+        if c == "\\":
+            i += 2
+            continue
+        if c in "([":
+            parens += 1
+        elif c in ")]":
+            parens = max(parens - 1, 0)
+        elif parens == 0 and c in "{;}":
+            pieces.append(css[start:i])
+            return "".join(pieces).strip(), i, c
+        i += 1
+    pieces.append(css[start:n])
+    return "".join(pieces).strip(), n, ""
+
+
+def _read_block(css: str, i: int) -> Tuple[str, int]:
+    """`css[i]` is `{`; return (body, index just past the matching `}`)."""
+    n = len(css)
+    depth = 1
+    start = i + 1
+    i += 1
+    while i < n:
+        m = _BLOCK_SPECIAL.search(css, i)
+        if m is None:
+            break
+        i = m.start()
+        c = css[i]
+        if c == "/" and css.startswith("/*", i):
+            i = _skip_comment(css, i)
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(css, i)
+            continue
+        if c == "\\":
+            i += 2
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return css[start:i], i + 1
+        i += 1
+    return css[start:n], n
+
+
+def _parse_rules(css: str, i: int, nested: bool) -> Tuple[List[Rule], int]:
+    rules: List[Rule] = []
+    n = len(css)
+    while i < n:
+        prelude, i, term = _read_prelude(css, i)
+        if term == "":
+            break
+        if term == "}":
+            if nested:
+                return rules, i + 1
+            i += 1  # stray closing brace at top level
+            continue
+        if term == ";":
+            i += 1
+            if prelude.startswith("@"):
+                name, rest = _split_at_rule(prelude)
+                rules.append(AtRule(name=name, prelude=rest))
+            continue
+        # term == "{"
+        if prelude.startswith("@"):
+            name, rest = _split_at_rule(prelude)
+            if name.lower() in GROUP_AT_RULES:
+                children, i = _parse_rules(css, i + 1, nested=True)
+                rules.append(AtRule(name=name, prelude=rest, children=children))
+            else:
+                body, i = _read_block(css, i)
+                rules.append(AtRule(name=name, prelude=rest, body=body))
+            continue
+        body, i = _read_block(css, i)
+        if prelude:
+            rules.append(StyleRule(selectors=split_selector_list(prelude), body=body))
+    return rules, i
+
+
+def _split_at_rule(prelude: str) -> Tuple[str, str]:
+    head = prelude[1:]
+    for idx, c in enumerate(head):
+        if c.isspace() or c in "('\"":
+            return head[:idx], head[idx:].strip()
+    return head, ""
+
+
+def split_selector_list(text: str) -> List[str]:
+    """Split `a, b:is(c, d)` on top-level commas only."""
+    parts = []
+    depth = 0
+    start = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(text, i)
+            continue
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(depth - 1, 0)
+        elif c == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+        i += 1
+    parts.append(text[start:].strip())
+    return [p for p in parts if p]
+
+
+# ───────────────────────────── Selector analysis ─────────────────────────────
+
+def _read_ident(sel: str, i: int) -> Tuple[str, int]:
+    """Read a CSS identifier starting at `i`, resolving backslash escapes."""
+    n = len(sel)
+    out = []
+    while True:
+        m = _IDENT_RUN.match(sel, i)
+        out.append(m.group())
+        i = m.end()
+        if i + 1 >= n or sel[i] != "\\":
+            break
+        j = i + 1
+        while j < n and j - i <= 6 and sel[j] in _HEX:
+            j += 1
+        if j > i + 1:
+            try:
+                out.append(chr(int(sel[i + 1:j], 16)))
+            except (ValueError, OverflowError):
+                pass
+            if j < n and sel[j] in " \t\n":
+                j += 1
+            i = j
+        else:
+            out.append(sel[i + 1])
+            i += 2
+    return "".join(out), i
+
+
+def _skip_escape(sel: str, i: int) -> int:
+    """`sel[i]` is a backslash; return the index just past the escape sequence."""
+    n = len(sel)
+    j = i + 1
+    while j < n and j - i <= 6 and sel[j] in _HEX:
+        j += 1
+    if j == i + 1:
+        return i + 2
+    if j < n and sel[j] in " \t\n":
+        j += 1
+    return j
+
+
+def _skip_balanced(sel: str, i: int, open_c: str, close_c: str) -> int:
+    depth = 0
+    n = len(sel)
+    while i < n:
+        c = sel[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(sel, i)
+            continue
+        if c == open_c:
+            depth += 1
+        elif c == close_c:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def compound_keys(compound: str) -> Set[str]:
+    """
+    Tag, `.class` and `#id` keys of one compound selector such as
+    `a.btn#go:hover`. Pseudo-classes, pseudo-elements and attribute
+    selectors contribute no keys.
+    """
+    keys = set()
+    i = 0
+    n = len(compound)
+    while i < n:
+        c = compound[i]
+        if c == ".":
+            ident, i = _read_ident(compound, i + 1)
+            if ident:
+                keys.add("." + ident)
+        elif c == "#":
+            ident, i = _read_ident(compound, i + 1)
+            if ident:
+                keys.add("#" + ident)
+        elif c == "[":
+            i = _skip_balanced(compound, i, "[", "]")
+        elif c == ":":
+            while i < n and compound[i] == ":":
+                i += 1
+            _, i = _read_ident(compound, i)
+            if i < n and compound[i] == "(":
+                i = _skip_balanced(compound, i, "(", ")")
+        elif c == "*" or c == "|" or c == "&":
+            i += 1
+        else:
+            ident, j = _read_ident(compound, i)
+            if ident:
+                keys.add(ident.lower())
+                i = j
+            else:
+                i += 1
+    return keys
+
+
+def rightmost_compound(selector: str) -> str:
+    """Return the last compound of a complex selector (`.nav a:hover` → `a:hover`)."""
+    if not _COMPLEX_SELECTOR.search(selector):
+        return _COMBINATOR_RUN.split(selector.strip())[-1]
+    depth = 0
+    i = 0
+    n = len(selector)
+    last_start = 0
+    while i < n:
+        c = selector[i]
+        if c == "\\":
+            i = _skip_escape(selector, i)
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(selector, i)
+            continue
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and c in _COMBINATORS:
+            last_start = i + 1
+        i += 1
+    return selector[last_start:].strip()
+
+
+@lru_cache(maxsize=65536)
+def selector_keys(selector: str) -> FrozenSet[str]:
+    """Keys of the rightmost compound of a selector."""
+    return frozenset(compound_keys(rightmost_compound(selector)))
+
+
+@lru_cache(maxsize=65536)
+def selector_all_keys(selector: str) -> FrozenSet[str]:
+    """Keys of every compound of a selector (`.nav a:hover` → `.nav`, `a`)."""
+    return frozenset(compound_keys(selector))
+
+
+def matches_any_arguments(selector: str) -> List[str]:
+    """
+    Selectors inside `:is()`, `:where()` and their vendor aliases, which
+    match the same elements as if written in place (`.prose :where(h1)`
+    styles `h1`). `:not()` and `:has()` arguments are not included.
+    """
+    excluded = []
+    for m in _NEGATING.finditer(selector):
+        excluded.append((m.start(), _skip_balanced(selector, m.end() - 1, "(", ")")))
+    args = []
+    for m in _MATCHES_ANY.finditer(selector):
+        if any(start < m.start() < end for start, end in excluded):
+            continue
+        end = _skip_balanced(selector, m.end() - 1, "(", ")")
+        args.extend(split_selector_list(selector[m.end():end - 1]))
+    return args
+
+
+def split_declarations(body: str) -> List[Tuple[str, str]]:
+    """
+    `(property, value)` pairs of a declaration block, split on top-level
+    semicolons (not those inside strings, `url(...)` or other functions).
+    """
+    decls = []
+    depth = 0
+    start = 0
+    i = 0
+    n = len(body)
+    while i <= n:
+        c = body[i] if i < n else ";"
+        if c == "\\":
+            i += 2
+            continue
+        if c == '"' or c == "'":
+            i = _skip_string(body, i)
+            continue
+        if c == "/" and body.startswith("/*", i):
+            i = _skip_comment(body, i)
+            continue
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(depth - 1, 0)
+        elif c == ";" and depth == 0:
+            name, colon, value = _COMMENT.sub("", body[start:i]).partition(":")
+            if colon and name.strip():
+                decls.append((name.strip(), value.strip()))
+            start = i + 1
+        i += 1
+    return decls
+
+
+# ───────────────────────────── Index & filtering ─────────────────────────────
+
+class RuleIndex:
+    """
+    Maps selector keys (tag, `.class`, `#id`) to the style rules whose
+    selectors end in a compound containing that key. Each selector is
+    indexed once under its most specific key (id, then class, then tag);
+    selectors with no keys (`*`, `:root`, `[data-x]`) always match.
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._by_key: Dict[str, List[Tuple[int, FrozenSet[str]]]] = {}
+        self._always: Set[int] = set()
+        self._style_rules: List[StyleRule] = []
+        self._index(rules)
+
+    def _index(self, rules: Iterable[Rule]) -> None:
+        for rule in rules:
+            if isinstance(rule, AtRule):
+                if rule.children is not None:
+                    self._index(rule.children)
+                continue
+            ordinal = len(self._style_rules)
+            self._style_rules.append(rule)
+            for sel in rule.selectors:
+                keys = selector_keys(sel)
+                if not keys:
+                    self._always.add(ordinal)
+                    continue
+                self._by_key.setdefault(_primary_key(keys), []).append((ordinal, keys))
+
+    def matching(self, used_selectors: Set[str]) -> Set[int]:
+        """Ordinals of style rules with at least one selector matching `used_selectors`."""
+        matched = set(self._always)
+        for key in used_selectors:
+            for ordinal, keys in self._by_key.get(key, ()):
+                if ordinal not in matched and keys <= used_selectors:
+                    matched.add(ordinal)
+        return matched
+
+    def filter(self, used_selectors: Set[str], keep_at_rules: bool = True) -> List[Rule]:
+        """
+        Return a pruned copy of the rule tree: unmatched style rules are
+        dropped, group at-rules are kept (with their prelude) only if some
+        child survives, descriptor at-rules such as @font-face are kept
+        when `keep_at_rules` is set.
+        """
+        matched = self.matching(used_selectors)
+        counter = iter(range(len(self._style_rules)))
+        return _prune(self.rules, matched, counter, keep_at_rules)
+
+
+def _primary_key(keys: Set[str]) -> str:
+    ids = [k for k in keys if k.startswith("#")]
+    if ids:
+        return min(ids)
+    classes = [k for k in keys if k.startswith(".")]
+    if classes:
+        return min(classes)
+    return min(keys)
+
+
+def _prune(rules: List[Rule], matched: Set[int], counter, keep_at_rules: bool) -> List[Rule]:
+    kept: List[Rule] = []
+    for rule in rules:
+        if isinstance(rule, StyleRule):
+            if next(counter) in matched:
+                kept.append(rule)
+        elif rule.children is not None:
+            children = _prune(rule.children, matched, counter, keep_at_rules)
+            if children:
+                kept.append(AtRule(name=rule.name, prelude=rule.prelude, children=children))
+        elif keep_at_rules and rule.name.lower() not in ("import", "charset", "namespace"):
+            kept.append(rule)
+    return kept
+
+
+def serialize(rules: List[Rule]) -> str:
+    return "\n\n".join(rule.to_css().strip() for rule in rules)
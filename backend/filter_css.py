@@ -1,36 +1,27 @@
 # filter_css.py
 
-import re
-from bs4 import BeautifulSoup
 from typing import Set
 
+from css_rules import RuleIndex, parse_stylesheet, serialize
+from html_document import get_document
+
 
 def extract_selectors_from_html(html: str) -> Set[str]:
     """Extract tag names, class selectors, and ID selectors used in the HTML."""
-    soup = BeautifulSoup(html, "html.parser")
-
-    tags = {tag.name for tag in soup.find_all()}
-    classes = {f".{cls}" for tag in soup.find_all(class_=True) for cls in tag.get("class", [])}
-    ids = {f"#{tag.get('id')}" for tag in soup.find_all(id=True)}
-
-    return tags | classes | ids
+    # Reuses the scraper's parsed document instead of reparsing the page
+    return get_document(html).used_selectors
 
 
 def filter_css(css: str, used_selectors: Set[str]) -> str:
-    """Keep only CSS rules that match used selectors."""
-    filtered_rules = []
-
-    # Pattern for CSS rules: selector { ... }
-    rules = re.findall(r'([^{]+)\{[^}]*\}', css)
-
-    for rule in rules:
-        selectors = [s.strip() for s in rule.split(",")]
-        if any(sel for sel in selectors if sel in used_selectors):
-            full_rule = re.search(rf'({re.escape(rule)}\s*\{{[^}}]*\}})', css)
-            if full_rule:
-                filtered_rules.append(full_rule.group(1).strip())
-
-    return "\n\n".join(filtered_rules)
+    """
+    Keep only CSS rules that match used selectors.
+    The stylesheet is parsed once into a rule tree; a rule is kept when the
+    rightmost compound of one of its selectors (`a:hover` in `.nav a:hover`)
+    only uses tags/classes/ids present in the HTML. @media/@supports blocks
+    are kept around their surviving rules.
+    """
+    index = RuleIndex(parse_stylesheet(css))
+    return serialize(index.filter(used_selectors))
 
 
 def filter_css_from_html_and_css(html: str, css: str) -> str:
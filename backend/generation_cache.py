@@ -0,0 +1,156 @@
+# backend/generation_cache.py
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from prompt_builder import PROMPT_TOKEN_BUDGET, SYSTEM_PROMPT
+
+load_dotenv()
+
+GENERATION_CACHE_DIR = Path(os.getenv("GENERATION_CACHE_DIR", Path(__file__).parent / "generated" / "generation_cache"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))   # seconds
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "500"))
+
+# Parts of a page that change on every load without changing what it looks like
+_VOLATILE_RE = re.compile(
+    r"<script\b[^>]*>.*?</script>|<!--.*?-->|\s(?:nonce|data-csrf|csrf-token)=\"[^\"]*\"",
+    re.DOTALL | re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def prompt_config(model: str) -> str:
+    """Fingerprint of everything but the page that shapes a reply: instructions, budget and model."""
+    return _sha256(json.dumps([model, PROMPT_TOKEN_BUDGET, _sha256(SYSTEM_PROMPT)], separators=(",", ":")))
+
+
+def prompt_fingerprint(summary: dict, minimal_html: str, critical_css: str, model: str) -> str:
+    """Fingerprint of exactly what feeds the request: prompt inputs and prompt_config."""
+    payload = json.dumps(
+        [summary, minimal_html, critical_css, prompt_config(model)],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return _sha256(payload)
+
+
+def page_fingerprint(html: str, css: str) -> str:
+    """
+    Cheap fingerprint of a scrape: HTML with scripts, comments and nonces
+    removed and whitespace collapsed, plus the downloaded CSS.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", _VOLATILE_RE.sub("", html))
+    return _sha256(normalized + "\0" + css)
+
+
+class GenerationCache:
+    """
+    On-disk cache of /generate results.
+
+    `results/<prompt fingerprint>.json` holds `{combined_html, html, css}`
+    for a given prompt input; `pages/<url hash>.json` remembers which
+    prompt fingerprint the last scrape of a URL produced (and under which
+    prompt_config), so an unchanged scrape can be answered before
+    filtering, prompting or calling the LLM.
+    Entries older than `ttl` are ignored; the least recently used results
+    are evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        directory: Path = GENERATION_CACHE_DIR,
+        ttl: float = GENERATION_CACHE_TTL,
+        max_entries: int = GENERATION_CACHE_MAX_ENTRIES,
+    ):
+        self.results_dir = Path(directory) / "results"
+        self.pages_dir = Path(directory) / "pages"
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.page_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _write_json(path: Path, data: dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _read_json(self, path: Path) -> Optional[dict]:
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - data.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        return data
+
+    def get(self, prompt_fp: str) -> Optional[dict]:
+        path = self.results_dir / f"{prompt_fp}.json"
+        data = self._read_json(path)
+        if data is None:
+            self.misses += 1
+            return None
+        os.utime(path)  # mtime doubles as LRU timestamp
+        self.hits += 1
+        return data["result"]
+
+    def put(self, prompt_fp: str, result: dict) -> None:
+        self._write_json(self.results_dir / f"{prompt_fp}.json", {"created": time.time(), "result": result})
+        self._evict()
+
+    def get_for_page(self, url: str, page_fp: str, model: str) -> Optional[dict]:
+        """Pre-check: result for this URL if its scrape and the prompt config are unchanged since last time."""
+        data = self._read_json(self.pages_dir / f"{_sha256(url)}.json")
+        if data is None or data.get("page_fp") != page_fp or data.get("config") != prompt_config(model):
+            return None
+        path = self.results_dir / f"{data['prompt_fp']}.json"
+        result = self._read_json(path)
+        if result is None:
+            return None
+        os.utime(path)
+        self.page_hits += 1
+        return result["result"]
+
+    def link_page(self, url: str, page_fp: str, prompt_fp: str, model: str) -> None:
+        self._write_json(
+            self.pages_dir / f"{_sha256(url)}.json",
+            {"created": time.time(), "url": url, "page_fp": page_fp, "prompt_fp": prompt_fp,
+             "config": prompt_config(model)},
+        )
+
+    def _evict(self) -> None:
+        entries = list(self.results_dir.glob("*.json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for path in entries[: len(entries) - self.max_entries]:
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "page_hits": self.page_hits, "misses": self.misses}
+
+
+_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> GenerationCache:
+    global _cache
+    if _cache is None:
+        _cache = GenerationCache()
+    return _cache
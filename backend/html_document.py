@@ -0,0 +1,185 @@
+# backend/html_document.py
+
+import os
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import List, Optional, Set
+
+import trafilatura
+from dotenv import load_dotenv
+
+from components import detect_components
+from html_parsers import Node, get_parser
+
+load_dotenv()
+
+# Pages this large (in characters) are parsed incrementally, see HTMLDocument
+STREAM_EXTRACT_THRESHOLD = int(os.getenv("STREAM_EXTRACT_THRESHOLD", str(2_000_000)))
+
+HEADING_TAGS = {"h1", "h2", "h3"}
+IMAGE_PARENT_TAGS = {"section", "div", "article", "header", "footer"}
+
+
+@dataclass
+class PageBuckets:
+    """Everything the pipeline pulls out of a page, filled in one traversal."""
+    headings: List[str] = field(default_factory=list)
+    buttons: List[str] = field(default_factory=list)
+    links_as_buttons: List[str] = field(default_factory=list)
+    nav_links: List[str] = field(default_factory=list)
+    paragraphs: List[str] = field(default_factory=list)
+    section_headers: List[str] = field(default_factory=list)
+    layout_classes: List[str] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    images_detailed: List[dict] = field(default_factory=list)
+    buttons_detailed: List[dict] = field(default_factory=list)
+    links_detailed: List[dict] = field(default_factory=list)
+    testimonials: List[dict] = field(default_factory=list)   # cards: quote, author, avatar, classes
+    components: List[dict] = field(default_factory=list)     # pricing tables, feature grids, logo rows
+    # Selector vocabulary used by filter_css
+    tag_names: Set[str] = field(default_factory=set)
+    class_names: Set[str] = field(default_factory=set)
+    id_names: Set[str] = field(default_factory=set)
+
+
+class HTMLDocument:
+    """
+    A scraped page that is parsed at most once and shared by every stage
+    (summary extraction, CSS selector collection, main-content detection).
+    Each view is computed lazily on first access and then cached.
+
+    Pages of STREAM_EXTRACT_THRESHOLD characters or more are `streaming`:
+    their buckets and main content text come from one chunked pass of
+    html_stream's event-driven extractor, and neither a parse tree nor
+    a trafilatura tree is ever built for them.
+
+    Other pages are parsed by the html_parsers backend `parser` (HTML_PARSER
+    by default) into its backend-neutral Node tree.
+    """
+
+    def __init__(self, html: str, streaming: Optional[bool] = None, parser: Optional[str] = None):
+        self.html = html
+        self.streaming = len(html) >= STREAM_EXTRACT_THRESHOLD if streaming is None else streaming
+        self.parser = get_parser(parser).name
+
+    @cached_property
+    def root(self) -> Node:
+        return get_parser(self.parser).parse(self.html)
+
+    @cached_property
+    def _stream(self):
+        from html_stream import extract_streaming, iter_chunks   # html_stream builds on this module
+        return extract_streaming(iter_chunks(self.html))
+
+    @cached_property
+    def main_content_text(self) -> Optional[str]:
+        if self.streaming:
+            return self._stream.main_content_text or None
+        return trafilatura.extract(self.html, include_comments=False, include_tables=True)
+
+    @cached_property
+    def buckets(self) -> PageBuckets:
+        if self.streaming:
+            return self._stream.buckets
+        return _collect_buckets(self.root)
+
+    @property
+    def used_selectors(self) -> Set[str]:
+        """Tag names, `.class` and `#id` selectors present in the page."""
+        b = self.buckets
+        return b.tag_names | {f".{c}" for c in b.class_names} | {f"#{i}" for i in b.id_names}
+
+
+# The most recent get_document result, by hash(html) (computed once per string object)
+_recent: Optional[tuple] = None
+
+
+def get_document(html: str) -> HTMLDocument:
+    """
+    Return the shared HTMLDocument for this HTML string.
+    Stages that only receive the raw string (e.g. filter_css) end up on the
+    same parsed tree as the scraper instead of reparsing it. Only the last
+    page is kept, so earlier pages and their trees are not pinned.
+    """
+    global _recent
+    key = (hash(html), len(html))
+    if _recent is not None and _recent[0] == key and _recent[1].html == html:   # usually the same object
+        return _recent[1]
+    doc = HTMLDocument(html)
+    _recent = (key, doc)
+    return doc
+
+
+def clear_document_cache() -> None:
+    """Drop the document get_document keeps (e.g. once a job is done with its page)."""
+    global _recent
+    _recent = None
+
+
+def _collect_buckets(root: Node) -> PageBuckets:
+    b = PageBuckets()
+    layout_classes = {}
+
+    # Iterative pre-order walk (document order), carrying whether we are
+    # inside a <nav> and the nearest image-parent container.
+    stack = [(child, False, None) for child in reversed(root.parts()) if isinstance(child, Node)]
+    while stack:
+        tag, in_nav, container = stack.pop()
+        name = tag.name
+        classes = tag.classes
+        tag_id = tag.get("id")
+
+        b.tag_names.add(name)
+        b.class_names.update(classes)
+        if tag_id is not None:
+            b.id_names.add(tag_id)
+            b.ids.append(tag_id)
+
+        if name in HEADING_TAGS:
+            b.headings.append(tag.get_text(strip=True))
+        elif name == "button":
+            text = tag.get_text(strip=True)
+            b.buttons.append(text)
+            b.buttons_detailed.append({
+                "text": text,
+                "class": classes,
+                "style": tag.get("style", ""),
+            })
+        elif name == "a":
+            text = tag.get_text(strip=True)
+            if "button" in classes:
+                b.links_as_buttons.append(text)
+            href = tag.get("href")
+            if in_nav and tag.has_attr("href"):
+                b.nav_links.append(href)
+            b.links_detailed.append({
+                "text": text,
+                "href": href,
+                "class": classes,
+                "style": tag.get("style", ""),
+            })
+        elif name == "p":
+            b.paragraphs.append(tag.get_text(strip=True))
+        elif name == "img":
+            b.images_detailed.append({
+                "src": tag.get("src"),
+                "alt": tag.get("alt"),
+                "parent_tag": container.name if container is not None else None,
+                "parent_classes": container.classes if container is not None else [],
+            })
+
+        if name in ("section", "article"):
+            b.section_headers.append(tag.get_text(strip=True))
+        if name in ("div", "section"):
+            layout_classes.update(dict.fromkeys(classes))
+
+        child_in_nav = in_nav or name == "nav"
+        child_container = tag if name in IMAGE_PARENT_TAGS else container
+        for child in reversed(tag.parts()):
+            if isinstance(child, Node):
+                stack.append((child, child_in_nav, child_container))
+
+    b.layout_classes = list(layout_classes)
+    b.testimonials, b.components = detect_components(root)
+    return b
+
@@ -0,0 +1,306 @@
+# backend/html_parsers.py
+
+import os
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Type, Union
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import Comment, Declaration, Doctype, ProcessingInstruction
+from dotenv import load_dotenv
+
+try:
+    from lxml import etree
+except ImportError:  # optional; slower parsers are used instead
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional
+    LexborHTMLParser = None
+
+load_dotenv()
+
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")   # auto | selectolax | lxml | bs4
+PARSER_PREFERENCE = ("selectolax", "lxml", "bs4")  # fastest first, what "auto" picks from
+
+# Text inside these is not page text (BeautifulSoup's get_text() skips it too)
+SKIP_TEXT_TAGS = {"script", "style", "template"}
+
+_NOT_TEXT = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+
+# ───────────────────────────── Document model ─────────────────────────────
+
+class Node:
+    """
+    An element of a parsed page, as extraction code sees it: `name`,
+    `classes`, `get`/`has_attr` for attributes, `get_text` and `parts()`.
+    Every parser backend yields elements with this interface, so
+    extraction never sees a backend's own types. `parts()` is the child
+    elements and text strings in document order; comments, doctypes and
+    text inside SKIP_TEXT_TAGS are left out, and text split only by those
+    is one string.
+    """
+
+    __slots__ = ()
+
+    name: str
+    classes: List[str]
+
+    def parts(self) -> List[Union["Node", str]]:
+        raise NotImplementedError
+
+    def text_strings(self) -> Iterator[str]:
+        """Text of the subtree in document order."""
+        stack = list(reversed(self.parts()))
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                yield item
+            else:
+                stack.extend(reversed(item.parts()))
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        """Like BeautifulSoup's Tag.get_text, over the strings of parts()."""
+        if strip:
+            return separator.join(s for s in (s.strip() for s in self.text_strings()) if s)
+        return separator.join(self.text_strings())
+
+
+class TreeNode(Node):
+    """A Node built from parse events (TreeBuilder); `contents` is its parts()."""
+
+    __slots__ = ("name", "attrs", "classes", "contents")
+
+    def __init__(self, name: str, attrs: Dict[str, str]):
+        self.name = name
+        self.attrs = attrs
+        self.classes: List[str] = (attrs.get("class") or "").split()
+        self.contents: List[Union[Node, str]] = []
+
+    def parts(self) -> List[Union[Node, str]]:
+        return self.contents
+
+    def get(self, key: str, default=None) -> Optional[str]:
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key: str) -> bool:
+        return key in self.attrs
+
+    @property
+    def children(self) -> List[Node]:
+        return [c for c in self.contents if isinstance(c, Node)]
+
+    def __repr__(self) -> str:
+        return f"<Node {self.name} {self.attrs}>"
+
+
+class _SoupNode(Node):
+    """
+    The Node interface on BeautifulSoup's own elements, so the bs4 backend
+    hands out its soup instead of copying it into TreeNodes. Attribute
+    access (`get`, `has_attr`) is bs4's.
+    """
+
+    __slots__ = ()
+
+    @property
+    def classes(self) -> List[str]:
+        return list(self.get("class") or ())   # bs4 splits class into a list already
+
+    def parts(self) -> List[Union[Node, str]]:
+        skip = self.name in SKIP_TEXT_TAGS or any(p.name in SKIP_TEXT_TAGS for p in self.parents)
+        parts: List[Union[Node, str]] = []
+        text: List[str] = []
+        for child in self.contents:
+            if isinstance(child, Tag):
+                if text:
+                    parts.append("".join(text))
+                    text = []
+                parts.append(child)
+            elif not skip and isinstance(child, NavigableString) and not isinstance(child, _NOT_TEXT):
+                text.append(child)
+        if text:
+            parts.append("".join(text))
+        return parts
+
+
+class SoupTag(_SoupNode, Tag):
+    pass
+
+
+class SoupDocument(_SoupNode, BeautifulSoup):
+    """The root of a bs4-parsed page; its elements are SoupTags."""
+
+    def __init__(self, html: str):
+        super().__init__(html, "html.parser", element_classes={Tag: SoupTag})
+
+
+class TreeBuilder:
+    """
+    Builds a Node tree from start/end/data events. The method names follow
+    lxml's parser target interface, so lxml can drive it directly; the
+    other backends walk their own tree and call it the same way.
+    """
+
+    def __init__(self):
+        self.root = TreeNode("[document]", {})
+        self._stack: List[TreeNode] = [self.root]
+        self._skip = 0
+        self._text: List[str] = []   # adjacent data events make one string
+
+    def start(self, name: str, attrs) -> None:
+        self._flush()
+        node = TreeNode(name.lower(), {k.lower(): v or "" for k, v in attrs.items()})
+        self._stack[-1].contents.append(node)
+        self._stack.append(node)
+        self._skip += node.name in SKIP_TEXT_TAGS
+
+    def end(self, name: str = "") -> None:
+        self._flush()
+        if len(self._stack) > 1:
+            self._skip -= self._stack.pop().name in SKIP_TEXT_TAGS
+
+    def data(self, text: str) -> None:
+        if not self._skip:
+            self._text.append(text)
+
+    def close(self) -> TreeNode:
+        self._flush()
+        return self.root
+
+    def _flush(self) -> None:
+        if self._text:
+            self._stack[-1].contents.append("".join(self._text))
+            self._text = []
+
+
+# ───────────────────────────── Backends ─────────────────────────────
+
+class ParserBackend:
+    """
+    An HTML parser. Subclasses implement `parse` and report in `available`
+    whether their library is installed; they are made available by name
+    with @register_parser.
+    """
+    name = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def parse(self, html: str) -> Node:
+        raise NotImplementedError
+
+
+_BACKENDS: Dict[str, Type[ParserBackend]] = {}
+_instances: Dict[str, ParserBackend] = {}
+
+
+def register_parser(name: str) -> Callable[[Type[ParserBackend]], Type[ParserBackend]]:
+    def register(cls: Type[ParserBackend]) -> Type[ParserBackend]:
+        cls.name = name
+        _BACKENDS[name] = cls
+        return cls
+    return register
+
+
+def available_parsers() -> List[str]:
+    """Installed backends, fastest first."""
+    ordered = [n for n in PARSER_PREFERENCE if n in _BACKENDS] + [n for n in _BACKENDS if n not in PARSER_PREFERENCE]
+    return [n for n in ordered if _BACKENDS[n].available()]
+
+
+def get_parser(name: Optional[str] = None) -> ParserBackend:
+    """The shared instance of a backend (HTML_PARSER by default; "auto" is the fastest installed)."""
+    name = name or HTML_PARSER
+    if name == "auto":
+        name = available_parsers()[0]
+    if name not in _instances:
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown HTML parser: {name} (registered: {', '.join(sorted(_BACKENDS))})")
+        if not _BACKENDS[name].available():
+            raise ValueError(f"HTML parser {name} is not installed")
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+def parse_html(html: str, parser: Optional[str] = None) -> Node:
+    return get_parser(parser).parse(html)
+
+
+@register_parser("bs4")
+class BS4Parser(ParserBackend):
+    """BeautifulSoup on the stdlib html.parser: pure Python, always installed, the reference."""
+
+    def parse(self, html: str) -> Node:
+        return SoupDocument(html)
+
+
+@register_parser("lxml")
+class LxmlParser(ParserBackend):
+    """libxml2's HTML parser, with parse events fed straight into the Node tree (no lxml tree)."""
+
+    @classmethod
+    def available(cls) -> bool:
+        return etree is not None
+
+    def parse(self, html: str) -> Node:
+        builder = TreeBuilder()
+        if not html.strip():
+            return builder.close()   # libxml2 rejects empty documents
+        # Bytes with an explicit encoding: lxml refuses str input that carries
+        # an XML encoding declaration, and a <meta charset> must not override it
+        parser = etree.HTMLParser(target=builder, encoding="utf-8")
+        parser.feed(html.encode("utf-8", "replace"))
+        return parser.close()
+
+
+@register_parser("selectolax")
+class SelectolaxParser(ParserBackend):
+    """selectolax's Lexbor engine (C, HTML5 tree construction)."""
+
+    @classmethod
+    def available(cls) -> bool:
+        return LexborHTMLParser is not None
+
+    def parse(self, html: str) -> Node:
+        builder = TreeBuilder()
+        root = LexborHTMLParser(html).root
+        if root is None:
+            return builder.close()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                builder.end()
+            elif node.is_element_node:
+                builder.start(node.tag, node.attributes)
+                stack.append(None)   # end marker
+                stack.extend(reversed(self._template_children(node) if node.tag == "template" else _children(node)))
+            elif node.is_text_node:
+                builder.data(node.text_content)
+        return builder.close()
+
+    @staticmethod
+    def _template_children(node) -> list:
+        # Lexbor keeps template content in a fragment it does not expose;
+        # parse it again from the serialized element (attributes are always
+        # double-quoted there)
+        outer = node.html or ""
+        start = _TEMPLATE_START.match(outer)
+        if start is None:
+            return []
+        fragment = LexborHTMLParser(outer[start.end():-len("</template>")])
+        return [child for part in (fragment.head, fragment.body) if part is not None for child in _children(part)]
+
+
+_TEMPLATE_START = re.compile(r'<template(?:\s+[^\s=>]+(?:="[^"]*")?)*\s*>')
+
+
+def _children(node) -> list:
+    child, children = node.first_child, []
+    while child is not None:
+        children.append(child)
+        child = child.next
+    return children
@@ -0,0 +1,338 @@
+# backend/html_stream.py
+
+import os
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from components import CARD_KEYWORDS, CARD_TAGS
+from html_document import HEADING_TAGS, IMAGE_PARENT_TAGS, PageBuckets
+from html_parsers import SKIP_TEXT_TAGS
+
+load_dotenv()
+
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(64 * 1024)))
+STREAM_MAX_ITEMS = int(os.getenv("STREAM_MAX_ITEMS", "500"))            # entries per bucket
+STREAM_MAX_TEXT = int(os.getenv("STREAM_MAX_TEXT", "2000"))             # chars per text entry
+STREAM_MAX_MAIN_TEXT = int(os.getenv("STREAM_MAX_MAIN_TEXT", "200000"))  # chars of main content
+STREAM_MAX_NAMES = int(os.getenv("STREAM_MAX_NAMES", "20000"))          # distinct tags/classes/ids
+STREAM_MAX_DEPTH = 1000
+
+# Elements html.parser (and BeautifulSoup on top of it) never expect an end tag for
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr",
+}
+# Page chrome left out of the main content text (text in SKIP_TEXT_TAGS is left out everywhere)
+BOILERPLATE_TAGS = {"head", "nav", "header", "footer", "aside", "form", "noscript"}
+# Ends of these start a new line in the main content text
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "th",
+    "div", "section", "article", "main", "dd", "dt", "figcaption",
+}
+MAIN_TEXT_MIN_WORDS = 4   # shorter lines are usually menus, labels and buttons
+
+
+def iter_chunks(html: str, size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    for i in range(0, len(html), size):
+        yield html[i:i + size]
+
+
+class _Text:
+    """Capped get_text() accumulator: stripped strings, joined on read."""
+
+    __slots__ = ("parts", "size", "limit")
+
+    def __init__(self, limit: int):
+        self.parts: List[str] = []
+        self.size = 0
+        self.limit = limit
+
+    def add(self, text: str) -> None:
+        if self.size < self.limit:
+            text = text[:self.limit - self.size]
+            self.parts.append(text)
+            self.size += len(text)
+
+    def join(self, sep: str = "") -> str:
+        return sep.join(self.parts)
+
+
+class _Frame:
+    __slots__ = ("name", "classes", "in_nav", "container", "text", "on_close", "card")
+
+    def __init__(self, name: str, classes: List[str], in_nav: bool, container: Optional[Tuple[str, List[str]]]):
+        self.name = name
+        self.classes = classes
+        self.in_nav = in_nav
+        self.container = container   # (tag, classes) of the nearest image-parent ancestor
+        self.text: Optional[_Text] = None
+        self.on_close: List[Tuple[str, Callable[[str], None]]] = []   # (separator, callback)
+        self.card: Optional[dict] = None
+
+
+class StreamingExtractor(HTMLParser):
+    """
+    Fills the same PageBuckets as html_document's tree walk, but from HTML
+    fed in chunks to an event-driven parser. Only the chain of open
+    elements is kept (no tree), every list bucket stops at `max_items`,
+    every text entry at `max_text` characters and the main content text at
+    `max_main_text`. The page string itself is still held by the caller
+    (it comes from the browser whole, and is stored and fingerprinted as
+    such); what this saves is the parse tree, several times its size.
+
+    Cards follow components.detect_components' rule (outermost card, or the
+    cards of a container holding several side by side); repeated-component
+    detection needs whole subtrees, so `buckets.components` stays empty.
+    The main content text is a heuristic of its own (see _end_line), not
+    trafilatura's; everything else matches the tree walk up to the caps.
+    """
+
+    def __init__(
+        self,
+        max_items: int = STREAM_MAX_ITEMS,
+        max_text: int = STREAM_MAX_TEXT,
+        max_main_text: int = STREAM_MAX_MAIN_TEXT,
+        max_names: int = STREAM_MAX_NAMES,
+    ):
+        super().__init__(convert_charrefs=True)
+        self.max_items = max_items
+        self.max_text = max_text
+        self.max_main_text = max_main_text
+        self.max_names = max_names
+        self.buckets = PageBuckets()
+        self._layout_classes: Dict[str, None] = {}
+        self._stack: List[_Frame] = []
+        self._collecting: List[_Text] = []
+        self._card_state: Dict[int, list] = {}   # id(card) -> [top cards inside, cards kept below]
+        self._dropped: set = set()
+        self._overflow: List[str] = []   # names of open elements deeper than STREAM_MAX_DEPTH, not tracked
+        self._skip = 0              # inside <script>/<style>/...
+        self._boilerplate = 0       # inside <nav>/<header>/...
+        self._text: List[str] = []  # adjacent data events, one string like TreeBuilder's
+        self._line: List[str] = []
+        self._main: List[str] = []
+        self._main_size = 0
+
+    # ─── Parser events ─────────────────────────────
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush_text()
+        if tag in VOID_TAGS:
+            self._element(tag, _attr_dict(attrs))
+            return
+        if len(self._stack) >= STREAM_MAX_DEPTH:
+            self._overflow.append(tag)
+            return
+        self._element(tag, _attr_dict(attrs), push=True)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush_text()
+        self._element(tag, _attr_dict(attrs))
+
+    def handle_endtag(self, tag: str) -> None:
+        # Like BeautifulSoup's html.parser builder: close up to the most recent
+        # open element with this name, ignore stray end tags (and keep the
+        # text around them one string).
+        if tag in self._overflow:
+            self._flush_text()
+            del self._overflow[len(self._overflow) - 1 - self._overflow[::-1].index(tag):]
+            return
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].name == tag:
+                self._flush_text()
+                self._overflow.clear()   # all nested inside it
+                while len(self._stack) > i:
+                    self._close(self._stack.pop())
+                return
+
+    def handle_data(self, data: str) -> None:
+        # Comments split the data events of one text node; join them back first
+        if not self._skip:
+            self._text.append(data)
+
+    def close(self) -> PageBuckets:
+        super().close()
+        self._flush_text()
+        while self._stack:
+            self._close(self._stack.pop())
+        self._end_line()
+        self.buckets.layout_classes = list(self._layout_classes)
+        self.buckets.testimonials = [t for t in self.buckets.testimonials if id(t) not in self._dropped]
+        return self.buckets
+
+    @property
+    def main_content_text(self) -> str:
+        return "\n".join(self._main)
+
+    # ─── Buckets ─────────────────────────────
+
+    def _element(self, name: str, attrs: Dict[str, Optional[str]], push: bool = False) -> None:
+        b = self.buckets
+        parent = self._stack[-1] if self._stack else None
+        in_nav = parent is not None and (parent.in_nav or parent.name == "nav")
+        container = None
+        if parent is not None:
+            container = (parent.name, parent.classes) if parent.name in IMAGE_PARENT_TAGS else parent.container
+        classes = (attrs.get("class") or "").split()
+        tag_id = attrs.get("id")
+
+        self._add_name(b.tag_names, name)
+        for c in classes:
+            self._add_name(b.class_names, c)
+        if tag_id is not None:
+            self._add_name(b.id_names, tag_id)
+            self._append(b.ids, tag_id)
+
+        frame = _Frame(name, classes, in_nav, container)
+        if name in HEADING_TAGS:
+            self._reserve(frame, b.headings)
+        elif name == "button":
+            self._reserve(frame, b.buttons)
+            self._reserve(frame, b.buttons_detailed, {"text": "", "class": classes, "style": attrs.get("style") or ""})
+        elif name == "a":
+            if "button" in classes:
+                self._reserve(frame, b.links_as_buttons)
+            href = attrs.get("href")
+            if in_nav and "href" in attrs:
+                self._append(b.nav_links, href)
+            self._reserve(frame, b.links_detailed, {"text": "", "href": href, "class": classes, "style": attrs.get("style") or ""})
+        elif name == "p":
+            self._reserve(frame, b.paragraphs)
+        elif name == "img":
+            self._append(b.images_detailed, {
+                "src": attrs.get("src"),
+                "alt": attrs.get("alt"),
+                "parent_tag": container[0] if container else None,
+                "parent_classes": container[1] if container else [],
+            })
+            for card in self._open_cards():
+                if card["avatar"] is None:
+                    card["avatar"] = attrs.get("src")
+
+        if name in ("section", "article"):
+            self._reserve(frame, b.section_headers)
+        if name in ("div", "section"):
+            for c in classes:
+                if len(self._layout_classes) < self.max_names:
+                    self._layout_classes.setdefault(c)
+        if name in CARD_TAGS and any(k in c for c in classes for k in CARD_KEYWORDS):
+            card = {"quote": "", "author": None, "avatar": None, "classes": classes}
+            parents = self._open_cards()
+            if self._append(b.testimonials, card):
+                frame.card = card
+                self._card_state[id(card)] = [0, []]
+                if parents:
+                    self._card_state[id(parents[-1])][0] += 1
+                self._on_close(frame, lambda text: card.update(quote=text), sep=" ")
+        if name in ("span", "div", "p") and any("author" in c or "name" in c for c in classes):
+            # card.find(...) semantics: the first match in document order wins
+            waiting = [card for card in self._open_cards() if card["author"] is None]
+            for card in waiting:
+                card["author"] = ""
+            if waiting:
+                self._on_close(frame, lambda text: [card.update(author=text) for card in waiting])
+
+        if not push:
+            self._close(frame, pushed=False)
+            return
+        self._stack.append(frame)
+        self._skip += name in SKIP_TEXT_TAGS
+        self._boilerplate += name in BOILERPLATE_TAGS
+
+    def _close(self, frame: _Frame, pushed: bool = True) -> None:
+        if frame.text is not None:
+            self._collecting.remove(frame.text)
+            for sep, callback in frame.on_close:
+                callback(frame.text.join(sep))
+        if frame.card is not None:
+            self._settle_card(frame.card)
+        if pushed:
+            self._skip -= frame.name in SKIP_TEXT_TAGS
+            self._boilerplate -= frame.name in BOILERPLATE_TAGS
+        if frame.name in BLOCK_TAGS:
+            self._end_line()
+
+    def _open_cards(self) -> List[dict]:
+        return [f.card for f in self._stack if f.card is not None]
+
+    def _settle_card(self, card: dict) -> None:
+        """A card has ended: keep it and drop the cards inside, or, for a container, the reverse."""
+        top_cards, kept_below = self._card_state.pop(id(card))
+        if top_cards >= 2:
+            self._dropped.add(id(card))
+            kept = kept_below
+        else:
+            self._dropped.update(id(c) for c in kept_below)
+            kept = [card]
+        parents = self._open_cards()
+        if parents:
+            self._card_state[id(parents[-1])][1].extend(kept)
+
+    # ─── Helpers ─────────────────────────────
+
+    def _flush_text(self) -> None:
+        if not self._text:
+            return
+        text = "".join(self._text).strip()
+        self._text = []
+        if not text:
+            return
+        for collector in self._collecting:
+            collector.add(text)
+        if not self._boilerplate and self._main_size < self.max_main_text:
+            self._line.append(text)
+
+    def _append(self, bucket: list, item) -> bool:
+        if len(bucket) < self.max_items:
+            bucket.append(item)
+            return True
+        return False
+
+    def _add_name(self, names: set, name: str) -> None:
+        if len(names) < self.max_names:
+            names.add(name)
+
+    def _on_close(self, frame: _Frame, callback: Callable[[str], None], sep: str = "") -> None:
+        """Collect the element's text and hand it to `callback` when the element ends."""
+        if frame.text is None:
+            frame.text = _Text(self.max_text)
+            self._collecting.append(frame.text)
+        frame.on_close.append((sep, callback))
+
+    def _reserve(self, frame: _Frame, bucket: list, entry: Optional[dict] = None) -> None:
+        """
+        Take the element's slot in `bucket` now, so entries stay in document
+        order, and fill in its text when it ends (dict entries: their "text").
+        """
+        if entry is None:
+            if self._append(bucket, ""):
+                index = len(bucket) - 1
+                self._on_close(frame, lambda text: bucket.__setitem__(index, text))
+        elif self._append(bucket, entry):
+            self._on_close(frame, lambda text: entry.__setitem__("text", text))
+
+    def _end_line(self) -> None:
+        if not self._line:
+            return
+        line = " ".join(self._line)
+        self._line = []
+        if len(line.split()) >= MAIN_TEXT_MIN_WORDS and self._main_size < self.max_main_text:
+            line = line[:self.max_main_text - self._main_size]
+            self._main.append(line)
+            self._main_size += len(line) + 1
+
+
+def _attr_dict(attrs: List[Tuple[str, Optional[str]]]) -> Dict[str, str]:
+    # Valueless attributes (`<img alt>`) read as "", as in html_parsers' tree
+    return {name: value or "" for name, value in attrs}
+
+
+def extract_streaming(chunks: Iterable[str], **limits) -> StreamingExtractor:
+    """Feed `chunks` of HTML through a StreamingExtractor and close it."""
+    extractor = StreamingExtractor(**limits)
+    for chunk in chunks:
+        extractor.feed(chunk)
+    extractor.close()
+    return extractor
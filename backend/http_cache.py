@@ -0,0 +1,345 @@
+# backend/http_cache.py
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Mapping, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") not in ("0", "false", "False")
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", Path(__file__).parent / "generated" / "http_cache"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "10000"))
+# Cap for heuristic freshness when a response only has Last-Modified (RFC 9111 §4.2.2)
+HEURISTIC_MAX_AGE = 24 * 3600
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*(s-maxage|max-age)\s*=\s*\"?(\d+)", re.IGNORECASE)
+_CHARSET_RE = re.compile(r"charset=([\w.-]+)", re.IGNORECASE)
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    content_type: str
+    from_cache: bool
+
+    @property
+    def charset(self) -> str:
+        m = _CHARSET_RE.search(self.content_type or "")
+        return m.group(1) if m else "utf-8"
+
+    def text(self) -> str:
+        try:
+            return self.body.decode(self.charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0             # served fresh from disk, no request made
+    revalidated: int = 0      # conditional GET answered with 304
+    misses: int = 0           # full download
+    stale_served: int = 0     # origin failed, stale copy returned
+    bytes_saved: int = 0      # body bytes not transferred thanks to the cache
+    bytes_downloaded: int = 0
+    seconds_saved: float = 0.0  # estimated from the average miss latency
+    _miss_seconds: float = field(default=0.0, repr=False)
+
+    def record_miss(self, size: int, seconds: float) -> None:
+        self.misses += 1
+        self.bytes_downloaded += size
+        self._miss_seconds += seconds
+
+    def record_saving(self, size: int, seconds_spent: float = 0.0) -> None:
+        self.bytes_saved += size
+        if self.misses:
+            self.seconds_saved += max(self._miss_seconds / self.misses - seconds_spent, 0.0)
+
+    def as_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "bytes_saved": self.bytes_saved,
+            "bytes_downloaded": self.bytes_downloaded,
+            "seconds_saved": round(self.seconds_saved, 3),
+        }
+
+
+@dataclass
+class _Entry:
+    url: str
+    body_hash: str
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+    size: int
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+
+def freshness_deadline(headers: Mapping[str, str], now: float) -> Optional[float]:
+    """
+    Absolute time until which a response may be served without revalidation,
+    or None if it must not be stored at all (`no-store`).
+    """
+    cache_control = headers.get("Cache-Control", "")
+    directives = cache_control.lower()
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+    m = _MAX_AGE_RE.findall(cache_control)
+    if m:
+        # s-maxage wins over max-age when both are present
+        ages = dict((k.lower(), int(v)) for k, v in m)
+        age_header = headers.get("Age", "")
+        age = int(age_header) if age_header.isdigit() else 0
+        return now + max(ages.get("s-maxage", ages.get("max-age", 0)) - age, 0)
+    if "Expires" in headers:
+        # Invalid dates ("0", "-1", no zone) mean already expired
+        expires = http_date(headers["Expires"])
+        if expires is None:
+            return now
+        # Relative to the server's clock when it sent its Date
+        date = http_date(headers.get("Date", ""))
+        return now + expires - date if date is not None else expires
+    last_modified = http_date(headers.get("Last-Modified", ""))
+    if last_modified is not None:
+        return now + min(max(now - last_modified, 0) * 0.1, HEURISTIC_MAX_AGE)
+    return now
+
+
+def http_date(value: str) -> Optional[float]:
+    """Timestamp of an HTTP date, or None if it is malformed or has no timezone."""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed.tzinfo is None:   # "-0000" or a missing zone: local time is a guess
+        return None
+    return parsed.timestamp()
+
+
+class HTTPCache:
+    """
+    Persistent, content-addressed HTTP cache.
+
+    Metadata (URL → body hash, validators, expiry, last access) lives in a
+    SQLite index; bodies are stored once per SHA-256 under `bodies/`, so
+    the same file served from several URLs (CDN mirrors, versioned paths)
+    takes disk space once. Stale entries are revalidated with conditional
+    GETs, and the least recently used entries are evicted when the total
+    body size or entry count exceeds its limit.
+    """
+
+    def __init__(
+        self,
+        directory: Path = HTTP_CACHE_DIR,
+        max_bytes: int = HTTP_CACHE_MAX_BYTES,
+        max_entries: int = HTTP_CACHE_MAX_ENTRIES,
+    ):
+        self.directory = Path(directory)
+        self.bodies_dir = self.directory / "bodies"
+        self.bodies_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.directory / "index.sqlite3", check_same_thread=False)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_access ON entries(last_access);
+            CREATE INDEX IF NOT EXISTS entries_body ON entries(body_hash);
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            """
+        )
+
+    # ── index operations (blocking; called through asyncio.to_thread) ──
+
+    def _body_path(self, body_hash: str) -> Path:
+        return self.bodies_dir / body_hash[:2] / body_hash
+
+    def lookup(self, url: str) -> Optional[_Entry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT e.url, e.body_hash, e.content_type, e.etag, e.last_modified, e.expires_at, b.size "
+                "FROM entries e JOIN bodies b ON b.hash = e.body_hash WHERE e.url = ?",
+                (url,),
+            ).fetchone()
+        return _Entry(*row) if row else None
+
+    def read_body(self, entry: _Entry) -> Optional[bytes]:
+        try:
+            return self._body_path(entry.body_hash).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str], now: float) -> None:
+        expires_at = freshness_deadline(headers, now)
+        if expires_at is None:
+            return
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._body_path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        with self._lock, self._db:
+            old = self._db.execute("SELECT body_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            self._db.execute("INSERT OR IGNORE INTO bodies(hash, size) VALUES (?, ?)", (body_hash, len(body)))
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, headers.get("Content-Type", ""), headers.get("ETag"),
+                 headers.get("Last-Modified"), expires_at, now),
+            )
+            if old and old[0] != body_hash:
+                self._drop_body_if_unused(old[0])
+        self.evict()
+
+    def refresh(self, url: str, headers: Mapping[str, str], now: float) -> None:
+        """Update expiry/validators after a 304 Not Modified."""
+        expires_at = freshness_deadline(headers, now)
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE entries SET expires_at = ?, last_access = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (expires_at if expires_at is not None else now, now,
+                 headers.get("ETag"), headers.get("Last-Modified"), url),
+            )
+
+    def touch(self, url: str, now: float) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+
+    def _drop_body_if_unused(self, body_hash: str) -> None:
+        # caller holds the lock and an open transaction
+        if self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone():
+            return
+        self._db.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+        self._body_path(body_hash).unlink(missing_ok=True)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+    def evict(self) -> int:
+        """Evict least recently used entries until both limits hold. Returns entries removed."""
+        removed = 0
+        with self._lock, self._db:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+            count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if total <= self.max_bytes and count <= self.max_entries:
+                return 0
+            for url, body_hash in self._db.execute(
+                "SELECT url, body_hash FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                size = self._db.execute("SELECT size FROM bodies WHERE hash = ?", (body_hash,)).fetchone()
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                count -= 1
+                removed += 1
+                if not self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone():
+                    self._db.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+                    self._body_path(body_hash).unlink(missing_ok=True)
+                    total -= size[0] if size else 0
+        return removed
+
+    # ── async fetch ──
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> Optional[CachedResponse]:
+        """
+        GET `url` through the cache. Returns None on a non-200/304 status;
+        network errors propagate unless a stale copy can be served instead.
+        """
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        entry = await asyncio.to_thread(self.lookup, url)
+        body = await asyncio.to_thread(self.read_body, entry) if entry else None
+        if entry and body is None:
+            entry = None  # index points at a body that was removed from disk
+
+        if entry and entry.is_fresh(now):
+            await asyncio.to_thread(self.touch, url, now)
+            self.stats.hits += 1
+            self.stats.record_saving(entry.size)
+            return CachedResponse(url, body, entry.content_type, from_cache=True)
+
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        started = loop.time()
+        try:
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status == 304 and entry:
+                    await asyncio.to_thread(self.refresh, url, response.headers, now)
+                    self.stats.revalidated += 1
+                    self.stats.record_saving(entry.size, loop.time() - started)
+                    return CachedResponse(url, body, entry.content_type, from_cache=True)
+                if response.status != 200:
+                    return None
+                data = await response.read()
+                resp_headers = response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if entry:
+                self.stats.stale_served += 1
+                return CachedResponse(url, body, entry.content_type, from_cache=True)
+            raise
+
+        self.stats.record_miss(len(data), loop.time() - started)
+        await asyncio.to_thread(self.store, url, data, resp_headers, now)
+        return CachedResponse(url, data, resp_headers.get("Content-Type", ""), from_cache=False)
+
+
+_cache: Optional[HTTPCache] = None
+
+
+def get_http_cache() -> Optional[HTTPCache]:
+    """Process-wide cache instance, or None when HTTP_CACHE_ENABLED=0."""
+    global _cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = HTTPCache()
+    return _cache
@@ -1,17 +1,28 @@
 # backend/inline_css.py
 
-def inline_css(html: str, css: str) -> str:
+import re
+
+_HEAD_CLOSE = re.compile(r"</head\s*>", re.IGNORECASE)
+_HEAD_OPEN = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+_HTML_OPEN = re.compile(r"<html\b[^>]*>", re.IGNORECASE)
+_STYLE_CLOSE = re.compile(r"</(style)", re.IGNORECASE)
+
+
+def inline_css(html: str, css: str, pretty: bool = True) -> str:
     """
-    Inserts the given CSS into the <head> section of the given HTML string.
+    Inserts the given CSS as a <style> element at the end of the page's
+    <head> (after any <meta charset> and <link>s, so it takes precedence),
+    or right after <html>, or at the very start when there is neither.
     Returns the combined HTML as a string.
     """
-    if "<head>" in html:
-        inlined_html = html.replace(
-            "<head>",
-            f"<head>\n  <style>\n{css}\n  </style>\n"
-        )
-    else:
-        # fallback: just prepend the CSS if no <head> tag
-        inlined_html = f"<style>\n{css}\n</style>\n" + html
+    # A literal "</style" in the CSS (e.g. in a content string) would end the element early
+    css = _STYLE_CLOSE.sub(r"<\\/\1", css)
+    style = f"  <style>\n{css}\n  </style>\n" if pretty else f"<style>{css}</style>"
 
-    return inlined_html
+    match = _HEAD_CLOSE.search(html)
+    if match:
+        return html[:match.start()] + style + html[match.start():]
+    match = _HEAD_OPEN.search(html) or _HTML_OPEN.search(html)
+    if match:
+        return html[:match.end()] + ("\n" if pretty else "") + style + html[match.end():]
+    return style.lstrip() + html
@@ -0,0 +1,179 @@
+# backend/interception.py
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Optional
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+from playwright.async_api import Page, Request, Response, Route
+
+load_dotenv()
+
+# Resource types (Playwright's request.resource_type) aborted during scraping
+SCRAPE_BLOCK_RESOURCES = os.getenv("SCRAPE_BLOCK_RESOURCES", "media,font")
+SCRAPE_BLOCK_TRACKERS = os.getenv("SCRAPE_BLOCK_TRACKERS", "1") not in ("0", "false", "False")
+SCRAPE_CAPTURE_CSS = os.getenv("SCRAPE_CAPTURE_CSS", "1") not in ("0", "false", "False")
+# "networkidle" | "load" | "domcontentloaded" | "domstable"
+SCRAPE_WAIT_UNTIL = os.getenv("SCRAPE_WAIT_UNTIL", "domstable")
+SCRAPE_STABLE_QUIET_MS = int(os.getenv("SCRAPE_STABLE_QUIET_MS", "500"))
+SCRAPE_STABLE_TIMEOUT_MS = int(os.getenv("SCRAPE_STABLE_TIMEOUT_MS", "8000"))
+
+# Third-party analytics and ad endpoints (not the companies' own sites);
+# matched on the request host and its parent domains
+TRACKER_HOSTS = frozenset({
+    "google-analytics.com", "analytics.google.com", "googletagmanager.com", "doubleclick.net",
+    "googlesyndication.com", "googleadservices.com", "connect.facebook.net", "clarity.ms",
+    "static.hotjar.com", "script.hotjar.com", "api.segment.io", "cdn.segment.com", "api-js.mixpanel.com",
+    "cdn.mxpnl.com", "api2.amplitude.com", "cdn.amplitude.com", "edge.fullstory.com", "rs.fullstory.com",
+    "hs-analytics.net", "hs-scripts.com", "hs-banner.com", "snap.licdn.com", "px.ads.linkedin.com",
+    "ads-twitter.com", "analytics.tiktok.com", "bat.bing.com", "js-agent.newrelic.com", "nr-data.net",
+    "ingest.sentry.io", "browser.sentry-cdn.com", "cdn.optimizely.com", "logx.optimizely.com",
+})
+# Two-label public suffixes common enough to matter for `site_of` ("example.co.uk")
+_SECOND_LEVEL_SUFFIXES = frozenset({
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "com.au", "net.au", "org.au", "co.jp", "co.nz",
+    "co.in", "co.za", "com.br", "com.mx", "com.cn", "com.sg", "com.tr",
+})
+
+# Tracker scripts are answered with an empty body instead of a network
+# error, so pages that wait on them (e.g. `gtag` queues) still boot.
+_STUB_BODIES = {"script": "", "xhr": "{}", "fetch": "{}"}
+
+# Waits until stylesheets and above-the-fold images have settled and the
+# DOM has been quiet for `quietMs`, or `timeoutMs` elapses.
+DOM_STABLE_SCRIPT = """
+async ([quietMs, timeoutMs]) => {
+  const deadline = Date.now() + timeoutMs;
+  const remaining = () => Math.max(deadline - Date.now(), 0);
+  const within = (p) => Promise.race([p, new Promise(r => setTimeout(r, remaining()))]);
+
+  const sheets = Array.from(document.querySelectorAll('link[rel="stylesheet"]'), link =>
+    link.sheet ? Promise.resolve() : new Promise(r => {
+      link.addEventListener("load", r, { once: true });
+      link.addEventListener("error", r, { once: true });
+    }));
+  const foldImages = Array.from(document.images).filter(img => {
+    const rect = img.getBoundingClientRect();
+    return !img.complete && rect.top < window.innerHeight;
+  }).map(img => new Promise(r => {
+    img.addEventListener("load", r, { once: true });
+    img.addEventListener("error", r, { once: true });
+  }));
+  await within(Promise.all([...sheets, ...foldImages]));
+
+  await new Promise(resolve => {
+    let timer = setTimeout(done, quietMs);
+    const observer = new MutationObserver(() => {
+      clearTimeout(timer);
+      timer = setTimeout(done, Math.min(quietMs, remaining()));
+    });
+    function done() { observer.disconnect(); resolve(); }
+    observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true });
+    setTimeout(done, remaining());
+  });
+}
+"""
+
+
+@dataclass
+class InterceptOptions:
+    block_types: FrozenSet[str] = field(default_factory=frozenset)
+    block_trackers: bool = False
+    capture_css: bool = False
+    wait_until: str = "networkidle"
+
+    @classmethod
+    def from_env(cls) -> "InterceptOptions":
+        return cls(
+            block_types=frozenset(t.strip() for t in SCRAPE_BLOCK_RESOURCES.split(",") if t.strip()),
+            block_trackers=SCRAPE_BLOCK_TRACKERS,
+            capture_css=SCRAPE_CAPTURE_CSS,
+            wait_until=SCRAPE_WAIT_UNTIL,
+        )
+
+    @property
+    def intercepts(self) -> bool:
+        return bool(self.block_types) or self.block_trackers
+
+
+def site_of(url: str) -> str:
+    """The registrable domain of `url`'s host ("www.shop.example.co.uk" → "example.co.uk")."""
+    parts = (urlsplit(url).hostname or "").lower().rstrip(".").split(".")
+    return ".".join(parts[-3:] if ".".join(parts[-2:]) in _SECOND_LEVEL_SUFFIXES else parts[-2:])
+
+
+def is_tracker(url: str, site: Optional[str] = None) -> bool:
+    """Whether `url` is a tracker; never for hosts on `site`, the scraped page's own domain."""
+    host = (urlsplit(url).hostname or "").lower()
+    if site and site_of(url) == site:
+        return False
+    parts = host.split(".")
+    return any(".".join(parts[i:]) in TRACKER_HOSTS for i in range(len(parts) - 1))
+
+
+class NetworkRecorder:
+    """
+    Attaches to a page before navigation: aborts/stubs blocked requests and
+    records stylesheet response bodies straight from the browser, so the
+    backend does not download them a second time. Navigations, and requests
+    to the scraped site's own domain, are never treated as trackers.
+    """
+
+    def __init__(self, options: InterceptOptions):
+        self.options = options
+        self.blocked = 0
+        self.site: Optional[str] = None   # registrable domain of the scraped URL
+        self._css: Dict[str, asyncio.Task] = {}
+
+    async def attach(self, page: Page) -> None:
+        if self.options.intercepts:
+            await page.route("**/*", self._route)
+        if self.options.capture_css:
+            page.on("response", self._on_response)
+
+    async def _route(self, route: Route) -> None:
+        request: Request = route.request
+        kind = request.resource_type
+        if kind == "document" or request.is_navigation_request():
+            await route.continue_()
+            return
+        if self.options.block_trackers and is_tracker(request.url, self.site):
+            self.blocked += 1
+            if kind in _STUB_BODIES:
+                await route.fulfill(status=200, body=_STUB_BODIES[kind])
+            else:
+                await route.abort()
+            return
+        if kind in self.options.block_types:
+            self.blocked += 1
+            await route.abort()
+            return
+        await route.continue_()
+
+    def _on_response(self, response: Response) -> None:
+        if response.request.resource_type == "stylesheet" and response.ok:
+            self._css[response.url] = asyncio.ensure_future(response.text())
+
+    async def wait_until_ready(self, page: Page, url: str, timeout_ms: int = 30000) -> None:
+        """Navigate and wait for the configured readiness condition."""
+        self.site = site_of(url)
+        if self.options.wait_until != "domstable":
+            await page.goto(url, wait_until=self.options.wait_until, timeout=timeout_ms)
+            return
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+        await page.evaluate(DOM_STABLE_SCRIPT, [SCRAPE_STABLE_QUIET_MS, SCRAPE_STABLE_TIMEOUT_MS])
+
+    async def stylesheets(self, timeout: float = 5.0) -> Dict[str, str]:
+        """Recorded stylesheet bodies by URL (only those that finished reading)."""
+        if not self._css:
+            return {}
+        done, pending = await asyncio.wait(self._css.values(), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        return {
+            url: task.result()
+            for url, task in self._css.items()
+            if task in done and not task.exception()
+        }
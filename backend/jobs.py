@@ -0,0 +1,252 @@
+# backend/jobs.py
+
+import asyncio
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from artifacts import get_artifact_store
+from pipeline import PipelineError, run_pipeline
+
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "20"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))   # seconds finished jobs stay queryable
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when the queue is at JOB_QUEUE_MAX."""
+
+
+class Job:
+    def __init__(self, url: str, bypass_cache: bool):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.bypass_cache = bypass_cache
+        self.chunks: List[Tuple[str, str]] = []   # the model's (lang, chunk) pieces so far
+        self.status = "queued"       # queued | running | succeeded | failed | cancelled
+        self.stage: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.artifacts_dir: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+        self._subscribers: List[Tuple[asyncio.Queue, bool]] = []   # (queue, wants chunks)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL
+
+    def snapshot(self, include_result: bool = True) -> dict:
+        data = {
+            "id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "artifacts_dir": self.artifacts_dir,
+        }
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+    def _publish(self) -> None:
+        for queue, _ in self._subscribers:
+            queue.put_nowait(("progress", self.snapshot(include_result=self.finished)))
+
+    def publish_chunk(self, lang: str, chunk: str) -> None:
+        self.chunks.append((lang, chunk))
+        for queue, chunks in self._subscribers:
+            if chunks:
+                queue.put_nowait((lang, {"chunk": chunk}))
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        self._publish()
+
+    def _finish(self, status: str, result: Optional[dict] = None, error: Optional[str] = None,
+                status_code: Optional[int] = None) -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        self.status_code = status_code
+        self.finished_at = time.time()
+        self._done.set()
+        self._publish()
+
+    async def wait(self) -> None:
+        await self._done.wait()
+
+    async def events(self) -> AsyncIterator[dict]:
+        """Current snapshot, then one per stage/status change until the job ends."""
+        async for _, snapshot in self._events(chunks=False):
+            yield snapshot
+
+    def stream_events(self) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        `("progress", snapshot)` events as `events` yields them, with the
+        model's `("html" | "css", {"chunk": …})` pieces in between. Pieces
+        written before subscribing come first, after the snapshot.
+        """
+        return self._events(chunks=True)
+
+    async def _events(self, chunks: bool) -> AsyncIterator[Tuple[str, dict]]:
+        entry = (asyncio.Queue(), chunks)
+        self._subscribers.append(entry)
+        try:
+            snapshot = self.snapshot(include_result=self.finished)
+            recorded = list(self.chunks) if chunks and not self.finished else []
+            yield "progress", snapshot
+            for lang, chunk in recorded:
+                yield lang, {"chunk": chunk}
+            # Driven by what was sent, not self.finished: the job may end while
+            # the consumer handles an event, and the terminal snapshot (with
+            # the result) is then still in the queue
+            while snapshot["status"] not in TERMINAL:
+                event, data = await entry[0].get()
+                yield event, data
+                if event == "progress":
+                    snapshot = data
+        finally:
+            self._subscribers.remove(entry)
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a fixed pool of worker tasks.
+    Submissions beyond `max_queue` waiting jobs are rejected (QueueFull);
+    a submission for a URL that is already queued or running joins the
+    existing job instead of starting another scrape and LLM call.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_MAX):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.jobs: Dict[str, Job] = {}
+        self._inflight: Dict[Tuple[str, bool], Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = 0   # jobs waiting for a worker; cancelled ones stay in _queue until skipped
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def submit(self, url: str, bypass_cache: bool = False) -> Tuple[Job, bool]:
+        """
+        Returns (job, created). Raises QueueFull when at capacity. Every job
+        streams the model's output (Job.chunks), so any submission can
+        join any in-flight job for the same URL.
+        """
+        self.start()
+        self._prune()
+        key = (url, bypass_cache)
+        existing = self._inflight.get(key)
+        if existing is not None and not existing.finished:
+            return existing, False
+        if self.queue_depth >= self.max_queue:
+            raise QueueFull(f"{self.queue_depth} jobs already queued")
+        job = Job(url, bypass_cache)
+        self.jobs[job.id] = job
+        self._inflight[key] = job
+        self._queue.put_nowait(job)
+        self._queued += 1
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            job.task.cancel()   # the worker records the cancellation
+        else:
+            self._queued -= 1
+            self._complete(job, "cancelled")  # still queued; the worker will skip it
+        return job
+
+    def _complete(self, job: Job, status: str, **kwargs) -> None:
+        job._finish(status, **kwargs)
+        key = (job.url, job.bypass_cache)
+        if self._inflight.get(key) is job:
+            del self._inflight[key]
+
+    def _prune(self) -> None:
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if job.finished:        # cancelled while queued
+                continue
+            self._queued -= 1
+            job.status = "running"
+            job.task = asyncio.create_task(self._run(job))
+            try:
+                await asyncio.wait({job.task})
+            except asyncio.CancelledError:
+                job.task.cancel()   # worker shutdown
+                self._complete(job, "cancelled")
+                raise
+            if job.task.cancelled():
+                self._complete(job, "cancelled")
+            elif isinstance(job.task.exception(), PipelineError):
+                e = job.task.exception()
+                self._complete(job, "failed", error=e.detail, status_code=e.status_code)
+            elif job.task.exception() is not None:
+                self._complete(job, "failed", error=str(job.task.exception()), status_code=500)
+            else:
+                self._complete(job, "succeeded", result=job.task.result())
+
+    @staticmethod
+    async def _run(job: Job) -> dict:
+        artifacts = await get_artifact_store().open(job.id)
+        job.artifacts_dir = str(artifacts.directory)
+        return await run_pipeline(job.url, job.bypass_cache, on_stage=job.set_stage, artifacts=artifacts,
+                                  on_chunk=job.publish_chunk)
+
+    def stats(self) -> dict:
+        running = sum(1 for j in self.jobs.values() if j.status == "running")
+        return {
+            "workers": self.workers,
+            "queued": self.queue_depth,
+            "running": running,
+            "max_queue": self.max_queue,
+        }
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
@@ -0,0 +1,72 @@
+# backend/limits.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate_per_minute` acquisitions per minute with
+    bursts of up to `burst`. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute: float = 0, burst: int = 1):
+        self.rate_per_minute = rate_per_minute
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def configure(self, rate_per_minute: float, burst: Optional[int] = None) -> None:
+        self.rate_per_minute = rate_per_minute
+        if burst is not None:
+            self.burst = max(burst, 1)
+            self._tokens = min(self._tokens, self.burst)
+
+    async def acquire(self) -> None:
+        if self.rate_per_minute <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                rate = self.rate_per_minute / 60.0
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / rate)
+
+
+class StageLimits:
+    """
+    Per-stage concurrency caps for a pipeline run (e.g. a batch):
+    `async with limits.stage("browser"): ...`. Stages without a cap run
+    unbounded; the same StageLimits is shared by every item of a batch.
+    """
+
+    def __init__(self, **concurrency: Optional[int]):
+        self._semaphores: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(n) for name, n in concurrency.items() if n
+        }
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+
+@asynccontextmanager
+async def stage_slot(limits: Optional[StageLimits], name: str) -> AsyncIterator[None]:
+    """`limits.stage(name)` that tolerates `limits=None`."""
+    if limits is None:
+        yield
+        return
+    async with limits.stage(name):
+        yield
@@ -0,0 +1,307 @@
+# backend/llm.py
+
+import json
+import os
+import re
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import anthropic
+from dotenv import load_dotenv
+
+from limits import RateLimiter
+from metrics import observe_tokens, span
+from prompt_builder import SYSTEM_PROMPT, estimate_tokens
+
+load_dotenv()
+
+LLM_MODEL = os.getenv("LLM_MODEL", "claude-sonnet-4-20250514")
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "4096"))
+LLM_BACKEND = os.getenv("LLM_BACKEND", "anthropic")   # "anthropic" | "fake"
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))  # requests/minute, 0 = unlimited
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "1") != "0"      # mark the system prompt cacheable
+
+# Shortest prefix the API caches, in tokens (model name prefix -> minimum);
+# a shorter prefix marked with cache_control is processed but never cached
+PROMPT_CACHE_MIN_TOKENS = {"claude-3-haiku": 2048, "claude-3-5-haiku": 2048}
+PROMPT_CACHE_DEFAULT_MIN_TOKENS = 1024
+# Deliberately more characters per token than prompt_builder's estimate:
+# a prefix counted long enough here is long enough in real tokens too
+CACHE_CHARS_PER_TOKEN = 4.5
+
+# Process-wide: every caller (API, jobs, batches) draws from the same budget
+rate_limiter = RateLimiter(LLM_RATE_LIMIT_RPM)
+
+
+def cache_min_tokens(model: str) -> int:
+    return next((n for name, n in PROMPT_CACHE_MIN_TOKENS.items() if model.startswith(name)),
+                PROMPT_CACHE_DEFAULT_MIN_TOKENS)
+
+
+def is_cacheable(text: str, model: str) -> bool:
+    """Whether `text` as a prompt prefix reaches the model's minimum cacheable length."""
+    return len(text) / CACHE_CHARS_PER_TOKEN >= cache_min_tokens(model)
+
+FAKE_RESPONSE = (
+    "```html\n<!DOCTYPE html>\n<html>\n<head>\n<title>Fake</title>\n</head>\n"
+    "<body>\n<header class=\"site-header\"><h1>Fake page</h1></header>\n</body>\n</html>\n```\n\n"
+    "```css\nbody { margin: 0; font-family: sans-serif; }\n.site-header { padding: 1rem; }\n```\n"
+)
+
+
+# ───────────────────────────── Clients ─────────────────────────────
+
+class _FakeStream:
+    def __init__(self, text: str, chunk_size: int, usage: dict):
+        self._text = text
+        self._chunk_size = chunk_size
+        self._usage = usage
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self) -> AsyncIterator[str]:
+        for i in range(0, len(self._text), self._chunk_size):
+            yield self._text[i:i + self._chunk_size]
+
+    async def get_final_message(self):
+        return FakeMessages.message(self._text, self._usage)
+
+
+class FakeMessages:
+    def __init__(self, owner: "FakeAnthropic"):
+        self._owner = owner
+
+    @staticmethod
+    def message(text: str, usage: dict):
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(output_tokens=len(text) // 4, **usage),
+        )
+
+    async def create(self, **kwargs):
+        return self.message(self._owner.response_text, self._owner.record(kwargs))
+
+    def stream(self, **kwargs) -> _FakeStream:
+        return _FakeStream(self._owner.response_text, self._owner.chunk_size, self._owner.record(kwargs))
+
+
+class FakeAnthropic:
+    """
+    Local stand-in for anthropic.AsyncAnthropic (LLM_BACKEND=fake).
+    Returns a canned reply, optionally streamed in small chunks, and keeps
+    every request it received in `requests` for inspection.
+
+    Prompt caching is simulated the way the API does it: the request up to
+    the last `cache_control` block is the prefix, it is cached only when
+    it reaches the model's minimum length (is_cacheable), and only a
+    byte-identical prefix seen before counts as a cache read. `prefixes`
+    keeps each distinct cached prefix, so one entry after many requests
+    shows it is stable.
+    """
+
+    def __init__(self, response_text: str = FAKE_RESPONSE, chunk_size: int = 7):
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.requests: List[dict] = []
+        self.prefixes: List[str] = []
+        self.messages = FakeMessages(self)
+
+    def record(self, request: dict) -> dict:
+        """Store the request and return its usage counts."""
+        self.requests.append(request)
+        blocks = request.get("system") or []
+        if isinstance(blocks, str):
+            blocks = [{"type": "text", "text": blocks}]
+        marked = [i for i, b in enumerate(blocks) if b.get("cache_control")]
+        if marked and not is_cacheable("".join(b["text"] for b in blocks[:marked[-1] + 1]), request["model"]):
+            marked = []   # too short: sent as ordinary input
+        prefix = json.dumps(blocks[:marked[-1] + 1], sort_keys=True) if marked else ""
+        uncached = sum(estimate_tokens(b["text"]) for b in blocks[marked[-1] + 1 if marked else 0:])
+        uncached += sum(estimate_tokens(m["content"]) for m in request["messages"] if isinstance(m["content"], str))
+        usage = {"input_tokens": uncached, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+        if prefix:
+            cached = estimate_tokens(prefix)
+            if prefix in self.prefixes:
+                usage["cache_read_input_tokens"] = cached
+            else:
+                self.prefixes.append(prefix)
+                usage["cache_creation_input_tokens"] = cached
+        return usage
+
+    async def close(self) -> None:
+        pass
+
+
+_client = None
+
+
+def get_client():
+    """Shared async client, created on first use and reused across requests."""
+    global _client
+    if _client is None:
+        if LLM_BACKEND == "fake":
+            _client = FakeAnthropic()
+        else:
+            _client = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    return _client
+
+
+def set_client(client) -> None:
+    """Swap the shared client (e.g. for a FakeAnthropic in tests)."""
+    global _client
+    _client = client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# ───────────────────────────── Calls ─────────────────────────────
+
+def build_request(prompt: str, system: str = SYSTEM_PROMPT) -> dict:
+    """
+    Keyword arguments for messages.create/stream. The static instructions
+    come first as a system block marked for prompt caching (when long
+    enough to be cached); only the per-site `prompt` follows, so
+    consecutive requests share the prefix.
+    """
+    block = {"type": "text", "text": system}
+    if LLM_PROMPT_CACHE and is_cacheable(system, LLM_MODEL):
+        block["cache_control"] = {"type": "ephemeral"}
+    return {
+        "model": LLM_MODEL,
+        "max_tokens": LLM_MAX_TOKENS,
+        "system": [block],
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+def _observe_usage(usage) -> None:
+    observe_tokens(
+        usage.input_tokens,
+        usage.output_tokens,
+        cache_read=getattr(usage, "cache_read_input_tokens", None),
+        cache_write=getattr(usage, "cache_creation_input_tokens", None),
+    )
+
+
+async def generate(prompt: str) -> str:
+    """Send the prompt and return the concatenated text of the reply."""
+    await rate_limiter.acquire()
+    async with span("llm_call"):
+        response = await get_client().messages.create(**build_request(prompt))
+    _observe_usage(response.usage)
+    return "".join(part.text for part in response.content if hasattr(part, "text"))
+
+
+async def stream(prompt: str) -> AsyncIterator[str]:
+    """Yield the reply's text deltas as they arrive."""
+    await rate_limiter.acquire()
+    async with span("llm_call"), get_client().messages.stream(**build_request(prompt)) as s:
+        async for text in s.text_stream:
+            yield text
+        final = await s.get_final_message()
+    _observe_usage(final.usage)
+
+
+# ───────────────────────────── Fences ─────────────────────────────
+
+def extract_code(block_type: str, text: str) -> str:
+    """
+    Body of the first ```block_type fence. The language is the first
+    whitespace-separated word after the backticks (any case); the rest of
+    that line already belongs to the body.
+    """
+    fence = rf"```{block_type}(?!\S)\s*(.*?)\s*```"
+    match = re.search(fence, text, re.DOTALL | re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    if block_type == "css":
+        fallback = re.search(r"```css(?!\S)\s*(.*)$", text, re.DOTALL | re.IGNORECASE)
+        if fallback:
+            return fallback.group(1).strip()
+    return ""
+
+
+_WHITESPACE = re.compile(r"\s")
+
+
+class FenceParser:
+    """
+    Incremental parser for ```lang fenced blocks in streamed model output.
+    `feed` returns (lang, chunk) pieces of fence bodies as soon as they are
+    known not to be part of a closing fence. Like `extract_code`, the
+    language is the first word after the backticks, only the first block
+    of each language counts, and an unterminated trailing ```css block is
+    still accepted at `close`.
+    """
+
+    def __init__(self, languages: Tuple[str, ...] = ("html", "css")):
+        self.languages = languages
+        self.blocks: Dict[str, List[str]] = {}
+        self.closed: Dict[str, bool] = {}
+        self._buffer = ""
+        self._lang: Optional[str] = None   # language of the open fence, "" if ignored
+        self._in_fence = False
+        self._body_started = False         # leading whitespace of a body is dropped
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        self._buffer += text
+        events: List[Tuple[str, str]] = []
+        while True:
+            if not self._in_fence:
+                start = self._buffer.find("```")
+                if start == -1:
+                    self._buffer = self._buffer[-2:]  # may hold the start of a fence
+                    return events
+                word_end = _WHITESPACE.search(self._buffer, start + 3)
+                if word_end is None:
+                    self._buffer = self._buffer[start:]  # wait for the end of the language word
+                    return events
+                lang = self._buffer[start + 3:word_end.start()].lower()
+                self._lang = lang if lang in self.languages and lang not in self.blocks else ""
+                if self._lang:
+                    self.blocks[self._lang] = []
+                self._in_fence = True
+                self._body_started = False
+                self._buffer = self._buffer[word_end.start():]
+                continue
+            end = self._buffer.find("```")
+            if end == -1:
+                body, self._buffer = self._buffer[:-2], self._buffer[-2:]
+                self._emit(body, events)
+                return events
+            self._emit(self._buffer[:end], events)
+            if self._lang:
+                self.closed[self._lang] = True
+            self._in_fence = False
+            self._lang = None
+            self._buffer = self._buffer[end + 3:]
+
+    def _emit(self, body: str, events: List[Tuple[str, str]]) -> None:
+        if not self._body_started:
+            body = body.lstrip()
+            self._body_started = bool(body)
+        if body and self._lang:
+            self.blocks[self._lang].append(body)
+            events.append((self._lang, body))
+
+    def close(self) -> List[Tuple[str, str]]:
+        events: List[Tuple[str, str]] = []
+        if self._in_fence:
+            self._emit(self._buffer, events)
+        self._buffer = ""
+        return events
+
+    def result(self, lang: str) -> str:
+        if lang not in self.blocks or (not self.closed.get(lang) and lang != "css"):
+            return ""
+        return "".join(self.blocks[lang]).strip()
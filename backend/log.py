@@ -0,0 +1,21 @@
+# backend/log.py
+
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "[%(levelname)s] %(name)s: %(message)s"
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """
+    Configure the root logger once for the API and the CLIs. Modules log
+    through `logging.getLogger(__name__)` with %-style arguments, so
+    disabled levels never format their messages.
+    """
+    logging.basicConfig(level=(level or LOG_LEVEL).upper(), format=LOG_FORMAT)
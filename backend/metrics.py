@@ -0,0 +1,135 @@
+# backend/metrics.py
+
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds: from in-page work (ms) up to slow LLM calls (minutes)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Bytes: 1 KB … 16 MB, powers of four
+BYTE_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+# Tokens: 100 … ~200k
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 200000)
+
+
+class Histogram:
+    """
+    Minimal Prometheus histogram with one label. `observe` is a bisect and
+    two additions under a lock, so it is cheap enough for every request.
+    """
+
+    def __init__(self, name: str, help: str, label: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, Tuple[List[int], List[float]]] = {}   # value -> (counts, [sum, count])
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = ([0] * len(self.buckets), [0.0, 0])
+            counts, totals = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {total:g}')
+                lines.append(f'{self.name}_count{{{self.label}="{value}"}} {count}')
+        return lines
+
+    def summary(self) -> Dict[str, dict]:
+        """{label value: {count, sum}} for /health-style JSON views."""
+        with self._lock:
+            return {v: {"count": t[1], "sum": round(t[0], 6)} for v, (_, t) in self._series.items()}
+
+
+STAGE_SECONDS = Histogram(
+    "cloner_stage_duration_seconds", "Time spent in each pipeline stage.", "stage", TIME_BUCKETS,
+)
+PAYLOAD_BYTES = Histogram(
+    "cloner_payload_bytes", "Size of documents flowing through the pipeline (characters for text).", "kind", BYTE_BUCKETS,
+)
+LLM_TOKENS = Histogram(
+    "cloner_llm_tokens", "Prompt, response and prompt-cache token counts per LLM call.", "direction", TOKEN_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "cloner_prompt_tokens", "Estimated prompt tokens per prompt section.", "section", TOKEN_BUCKETS,
+)
+HISTOGRAMS = [STAGE_SECONDS, PAYLOAD_BYTES, LLM_TOKENS, PROMPT_TOKENS]
+
+
+class span:
+    """
+    Times a block into STAGE_SECONDS, as `with span("filter_css"):` or
+    `async with span("llm_call"):`. Failed blocks are recorded too.
+    """
+
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        STAGE_SECONDS.observe(self.stage, time.perf_counter() - self._start)
+        return False
+
+    async def __aenter__(self) -> "span":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc) -> bool:
+        return self.__exit__(*exc)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a duration measured elsewhere (e.g. inside the page)."""
+    STAGE_SECONDS.observe(stage, seconds)
+
+
+def observe_bytes(kind: str, size: int) -> None:
+    """
+    Record a document's size. Text is measured as len(text), not encoded:
+    the same for ASCII, and encoding a multi-MB page just to count it
+    would cost more than the metric is worth.
+    """
+    PAYLOAD_BYTES.observe(kind, size)
+
+
+def observe_tokens(input_tokens: Optional[int], output_tokens: Optional[int],
+                   cache_read: Optional[int] = None, cache_write: Optional[int] = None) -> None:
+    """`input` counts uncached prompt tokens only; prompt-cache reads and writes are separate."""
+    for direction, count in (("input", input_tokens), ("output", output_tokens),
+                             ("cache_read", cache_read), ("cache_write", cache_write)):
+        if count is not None:
+            LLM_TOKENS.observe(direction, count)
+
+
+def observe_prompt_tokens(section: str, tokens: int) -> None:
+    PROMPT_TOKENS.observe(section, tokens)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,243 @@
+# backend/output.py
+#
+# The output stage: turns the model's HTML and CSS into the response body
+# (unused CSS pruned, markup and stylesheet minified) and encodes
+# response bodies for the API (ETags, gzip/brotli).
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from css_rules import AtRule, Rule, RuleIndex, StyleRule, parse_stylesheet, serialize, split_declarations
+from html_document import HTMLDocument
+from inline_css import inline_css
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used instead
+    brotli = None
+
+load_dotenv()
+
+OUTPUT_MINIFY = os.getenv("OUTPUT_MINIFY", "1") not in ("0", "false", "False")        # minify html, css and combined_html
+OUTPUT_PRUNE_CSS = os.getenv("OUTPUT_PRUNE_CSS", "1") not in ("0", "false", "False")  # drop unused rules
+OUTPUT_COMPRESS_MIN_BYTES = int(os.getenv("OUTPUT_COMPRESS_MIN_BYTES", "1024"))
+OUTPUT_ENCODED_CACHE_SIZE = int(os.getenv("OUTPUT_ENCODED_CACHE_SIZE", "64"))  # compressed bodies kept
+
+# Response shapes: which fields of the result are sent
+RESPONSE_SHAPES = {
+    "full": ("combined_html", "html", "css"),
+    "combined": ("combined_html",),
+    "parts": ("html", "css"),
+}
+
+# Elements whose contents are kept byte for byte by minify_html
+RAW_ELEMENTS = {"pre", "textarea", "script", "style"}
+# A comment, or a start/end tag (quoted attribute values may contain ">")
+_HTML_TAG = re.compile(r"""<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)(?:[^>"']|"[^"]*"|'[^']*')*>""", re.DOTALL)
+_TAG_SPACE = re.compile(r"""("[^"]*"|'[^']*')|\s+""")
+_WHITESPACE = re.compile(r"\s+")
+# Strings are kept, comments dropped, whitespace runs collapsed
+_CSS_TOKEN = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/|(\s+)""", re.DOTALL)
+_CSS_PUNCT_SPACE = re.compile(r"\s*([{};])\s*")
+_COMBINATOR_SPACE = re.compile(r"\s*([>+~,])\s*")
+_STATEMENT_AT_RULES = ("import", "charset", "namespace")
+
+
+# ───────────────────────────── Minify & prune ─────────────────────────────
+
+def _collapse_css(text: str) -> str:
+    return _CSS_TOKEN.sub(lambda m: m.group(1) or (" " if m.group(2) else ""), text).strip()
+
+
+def _minify_selector(selector: str) -> str:
+    # Strings and attribute values (`[title="a > b"]`) are rare enough in
+    # selectors to be left as they are
+    collapsed = _collapse_css(selector)
+    if '"' in collapsed or "'" in collapsed:
+        return collapsed
+    return _COMBINATOR_SPACE.sub(r"\1", collapsed)
+
+
+def _minify_body(body: str) -> str:
+    if "{" in body:   # nested rules: only squeeze whitespace
+        return _CSS_PUNCT_SPACE.sub(r"\1", _collapse_css(body)).rstrip(";")
+    return ";".join(f"{name}:{_collapse_css(value)}" for name, value in split_declarations(body))
+
+
+def _minify_rule(rule: Rule) -> str:
+    if isinstance(rule, StyleRule):
+        return f"{','.join(_minify_selector(s) for s in rule.selectors)}{{{_minify_body(rule.body)}}}"
+    head = f"@{rule.name} {_collapse_css(rule.prelude)}".rstrip()
+    if rule.children is not None:
+        return f"{head}{{{''.join(_minify_rule(r) for r in rule.children)}}}"
+    if rule.body is not None:
+        body = _CSS_PUNCT_SPACE.sub(r"\1", _collapse_css(rule.body)).rstrip(";")
+        return f"{head}{{{body}}}"
+    return f"{head};"
+
+
+def minify_css(css: str, rules: Optional[List[Rule]] = None) -> str:
+    """Comments, optional whitespace and last semicolons removed; rules unchanged."""
+    return "".join(_minify_rule(rule) for rule in (rules if rules is not None else parse_stylesheet(css)))
+
+
+def minify_html(html: str) -> str:
+    """
+    Comments removed and whitespace runs in text collapsed to one space
+    (or one newline). Attribute values and the contents of RAW_ELEMENTS
+    are left as they are; whitespace between elements is never removed
+    entirely, since between inline elements it renders.
+    """
+    out: List[str] = []
+    pos = 0
+    while (match := _HTML_TAG.search(html, pos)) is not None:
+        out.append(_collapse_text(html[pos:match.start()]))
+        pos = match.end()
+        tag = match.group()
+        if match.group(2) is None:   # comment
+            if tag.startswith("<!--[if"):
+                out.append(tag)
+            continue
+        out.append(_TAG_SPACE.sub(lambda m: m.group(1) or " ", tag))
+        name = match.group(2).lower()
+        if not match.group(1) and name in RAW_ELEMENTS and not tag.endswith("/>"):
+            end = re.compile(rf"</{name}\s*>", re.IGNORECASE).search(html, pos)
+            end_at = end.end() if end else len(html)
+            out.append(html[pos:end_at])
+            pos = end_at
+    out.append(_collapse_text(html[pos:]))
+    return "".join(out).strip()
+
+
+def _collapse_text(text: str) -> str:
+    return _WHITESPACE.sub(lambda m: "\n" if "\n" in m.group() else " ", text)
+
+
+def prune_css(rules: List[Rule], html: str) -> List[Rule]:
+    """
+    The rules that can apply to `html` (as in filter_css), keeping @import,
+    @charset and @namespace statements, which the generated sheet needs
+    for its web fonts.
+    """
+    used = HTMLDocument(html, streaming=False).used_selectors
+    statements = [r for r in rules if isinstance(r, AtRule) and r.name.lower() in _STATEMENT_AT_RULES]
+    return statements + RuleIndex(rules).filter(used)
+
+
+def render_output(html: str, css: str) -> Tuple[dict, Dict[str, float]]:
+    """
+    The result body for a generation, and per-step seconds. `html` is the
+    model's markup, `css` its stylesheet without unused rules (both
+    minified with OUTPUT_MINIFY), `combined_html` the preview page with
+    that stylesheet inlined. Module-level so it can run in the CPU pool.
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    rules = parse_stylesheet(css)
+    if OUTPUT_PRUNE_CSS and html:
+        pruned = prune_css(rules, html)
+        if pruned != rules:   # otherwise keep the sheet exactly as written
+            rules = pruned
+            css = serialize(rules)
+    timings["output_prune"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if OUTPUT_MINIFY:
+        # The parts are sent next to combined_html by default, so they are minified too
+        html, css = minify_html(html), minify_css(css, rules)
+        combined = inline_css(html, css, pretty=False)
+    else:
+        combined = inline_css(html, css)
+    timings["output_minify"] = time.perf_counter() - start
+    return {"combined_html": combined, "html": html, "css": css}, timings
+
+
+def shape_result(result: dict, shape: str = "full") -> dict:
+    return {key: result[key] for key in RESPONSE_SHAPES[shape] if key in result}
+
+
+# ───────────────────────────── Response encoding ─────────────────────────────
+
+def body_etag(body: bytes) -> str:
+    # Weak: the same entity is sent with different content encodings
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    opaque = etag[2:]
+    return "*" in tags or any(t == etag or t.removeprefix("W/") == opaque for t in tags)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best of br (with the brotli package) and gzip the client accepts, or None."""
+    weights: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding.strip():
+            weights[coding.strip().lower()] = q
+    offered = ("br", "gzip") if brotli is not None else ("gzip",)   # preferred first
+    ranked = sorted(offered, key=lambda c: -weights.get(c, weights.get("*", 0.0)))
+    return next((c for c in ranked if weights.get(c, weights.get("*", 0.0)) > 0), None)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class EncodedBodies:
+    """
+    LRU of compressed response bodies keyed by (etag, encoding), so a
+    result served repeatedly (cache hits, polling clients) is compressed
+    once per encoding.
+    """
+
+    def __init__(self, max_entries: int = OUTPUT_ENCODED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body: bytes, etag: str, encoding: str) -> bytes:
+        key = (etag, encoding)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = compress_body(body, encoding)
+        with self._lock:
+            self._entries[key] = data
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+encoded_bodies = EncodedBodies()
@@ -0,0 +1,116 @@
+# backend/page_analysis.py
+#
+# The CPU-bound page stages, importable without the browser stack so that
+# cpu_pool workers stay light. Functions submitted to the pool take and
+# return plain strings, lists and dicts to keep pickling cheap.
+#
+# Workers parse a fresh HTMLDocument per call: every page is new to them,
+# so a parse cache there would only pin recent trees in memory. Chunk
+# summaries are filled in by the parent (add_summaries), where the
+# summary_cache memo is shared across pages and reported by /health.
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from critical_css import extract_critical_css
+from filter_css import filter_css
+from html_document import HTMLDocument, get_document
+from summarize_utils import chunk_text, summarize_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def extract_important_pieces(html: str) -> dict:
+    # One shared parse: filter_css and later stages reuse this document
+    return summarize_document(get_document(html))
+
+
+def summarize_document(doc: HTMLDocument, summarize: bool = True) -> dict:
+    # --- FIX: Use trafilatura.extract to get main content as plain text ---
+    main_content_text = doc.main_content_text
+    main_content_html = None  # Not available directly from trafilatura
+
+    # --- NEW: Chunk and summarize the main content text ---
+    main_content_chunks = []
+    main_content_summaries = []
+    if main_content_text:
+        main_content_chunks = chunk_text(main_content_text, max_words=200)
+        if summarize:
+            main_content_summaries = summarize_chunks(main_content_chunks)
+
+    # One traversal fills every bucket (headings, buttons, links, images, ids, classes),
+    # one bottom-up pass finds cards and repeated components
+    buckets = doc.buckets
+    content_paragraphs = [p for p in buckets.paragraphs if len(p.split()) > 5]
+
+    summary = {
+        "headings": buckets.headings,
+        "buttons": buckets.buttons + buckets.links_as_buttons,
+        "nav_links": buckets.nav_links,
+        "paragraphs": content_paragraphs[:5],
+        "section_headers": buckets.section_headers,
+        "layout_classes": buckets.layout_classes[:20],
+        "ids": buckets.ids[:20],
+        # --- NEW: Add main content and text ---
+        "main_content_html": main_content_html,
+        "main_content_text": main_content_text,
+        # --- NEW: Add chunks and summaries ---
+        "main_content_chunks": main_content_chunks,
+        "main_content_summaries": main_content_summaries,
+        # --- ENHANCED: Add detailed images, buttons, links, testimonials ---
+        "images_detailed": buckets.images_detailed,
+        "buttons_detailed": buckets.buttons_detailed,
+        "links_detailed": buckets.links_detailed,
+        "testimonials": buckets.testimonials,
+        # None when not detected (streamed pages), as opposed to none found
+        "components": None if doc.streaming else buckets.components,
+    }
+
+    # Building the previews is the expensive part; skip it unless debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted Summary:")
+        for key, val in summary.items():
+            if isinstance(val, list):
+                logger.debug("  %s: %s%s", key, val[:3], "..." if len(val) > 3 else "")  # Preview first few items
+            else:
+                logger.debug("  %s: %s%s", key, str(val)[:60], "..." if val and len(str(val)) > 60 else "")
+
+    return summary
+
+
+def extract_page(html: str) -> Tuple[dict, List[str]]:
+    """
+    Summary plus the page's selector vocabulary, from one parse. The
+    selectors let CSS filtering run later without sending the HTML again.
+    The chunk summaries are left empty for add_summaries in the parent.
+    """
+    doc = HTMLDocument(html)
+    return summarize_document(doc, summarize=False), sorted(doc.used_selectors)
+
+
+def add_summaries(summary: dict) -> dict:
+    """Fill in main_content_summaries from the chunks extract_page returned."""
+    summary["main_content_summaries"] = summarize_chunks(summary["main_content_chunks"])
+    return summary
+
+
+def filter_and_extract_critical(css: str, selectors: List[str], html: Optional[str] = None) -> Tuple[int, str, float, float]:
+    """
+    (filtered CSS size, critical CSS, filter seconds, critical seconds).
+    Only the critical CSS is needed downstream, so the filtered sheet stays
+    in the worker. Pass `html` instead of `selectors` to collect them here.
+    """
+    start = time.perf_counter()
+    used = set(selectors) if html is None else HTMLDocument(html).used_selectors
+    filtered = filter_css(css, used)
+    filtered_at = time.perf_counter()
+    critical = extract_critical_css(filtered)
+    return len(filtered), critical, filtered_at - start, time.perf_counter() - filtered_at
+
+
+def warm_up() -> None:
+    """Run the parsers once so the first real page does not pay for lazy setup."""
+    page = "<html><body><div class='card'><h1>Warm</h1><p>Up the parsers.</p></div></body></html>"
+    summary, selectors = extract_page(page)
+    filter_and_extract_critical("body { margin: 0 } .card { color: red }", selectors)
@@ -0,0 +1,67 @@
+# backend/page_script.py
+
+# Common cookie/consent/modal close buttons, tried in order
+POPUP_SELECTORS = [
+    '[id*="cookie"] button', '[class*="cookie"] button', '[id*="consent"] button', '[class*="consent"] button',
+    '[aria-label*="close"]', '.close', '.modal-close', '.popup-close', '[data-dismiss]'
+]
+
+# Elements whose computed styles are reported back as design hints
+STYLE_HINT_SELECTORS = ["body", "header", "nav", "h1", "h2", "h3", "p", "a", "button", "footer"]
+
+# Runs inside the page in a single `page.evaluate` round trip: dismisses
+# visible banners matching POPUP_SELECTORS, then returns everything the
+# scraper needs (title, asset URLs, serialized HTML, computed-style hints)
+# plus how long the dismissal and extraction phases took, in milliseconds.
+EXTRACT_SCRIPT = """
+async ([popupSelectors, hintSelectors]) => {
+  const t0 = performance.now();
+  const dismissed = [];
+  for (const sel of popupSelectors) {
+    let el;
+    try { el = document.querySelector(sel); } catch (e) { continue; }
+    if (!el) continue;
+    const rect = el.getBoundingClientRect();
+    const cs = getComputedStyle(el);
+    if (!rect.width || !rect.height || cs.visibility === "hidden" || cs.display === "none") continue;
+    try { el.click(); dismissed.push(sel); } catch (e) {}
+  }
+  // Give click handlers a moment to remove the banner before serializing
+  if (dismissed.length) await new Promise(r => setTimeout(r, 300));
+  const t1 = performance.now();
+
+  const urls = (sel, prop) => Array.from(document.querySelectorAll(sel), e => e[prop]).filter(Boolean);
+
+  const styleHints = {};
+  for (const sel of hintSelectors) {
+    const el = document.querySelector(sel);
+    if (!el) continue;
+    const cs = getComputedStyle(el);
+    styleHints[sel] = {
+      color: cs.color,
+      backgroundColor: cs.backgroundColor,
+      fontFamily: cs.fontFamily,
+      fontSize: cs.fontSize,
+      fontWeight: cs.fontWeight,
+      lineHeight: cs.lineHeight,
+      padding: cs.padding,
+      margin: cs.margin,
+      borderRadius: cs.borderRadius,
+      display: cs.display,
+    };
+  }
+
+  const doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) : "";
+  const result = {
+    title: document.title,
+    stylesheets: urls('link[rel="stylesheet"]', "href"),
+    scripts: urls("script[src]", "src"),
+    images: urls("img[src]", "src"),
+    html: doctype + document.documentElement.outerHTML,
+    styleHints,
+    dismissed,
+  };
+  result.timings = { dismissMs: t1 - t0, extractMs: performance.now() - t1 };
+  return result;
+}
+"""
@@ -0,0 +1,248 @@
+# backend/pipeline.py
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import llm
+from scraper import scrape_website
+from recreate_site import (
+    build_summary_and_minimal_html,
+    format_prompt
+)
+from cpu_pool import get_cpu_pool
+from page_analysis import filter_and_extract_critical
+from output import render_output
+from limits import StageLimits, stage_slot
+from artifacts import JobArtifacts, get_artifact_store
+from assets import ASSETS_ENABLED, AssetStage, collect_image_urls
+from metrics import observe_bytes, observe_stage
+from generation_cache import get_generation_cache, page_fingerprint, prompt_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Stage names reported to progress callbacks, in order
+STAGES = ("scraping", "filtering", "prompting", "generating", "done")
+
+StageCallback = Callable[[str], None]
+ChunkCallback = Callable[[str, str], None]   # (lang, chunk) of the model's html/css as it is written
+
+
+class PipelineError(Exception):
+    """A pipeline stage failed; `status_code` is the HTTP status to report."""
+
+    def __init__(self, stage: str, detail: str, status_code: int = 500):
+        super().__init__(detail)
+        self.stage = stage
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass
+class PreparedGeneration:
+    url: str
+    prompt: Optional[str] = None
+    cached_result: Optional[dict] = None
+    page_fp: Optional[str] = None
+    prompt_fp: Optional[str] = None
+    artifacts: Optional[JobArtifacts] = None
+    assets: Optional[AssetStage] = None
+
+    def close(self) -> None:
+        if self.assets is not None:
+            self.assets.close()
+        if self.artifacts is not None:
+            self.artifacts.close()
+
+
+def _notify(on_stage: Optional[StageCallback], stage: str) -> None:
+    if on_stage is not None:
+        on_stage(stage)
+
+
+async def prepare_prompt(
+    url: str,
+    bypass_cache: bool = False,
+    on_stage: Optional[StageCallback] = None,
+    artifacts: Optional[JobArtifacts] = None,
+    limits: Optional[StageLimits] = None,
+) -> PreparedGeneration:
+    """
+    Scrape, save context, filter CSS and build the prompt.
+    Stops early with `cached_result` set when the generation cache already
+    has an answer for this scrape or for this exact prompt input.
+    Files go to `artifacts` (a fresh job directory in the artifact store
+    when not given).
+    """
+    if artifacts is None:
+        artifacts = await get_artifact_store().open(uuid.uuid4().hex)
+    prepared = PreparedGeneration(url=url, artifacts=artifacts)
+    try:
+        await _prepare(prepared, bypass_cache, on_stage, limits)
+    except BaseException:
+        prepared.close()   # cancel the image prefetch; nobody will localize this page
+        raise
+    return prepared
+
+
+async def _prepare(
+    prepared: PreparedGeneration,
+    bypass_cache: bool,
+    on_stage: Optional[StageCallback],
+    limits: Optional[StageLimits],
+) -> None:
+    url, artifacts = prepared.url, prepared.artifacts
+    cache = get_generation_cache()
+
+    # ─── 1) Scrape ─────────────────────────────
+    _notify(on_stage, "scraping")
+    try:
+        context = await scrape_website(url, limits=limits, artifacts=artifacts)
+    except Exception as e:
+        raise PipelineError("scraping", f"Scraping failed: {e}") from e
+
+    context_dict = context.model_dump()  # dict with keys: title, images, summary, css_contents, html, …
+    full_html = context_dict.get("html", "")
+    raw_css = context_dict.get("css_contents", "")
+
+    # Start downloading the page's images now, so they arrive while the model writes
+    if ASSETS_ENABLED:
+        prepared.assets = AssetStage(str(context_dict.get("url") or url))
+        prepared.assets.prefetch(collect_image_urls(context_dict))
+
+    # Cheap pre-check: unchanged scrape of a URL we already generated
+    prepared.page_fp = page_fingerprint(full_html, raw_css)
+    if not bypass_cache:
+        prepared.cached_result = await asyncio.to_thread(cache.get_for_page, url, prepared.page_fp, llm.LLM_MODEL)
+        if prepared.cached_result is not None:
+            logger.info("Generation cache: unchanged page, reusing result for %s", url)
+            return
+
+    # ─── 2) Save raw context (compact, compressed, written off the event loop) ───
+    await artifacts.write_json("context.json", context_dict, compressed=True)
+
+    # ─── 3) Filter CSS + build critical CSS (one worker call, off the event loop) ───
+    _notify(on_stage, "filtering")
+    # Selectors come from the scrape; the HTML is only sent when they are missing
+    selectors = context.used_selectors
+    filtered_size, critical_css, filter_seconds, critical_seconds = await get_cpu_pool().run(
+        filter_and_extract_critical, raw_css, selectors, None if selectors else full_html,
+    )
+    observe_stage("filter_css", filter_seconds)
+    observe_stage("critical_css", critical_seconds)
+    observe_bytes("filtered_css", filtered_size)
+    observe_bytes("critical_css", len(critical_css))
+
+    # ─── 4) Build summary + minimal HTML snippet ─────────────────────────────
+    _notify(on_stage, "prompting")
+    prompt_start = time.perf_counter()
+    summary_json_obj, minimal_html = build_summary_and_minimal_html(context_dict)
+    prompt_seconds = time.perf_counter() - prompt_start
+
+    # Identical prompt input (e.g. cosmetic page changes) → reuse the result
+    prepared.prompt_fp = prompt_fingerprint(summary_json_obj, minimal_html, critical_css, llm.LLM_MODEL)
+    if not bypass_cache:
+        prepared.cached_result = await asyncio.to_thread(cache.get, prepared.prompt_fp)
+        if prepared.cached_result is not None:
+            await asyncio.to_thread(cache.link_page, url, prepared.page_fp, prepared.prompt_fp, llm.LLM_MODEL)
+            logger.info("Generation cache: identical prompt input, reusing result for %s", url)
+            return
+
+    # ─── 5) Format prompt for Claude ─────────────────────────────
+    prompt_start = time.perf_counter()
+    prepared.prompt = format_prompt(minimal_html, summary_json_obj, critical_css)
+    observe_stage("prompt_build", prompt_seconds + time.perf_counter() - prompt_start)
+    observe_bytes("prompt", len(prepared.prompt))
+
+
+async def write_outputs(artifacts: JobArtifacts, result: dict, assets: Optional[AssetStage] = None) -> None:
+    """
+    Write the generated page, stylesheet and combined page as job artifacts;
+    with `assets`, the files use local copies of their images (the response
+    body keeps the original URLs).
+    """
+    files = result
+    if assets is not None:
+        try:
+            files = await assets.localize(artifacts, result)
+        except Exception as e:
+            logger.warning("Asset stage failed, keeping remote images: %s", e)
+    await asyncio.gather(
+        artifacts.write_text("recreated_page.html", files["html"]),
+        artifacts.write_text("styles.css", files["css"]),
+        artifacts.write_text("recreated_combined.html", files["combined_html"]),
+    )
+
+
+async def finish_generation(prepared: PreparedGeneration, html_generated: str, css_generated: str) -> dict:
+    """Prune, minify and inline (in the CPU pool), write the generated files, cache and build the response body."""
+    result, timings = await get_cpu_pool().run(render_output, html_generated, css_generated)
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+    observe_bytes("combined_html", len(result["combined_html"]))
+    await write_outputs(prepared.artifacts, result, prepared.assets)
+    if html_generated:  # never cache a reply we could not parse
+        cache = get_generation_cache()
+        await asyncio.to_thread(cache.put, prepared.prompt_fp, result)
+        await asyncio.to_thread(cache.link_page, prepared.url, prepared.page_fp, prepared.prompt_fp, llm.LLM_MODEL)
+    return result
+
+
+async def run_pipeline(
+    url: str,
+    bypass_cache: bool = False,
+    on_stage: Optional[StageCallback] = None,
+    artifacts: Optional[JobArtifacts] = None,
+    limits: Optional[StageLimits] = None,
+    on_chunk: Optional[ChunkCallback] = None,
+) -> dict:
+    """
+    Full scrape → filter → prompt → LLM run; returns `{combined_html, html, css}`.
+    With `on_chunk`, the reply is streamed and its fence bodies passed on as they arrive.
+    """
+    prepared = await prepare_prompt(url, bypass_cache, on_stage, artifacts, limits)
+    try:
+        return await _generate(prepared, on_stage, limits, on_chunk)
+    finally:
+        prepared.close()
+
+
+async def stream_code(prompt: str, on_chunk: ChunkCallback) -> Tuple[str, str]:
+    """Stream the reply, passing fence body chunks to `on_chunk`; returns (html, css)."""
+    parser = llm.FenceParser()
+    async for text in llm.stream(prompt):
+        for lang, chunk in parser.feed(text):
+            on_chunk(lang, chunk)
+    for lang, chunk in parser.close():
+        on_chunk(lang, chunk)
+    return parser.result("html"), parser.result("css")
+
+
+async def _generate(prepared: PreparedGeneration, on_stage: Optional[StageCallback],
+                    limits: Optional[StageLimits], on_chunk: Optional[ChunkCallback]) -> dict:
+    if prepared.cached_result is not None:
+        await write_outputs(prepared.artifacts, prepared.cached_result, prepared.assets)
+        _notify(on_stage, "done")
+        return prepared.cached_result
+
+    # ─── 6) Send prompt to Claude (shared async client; the event loop stays free) ───
+    _notify(on_stage, "generating")
+    # ─── 7) Pull out HTML/CSS fences (as they arrive when streaming) ───
+    try:
+        async with stage_slot(limits, "llm"):
+            if on_chunk is not None:
+                html_generated, css_generated = await stream_code(prepared.prompt, on_chunk)
+            else:
+                raw_output = await llm.generate(prepared.prompt)
+                html_generated = llm.extract_code("html", raw_output)
+                css_generated = llm.extract_code("css", raw_output)
+    except Exception as e:
+        raise PipelineError("generating", f"Generation failed: {e}", status_code=502) from e
+
+    # ─── 8) Prune unused CSS, minify + inline, write files ─────────────────────────────
+    result = await finish_generation(prepared, html_generated, css_generated)
+    _notify(on_stage, "done")
+    return result
@@ -0,0 +1,295 @@
+# backend/prompt_builder.py
+
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from css_rules import parse_stylesheet
+from metrics import observe_prompt_tokens
+
+load_dotenv()
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_MAX_ITEMS = int(os.getenv("PROMPT_MAX_ITEMS", "12"))         # per list in the summary
+PROMPT_MAX_STRING = int(os.getenv("PROMPT_MAX_STRING", "300"))      # chars per text value
+
+# Anthropic models average a little under 4 characters per token on
+# English/markup; 3.5 errs towards overestimating, which keeps us in budget.
+CHARS_PER_TOKEN = 3.5
+
+# ─── Static prefix ─────────────────────────────
+#
+# Everything that does not depend on the site goes into the system prompt,
+# which llm.build_request marks for provider-side prompt caching. It must
+# stay byte-identical between requests: no dates, ids or per-site text here.
+# It must also stay longer than the model's minimum cacheable length
+# (llm.PROMPT_CACHE_MIN_TOKENS); shorter prefixes are never cached.
+
+PROMPT_INTRO = (
+    "You are given a JSON summary, a minimal HTML snippet, and a small critical CSS snippet "
+    "extracted from a website.\n"
+    "Recreate a full, responsive, semantic HTML/CSS page that visually resembles the original "
+    "website as closely as possible. Do not include any JavaScript or external CSS frameworks.\n\n"
+    "❗️ Return exactly two fenced code blocks:\n"
+    "   • One ```html``` containing the complete page markup\n"
+    "   • One ```css``` containing the complete stylesheet\n\n"
+)
+
+STYLE_GUIDE = (
+    "How to read the input:\n"
+    "- `hero`, `nav_links` and `footer_links` describe the top and bottom of the page; keep their order.\n"
+    "- `style_hints` are computed styles from the live page (fonts, colors, spacing); prefer them over guesses.\n"
+    "- `buttons_detailed`, `links_detailed` and `images_detailed` list elements with their classes, inline "
+    "styles and parent context; lists may be shortened, so repeat the pattern for similar items.\n"
+    "- `testimonials` and `news_cards` are repeated card components; `components` lists other repeated "
+    "blocks (pricing tables, feature grids, logo rows) with a few sample items each.\n"
+    "- The critical CSS holds the original rules for the minimal HTML's elements, including custom "
+    "properties and @font-face rules; reuse its values and keep its variable names.\n\n"
+    "Stylesheet conventions:\n"
+    "- Define colors, fonts and spacing once as custom properties on :root and reference them.\n"
+    "- Use flexbox or grid for layout, relative units for type, and min-width media queries.\n"
+    "- Keep class names from the original where they are given.\n"
+    "- Images keep their original absolute URLs; give them alt text and explicit sizing.\n\n"
+)
+
+PROMPT_REQUIREMENTS = (
+    "✅ Requirements:\n"
+    "- Use semantic tags (<header>,<nav>,<section>,<footer>).\n"
+    "- Mobile-first responsive layout.\n"
+    "- Follow provided colors, spacing, typography.\n"
+    "- Use the provided images, buttons, and testimonials/cards as described in the JSON summary.\n"
+    "- For each testimonial/card, include the avatar, quote, and author in a visually appealing card layout.\n"
+    "- Style buttons according to their extracted classes and inline styles.\n"
+    "- Place images in their appropriate sections as indicated by their parent context.\n"
+)
+
+# The shape of every summary section, so the per-site JSON needs no explanation
+INPUT_REFERENCE = (
+    "Summary fields (any of them may be missing or shortened):\n"
+    "- `hero`: {img, heading, subheading, button_text}. `img` is the first image of the page and "
+    "`button_text` may be null; build the first screen of the page from it.\n"
+    "- `nav_links`: [{href, label}] in menu order. Labels are derived from the URL when the link "
+    "text was not available, so tidy their capitalisation but keep their order and targets.\n"
+    "- `footer_links`: [{href, label}] for the footer; a short row of links is enough.\n"
+    "- `news_cards`: [{heading, snippet}] from the page's sections and articles. A snippet of "
+    "\"Preview text...\" means the text is unknown: write one neutral sentence that fits the heading.\n"
+    "- `testimonials`: [{quote, author, avatar, classes}]. `quote` is all text of the card, which "
+    "may include the author's name again; `author` and `avatar` may be null.\n"
+    "- `components`: [{type, container_tag, container_classes, count, items}]. `type` is "
+    "\"pricing\" (items: {heading, text, price, img?}), \"features\" (items: {heading, text, img?}), "
+    "\"logos\" or \"images\" (items: {img, alt}). `count` is how many items the original has; only "
+    "the first few are listed, so render `count` items following their pattern.\n"
+    "- `images_detailed`: [{src, alt, parent_tag, parent_classes}]. The parent is the nearest "
+    "section, div, article, header or footer; use it to decide where the image belongs.\n"
+    "- `buttons_detailed`: [{text, class, style}] and `links_detailed`: [{text, href, class, style}]. "
+    "`style` is the inline style attribute as written (often empty).\n"
+    "- `style_hints`: {selector: {color, backgroundColor, fontFamily, fontSize, fontWeight, "
+    "lineHeight, padding, margin, borderRadius, display}} computed in the browser for key elements "
+    "such as body, headings, links and buttons. Values are resolved (rgb() colors, px sizes); convert "
+    "them to custom properties and rem units where that keeps the result the same.\n"
+    "- `main_content_summaries`: short summaries of the page's main text, in order. Use them for "
+    "section copy instead of inventing text; keep their language.\n"
+    "- Any other field is extra context about the page and may be used where it helps.\n\n"
+    "The minimal HTML snippet shows the page outline (header, hero, cards, footer) with the original "
+    "class names. It is a skeleton, not the page: expand every part of it with the summary's content.\n"
+    "The critical CSS snippet is a subset of the original stylesheets: the rules for the skeleton's "
+    "elements, the :root custom properties they use, @font-face and @import rules for web fonts, and "
+    "the @media blocks around them. Rules may be missing when the budget ran out; fill the gaps in "
+    "the same style.\n\n"
+)
+
+OUTPUT_CHECKLIST = (
+    "\nBefore answering, check that:\n"
+    "- The html block is one complete document: <!DOCTYPE html>, <html lang>, <head> with <meta "
+    "charset>, a viewport <meta> and <title>, and <body>. The styles belong in the css block: no "
+    "<style> or <script> elements and no inline event handlers.\n"
+    "- Every image has alt text and explicit width and height (or an aspect-ratio in the CSS), and "
+    "decorative images use alt=\"\".\n"
+    "- Headings form one outline: a single <h1>, then <h2> per section, <h3> inside cards.\n"
+    "- Navigation is a <nav> with a list of links; on narrow screens it wraps or stacks without "
+    "JavaScript.\n"
+    "- Interactive elements have visible :hover and :focus-visible styles and enough color contrast.\n"
+    "- The css block holds every rule the page needs, starting with the :root custom properties, "
+    "then base element styles, layout, components and finally min-width media queries.\n"
+    "- No text, link or image of the summary is repeated more than the original repeats it.\n"
+    "- Nothing is written outside the two code blocks except, at most, one short sentence.\n"
+)
+
+SYSTEM_PROMPT = PROMPT_INTRO + STYLE_GUIDE + INPUT_REFERENCE + PROMPT_REQUIREMENTS + OUTPUT_CHECKLIST
+
+# Summary sections, most important first. Lower sections get what is left.
+SUMMARY_PRIORITY = (
+    "hero", "nav_links", "style_hints", "footer_links", "buttons_detailed",
+    "news_cards", "testimonials", "components", "images_detailed", "main_content_summaries",
+    "links_detailed",
+)
+
+# How duplicate entries of a list section are recognised
+DEDUPE_KEYS = {
+    "links_detailed": lambda item: item.get("href") or item.get("text"),
+    "images_detailed": lambda item: item.get("src"),
+    "buttons_detailed": lambda item: (item.get("text"), tuple(item.get("class") or ())),
+    "testimonials": lambda item: item.get("quote"),
+    "nav_links": lambda item: item.get("href"),
+    "footer_links": lambda item: item.get("href"),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (no tokenizer round trip)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def clip(value: Any, max_string: int = PROMPT_MAX_STRING) -> Any:
+    """Shorten every string inside `value` to `max_string` characters."""
+    if isinstance(value, str):
+        return value if len(value) <= max_string else value[:max_string].rstrip() + "…"
+    if isinstance(value, list):
+        return [clip(v, max_string) for v in value]
+    if isinstance(value, dict):
+        return {k: clip(v, max_string) for k, v in value.items()}
+    return value
+
+
+def dedupe(section: str, items: List[Any]) -> List[Any]:
+    key_of = DEDUPE_KEYS.get(section)
+    seen = set()
+    out = []
+    for item in items:
+        try:
+            key = key_of(item) if key_of and isinstance(item, dict) else compact_json(item)
+        except TypeError:
+            key = compact_json(item)
+        if key is None or key in seen or not item:
+            continue
+        seen.add(key)
+        out.append(item)
+    return out
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    tokens: Dict[str, int] = field(default_factory=dict)    # estimated tokens per section
+    dropped: Dict[str, int] = field(default_factory=dict)   # items/rules left out per section
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+
+class PromptBuilder:
+    """
+    Assembles the per-site part of the generation prompt so that it and
+    the static `system` prefix fit `budget` estimated tokens together.
+
+    The minimal HTML is always included. Summary
+    sections are deduplicated, their strings clipped and lists capped at
+    `max_items`, then filled in priority order item by item while the
+    budget lasts; the critical CSS is filled rule by rule after the top
+    summary sections. The summary is serialized as compact JSON.
+    """
+
+    def __init__(self, budget: int = PROMPT_TOKEN_BUDGET, max_items: int = PROMPT_MAX_ITEMS,
+                 max_string: int = PROMPT_MAX_STRING):
+        self.budget = budget
+        self.max_items = max_items
+        self.max_string = max_string
+
+    def build(self, summary: dict, minimal_html: str, critical_css: str,
+              system: str = SYSTEM_PROMPT) -> BuiltPrompt:
+        built = BuiltPrompt(text="")
+        built.tokens["instructions"] = estimate_tokens(system) + estimate_tokens(_SCAFFOLD)
+        built.tokens["minimal_html"] = estimate_tokens(minimal_html)
+        remaining = self.budget - built.tokens["instructions"] - built.tokens["minimal_html"]
+
+        ordered = [k for k in SUMMARY_PRIORITY if k in summary] + [k for k in summary if k not in SUMMARY_PRIORITY]
+        head, tail = ordered[:3], ordered[3:]   # hero/nav/style hints outrank the CSS
+
+        kept: Dict[str, Any] = {}
+        remaining = self._fill_summary(summary, head, kept, built, remaining)
+        css, remaining = self._fill_css(critical_css, built, remaining)
+        self._fill_summary(summary, tail, kept, built, remaining)
+
+        summary_json = compact_json({k: kept[k] for k in summary if k in kept})
+        built.text = _SCAFFOLD.format(summary_json=summary_json, min_html=minimal_html, critical_css=css)
+        return built
+
+    def _fill_summary(self, summary: dict, keys: List[str], kept: Dict[str, Any], built: BuiltPrompt,
+                      remaining: int) -> int:
+        for key in keys:
+            value = clip(summary[key], self.max_string)
+            if isinstance(value, list):
+                items = dedupe(key, value)
+                take: List[Any] = []
+                cost = estimate_tokens(f'"{key}":[],')
+                for item in items[:self.max_items]:
+                    item_cost = estimate_tokens(compact_json(item)) + 1
+                    if cost + item_cost > remaining:
+                        break
+                    take.append(item)
+                    cost += item_cost
+                dropped = len(value) - len(take)
+                if take:
+                    kept[key] = take
+                    built.tokens[key] = cost
+                    remaining -= cost
+            else:
+                cost = estimate_tokens(f'"{key}":{compact_json(value)},')
+                fits = cost <= remaining
+                dropped = 0 if fits else 1
+                if fits:
+                    kept[key] = value
+                    built.tokens[key] = cost
+                    remaining -= cost
+            if dropped:
+                built.dropped[key] = dropped
+        return remaining
+
+    @staticmethod
+    def _fill_css(critical_css: str, built: BuiltPrompt, remaining: int) -> Tuple[str, int]:
+        """Keep whole top-level rules (an @media block counts as one) in order while they fit."""
+        cost = estimate_tokens(critical_css)
+        if cost <= remaining:
+            built.tokens["critical_css"] = cost
+            return critical_css, remaining - cost
+        kept: List[str] = []
+        cost = 0
+        rules = [rule.to_css().strip() for rule in parse_stylesheet(critical_css)]
+        for rule in rules:
+            rule_cost = estimate_tokens(rule) + 1
+            if cost + rule_cost > remaining:
+                break
+            kept.append(rule)
+            cost += rule_cost
+        built.tokens["critical_css"] = cost
+        built.dropped["critical_css"] = len(rules) - len(kept)
+        return "\n\n".join(kept), remaining - cost
+
+
+_SCAFFOLD = (
+    "Below is the JSON summary:\n"
+    "```json\n{summary_json}\n```\n\n"
+    "Below is the minimal HTML snippet:\n"
+    "```html\n{min_html}\n```\n\n"
+    "Below is the critical CSS snippet:\n"
+    "```css\n{critical_css}\n```\n"
+)
+
+
+def build_prompt(summary: dict, minimal_html: str, critical_css: str,
+                 budget: Optional[int] = None) -> BuiltPrompt:
+    """Build with the default limits and record per-section token estimates."""
+    builder = PromptBuilder(budget=budget if budget is not None else PROMPT_TOKEN_BUDGET)
+    built = builder.build(summary, minimal_html, critical_css)
+    for section, tokens in built.tokens.items():
+        observe_prompt_tokens(section, tokens)
+    return built
@@ -1,26 +1,29 @@
 # backend/recreate_site.py
 
-import json
-import re
+import logging
 import sys
-from pathlib import Path
 import asyncio
-import anthropic
-import os
+import uuid
 from dotenv import load_dotenv
 
+import llm
+from llm import extract_code  # re-exported for existing callers
 from scraper import scrape_website
-from filter_css import filter_css_from_html_and_css
-
-# ── create (or ensure) a “generated” folder next to this script ──
-GENERATED_DIR = Path(__file__).parent / "generated"
-GENERATED_DIR.mkdir(exist_ok=True)
-
-# Where to dump the scraped context
-CONTEXT_FILE = GENERATED_DIR / "context.json"
+from filter_css import filter_css
+from critical_css import extract_critical_css
+from components import image_components
+from prompt_builder import build_prompt
+from http_client import close_session
+from browser_pool import close_browser_pool
+from cpu_pool import close_cpu_pool
+from artifacts import get_artifact_store
+from screenshots import flush_screenshots
+from log import setup_logging
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def build_summary_and_minimal_html(context: dict) -> (dict, str):
     summary = {}
@@ -68,10 +71,20 @@ def build_summary_and_minimal_html(context: dict) -> (dict, str):
         summary["main_content_summaries"] = main_content_summaries
 
     # --- NEW: Add enhanced fields to summary if present ---
-    for key in ["images_detailed", "buttons_detailed", "links_detailed", "testimonials"]:
+    for key in ["images_detailed", "buttons_detailed", "links_detailed", "testimonials", "components"]:
         val = context.get("summary", {}).get(key, None)
         if val:
             summary[key] = val
+    # Streamed pages get no component detection; fall back to rows of images
+    if context.get("summary", {}).get("components", []) is None:
+        fallback = image_components(context["summary"].get("images_detailed", []))
+        if fallback:
+            summary["components"] = fallback
+
+    # Computed styles captured in the browser (fonts, colors, spacing)
+    style_hints = context.get("style_hints")
+    if style_hints:
+        summary["style_hints"] = style_hints
 
     # Build the minimal HTML snippet
     parts = []
@@ -142,88 +155,61 @@ def build_summary_and_minimal_html(context: dict) -> (dict, str):
 
 
 def build_critical_css(filtered_css: str) -> str:
-    critical_selectors = [
-        r"\bbody\b", r"\bh1\b", r"\bh2\b", r"\bh3\b", r"\ba\b", r"\bbutton\b",
-        r"\.site-header\b", r"\.main-nav\b", r"\.hero\b", r"\.hero\s+img\b",
-        r"\.hero-text\b", r"\.news-cards\b", r"\.news-grid\b",
-        r"\.news-card\b", r"\.read-more\b", r"\.site-footer\b", r"\.footer-links\b"
-    ]
-    rules = re.findall(r"([^{]+\{[^}]*\})", filtered_css, re.DOTALL)
-    critical = [
-        rule.strip()
-        for rule in rules
-        if any(re.search(pat, rule.split("{", 1)[0]) for pat in critical_selectors)
-    ]
-    return "\n\n".join(critical).strip()
+    # Rule-tree based: keeps @media wrappers, referenced :root variables and
+    # @font-face rules, within CRITICAL_CSS_BUDGET bytes
+    return extract_critical_css(filtered_css)
 
 
 def format_prompt(min_html: str, summary: dict, critical_css: str) -> str:
-    summary_json = json.dumps(summary, indent=2)
-    return (
-        "You are given a JSON summary, a minimal HTML snippet, and a small critical CSS snippet.\n"
-        "Recreate a full, responsive, semantic HTML/CSS page that visually resembles the original "
-        "website as closely as possible. Do not include any JavaScript or external CSS frameworks.\n\n"
-        "❗️ Return exactly two fenced code blocks:\n"
-        "   • One ```html``` containing the complete page markup\n"
-        "   • One ```css``` containing the complete stylesheet\n\n"
-        "Below is the JSON summary:\n"
-        f"```json\n{summary_json}\n```\n\n"
-        "Below is the minimal HTML snippet:\n"
-        f"```html\n{min_html}\n```\n\n"
-        "Below is the critical CSS snippet:\n"
-        f"```css\n{critical_css}\n```\n\n"
-        "✅ Requirements:\n"
-        "- Use semantic tags (<header>,<nav>,<section>,<footer>).\n"
-        "- Mobile-first responsive layout.\n"
-        "- Follow provided colors, spacing, typography.\n"
-        "- Use the provided images, buttons, and testimonials/cards as described in the JSON summary.\n"
-        "- For each testimonial/card, include the avatar, quote, and author in a visually appealing card layout.\n"
-        "- Style buttons according to their extracted classes and inline styles.\n"
-        "- Place images in their appropriate sections as indicated by their parent context.\n"
-    )
-
-
-def extract_code(block_type: str, text: str) -> str:
-    fence = rf"```{block_type}\s*(.*?)\s*```"
-    match = re.search(fence, text, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    if block_type == "css":
-        fallback = re.search(r"```css\s*(.*)$", text, re.DOTALL)
-        if fallback:
-            return fallback.group(1).strip()
-    return ""
+    """
+    The per-site user message, fitted to PROMPT_TOKEN_BUDGET by the prompt
+    builder. The instructions travel separately as the cached system prompt
+    (prompt_builder.SYSTEM_PROMPT, sent by llm.build_request).
+    """
+    built = build_prompt(summary, min_html, critical_css)
+    if built.dropped:
+        logger.info("Prompt trimmed to ~%d tokens; left out %s", built.total_tokens, built.dropped)
+    return built.text
 
 
 async def main(url: str) -> None:
-    print(f"[DEBUG] Scraping {url}…")
-    ctx = await scrape_website(url)
+    # Each run gets its own artifact directory, like an API job
+    artifacts = await get_artifact_store().open(uuid.uuid4().hex)
+    logger.info("Scraping %s…", url)
+    try:
+        ctx = await scrape_website(url, artifacts=artifacts)  # screenshot per SCREENSHOT_MODE
+    finally:
+        await flush_screenshots()
+        await close_browser_pool()
+        await close_session()
+        close_cpu_pool()
     ctx_dict = ctx.model_dump()
-    CONTEXT_FILE.write_text(json.dumps(ctx_dict, indent=2, default=str))
+    await artifacts.write_json("context.json", ctx_dict, compressed=True)
 
-    filtered = filter_css_from_html_and_css(ctx_dict["html"], ctx_dict["css_contents"])
+    # The scrape already collected the page's selectors; no need to reparse it
+    filtered = filter_css(ctx_dict["css_contents"], set(ctx.used_selectors))
     critical = build_critical_css(filtered)
     summary, minimal_html = build_summary_and_minimal_html(ctx_dict)
     prompt = format_prompt(minimal_html, summary, critical)
 
-    print("[DEBUG] Sending to Claude…")
-    client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
-    resp = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=4096,
-    )
-    raw = "".join(p.text for p in resp.content if hasattr(p, "text"))
+    logger.info("Sending to Claude…")
+    try:
+        raw = await llm.generate(prompt)
+    finally:
+        await llm.close_client()
 
     html_out = extract_code("html", raw)
     css_out = extract_code("css", raw)
 
-    (GENERATED_DIR / "recreated_page.html").write_text(html_out)
-    (GENERATED_DIR / "styles.css").write_text(css_out)
-    print("✅ Done. Files written to generated/")
+    await asyncio.gather(
+        artifacts.write_text("recreated_page.html", html_out),
+        artifacts.write_text("styles.css", css_out),
+    )
+    print(f"✅ Done. Files written to {artifacts.directory}/")
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print(f"Usage: {sys.argv[0]} <url>")
         sys.exit(1)
+    setup_logging()
     asyncio.run(main(sys.argv[1]))
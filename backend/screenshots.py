@@ -0,0 +1,170 @@
+# backend/screenshots.py
+
+import asyncio
+import io
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from playwright.async_api import Page
+
+from artifacts import JobArtifacts
+from metrics import observe_bytes, span
+
+try:
+    from PIL import Image
+except ImportError:  # optional; WebP falls back to JPEG, oversized shots are cropped
+    Image = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCREENSHOT_MODE = os.getenv("SCREENSHOT_MODE", "off")               # off | viewport | fold | full
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "jpeg")          # jpeg | png | webp
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "70"))     # jpeg/webp, 1-100
+SCREENSHOT_MAX_DIMENSION = int(os.getenv("SCREENSHOT_MAX_DIMENSION", "4096"))  # px, width and height
+SCREENSHOT_FOLD_HEIGHT = int(os.getenv("SCREENSHOT_FOLD_HEIGHT", "1200"))      # px of page kept by "fold"
+
+MODES = ("off", "viewport", "fold", "full")
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+DEFAULT_VIEWPORT_WIDTH = 1280   # Playwright's default when the context sets none
+
+_PAGE_SIZE_SCRIPT = "() => [document.documentElement.scrollWidth, document.documentElement.scrollHeight]"
+
+
+def resolve_format(fmt: str) -> str:
+    """WebP needs Pillow (the browser only encodes PNG and JPEG); without it, use JPEG."""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown screenshot format: {fmt}")
+    if fmt == "webp" and Image is None:
+        logger.warning("Pillow is not installed; saving screenshots as JPEG")
+        return "jpeg"
+    return fmt
+
+
+@dataclass
+class ScreenshotOptions:
+    """
+    What the scraper captures: nothing (`off`), the viewport, the top
+    `fold_height` pixels of the page (`fold`) or the whole page (`full`),
+    at CSS pixel scale. Shots over `max_dimension` pixels wide or tall are
+    scaled down to fit (the factor is saved in screenshot.json); without
+    Pillow they are cropped to it instead.
+    """
+    mode: str = "off"
+    format: str = "jpeg"
+    quality: int = 70
+    max_dimension: int = 4096
+    fold_height: int = 1200
+
+    def __post_init__(self):
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown screenshot mode: {self.mode}")
+        self.format = resolve_format(self.format)
+
+    @classmethod
+    def from_env(cls) -> "ScreenshotOptions":
+        return cls(
+            mode=SCREENSHOT_MODE,
+            format=SCREENSHOT_FORMAT,
+            quality=SCREENSHOT_QUALITY,
+            max_dimension=SCREENSHOT_MAX_DIMENSION,
+            fold_height=SCREENSHOT_FOLD_HEIGHT,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def filename(self) -> str:
+        return f"screenshot.{EXTENSIONS[self.format]}"
+
+
+async def capture(page: Page, options: ScreenshotOptions) -> bytes:
+    """
+    Take the screenshot in the browser. JPEG is encoded there at
+    `quality`; for WebP this returns a PNG that `encode` converts.
+    Downscaling is left to `encode`, off the page.
+    """
+    kind = "jpeg" if options.format == "jpeg" else "png"
+    kwargs = {"type": kind, "scale": "css", "animations": "disabled", "caret": "hide"}
+    if kind == "jpeg":
+        kwargs["quality"] = options.quality
+    # Without Pillow nothing can be scaled later, so crop to the limit here
+    limit = options.max_dimension if Image is None else float("inf")
+    async with span("screenshot"):
+        if options.mode == "fold":
+            width = (page.viewport_size or {}).get("width", DEFAULT_VIEWPORT_WIDTH)
+            kwargs.update(full_page=True, clip={"x": 0, "y": 0, "width": min(width, limit),
+                                                "height": min(options.fold_height, limit)})
+        elif options.mode == "full":
+            width, height = await page.evaluate(_PAGE_SIZE_SCRIPT)
+            kwargs.update(full_page=True, clip={"x": 0, "y": 0, "width": min(width, limit),
+                                                "height": min(height, limit)})
+        return await page.screenshot(**kwargs)
+
+
+def encode(raw: bytes, options: ScreenshotOptions) -> Tuple[bytes, float]:
+    """
+    (bytes to save, scale factor). Shots within `max_dimension` in JPEG or
+    PNG are saved as captured; larger ones are scaled down to fit and WebP
+    is re-encoded, both with Pillow.
+    """
+    if Image is None:
+        return raw, 1.0
+    with Image.open(io.BytesIO(raw)) as image:
+        scale = min(1.0, options.max_dimension / max(image.size))
+        if scale == 1.0 and options.format != "webp":
+            return raw, 1.0
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        if options.format == "webp":
+            image.save(out, "WEBP", quality=options.quality, method=4)
+        elif options.format == "jpeg":
+            image.convert("RGB").save(out, "JPEG", quality=options.quality)
+        else:
+            image.save(out, "PNG", optimize=True)
+        return out.getvalue(), scale
+
+
+async def save(artifacts: JobArtifacts, raw: bytes, options: ScreenshotOptions) -> Path:
+    data, scale = await asyncio.to_thread(encode, raw, options)
+    observe_bytes("screenshot", len(data))
+    path = await artifacts.write_bytes(options.filename, data)
+    # Page coordinates = screenshot pixels / scale
+    await artifacts.write_json("screenshot.json", {"file": options.filename, "mode": options.mode, "scale": scale})
+    return path
+
+
+_pending: Set[asyncio.Task] = set()
+
+
+def save_later(artifacts: JobArtifacts, raw: bytes, options: ScreenshotOptions) -> asyncio.Task:
+    """Encode and write in the background; nothing downstream waits for the file."""
+    task = asyncio.create_task(save(artifacts, raw, options))
+    _pending.add(task)
+    task.add_done_callback(_saved)
+    return task
+
+
+def _saved(task: asyncio.Task) -> None:
+    _pending.discard(task)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.warning("Could not save screenshot: %s", task.exception())
+    else:
+        logger.debug("Screenshot saved: %s", task.result())
+
+
+async def flush_screenshots(timeout: Optional[float] = 30.0) -> None:
+    """Wait for background screenshot writes (before the event loop shuts down)."""
+    if _pending:
+        await asyncio.wait(set(_pending), timeout=timeout)
@@ -0,0 +1,177 @@
+# backend/stylesheets.py
+
+import asyncio
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin
+
+import aiohttp
+from dotenv import load_dotenv
+
+from http_cache import get_http_cache
+from http_client import get_session
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CSS_FETCH_CONCURRENCY = int(os.getenv("CSS_FETCH_CONCURRENCY", "8"))
+CSS_FETCH_TIMEOUT = float(os.getenv("CSS_FETCH_TIMEOUT", "10"))   # seconds per fetch
+CSS_FETCH_BUDGET = float(os.getenv("CSS_FETCH_BUDGET", "20"))     # seconds for the whole page
+CSS_MAX_IMPORT_DEPTH = int(os.getenv("CSS_MAX_IMPORT_DEPTH", "4"))
+
+# `@import url("a.css") screen;` / `@import "a.css" layer(base) supports(display: grid);`
+_IMPORT_RE = re.compile(
+    r"""@import\s+(?:url\(\s*(['"]?)(?P<u1>[^'")]*)\1\s*\)|(['"])(?P<u2>[^'"]*)\3)(?P<cond>[^;]*);""",
+    re.IGNORECASE,
+)
+# Leading statements allowed before/between @import rules.
+_LEADING_RE = re.compile(r"""\s*(?:/\*.*?\*/\s*|@charset\s+[^;]*;\s*|@layer\s+[^;{]*;\s*)*""", re.DOTALL | re.IGNORECASE)
+_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", re.IGNORECASE)
+_LAYER_RE = re.compile(r"^layer(?:\(([^)]*)\))?", re.IGNORECASE)
+_SUPPORTS_RE = re.compile(r"^supports\((.*)\)", re.IGNORECASE)
+
+
+def absolutize_urls(css: str, base_url: str) -> str:
+    """Rewrite relative `url(...)` references against the stylesheet's own URL."""
+    def repl(m: re.Match) -> str:
+        ref = m.group(2).strip()
+        if ref.startswith(("data:", "#", "http://", "https://", "//")):
+            return m.group(0)
+        return f'url("{urljoin(base_url, ref)}")'
+    return _URL_RE.sub(repl, css)
+
+
+def _wrap_import(css: str, condition: str) -> str:
+    """Apply an @import's layer()/supports()/media conditions to the inlined sheet."""
+    condition = condition.strip()
+    layer = None
+    supports = None
+    m = _LAYER_RE.match(condition)
+    if m:
+        layer = (m.group(1) or "").strip()
+        condition = condition[m.end():].strip()
+    m = _SUPPORTS_RE.match(condition)
+    if m:
+        supports = m.group(1).strip()
+        condition = condition[m.end():].strip()
+    if condition:
+        css = f"@media {condition} {{\n{css}\n}}"
+    if supports:
+        css = f"@supports ({supports}) {{\n{css}\n}}"
+    if layer is not None:
+        head = f"@layer {layer}" if layer else "@layer"
+        css = f"{head} {{\n{css}\n}}"
+    return css
+
+
+class StylesheetFetcher:
+    """
+    Fetches a page's stylesheets concurrently over the shared connection
+    pool, inlines `@import`ed sheets in place and absolutizes `url()`
+    references. Every fetch is bounded by `fetch_timeout` and the whole
+    job by `budget`; anything that does not finish in time is skipped.
+    Bodies in `prefetched` (e.g. captured from the browser) are used as-is.
+    """
+
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        concurrency: int = CSS_FETCH_CONCURRENCY,
+        fetch_timeout: float = CSS_FETCH_TIMEOUT,
+        budget: float = CSS_FETCH_BUDGET,
+        prefetched: Optional[Dict[str, str]] = None,
+    ):
+        self.session = session
+        self.prefetched = prefetched or {}
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.fetch_timeout = fetch_timeout
+        self.budget = budget
+        self.deadline = 0.0
+
+    def _remaining(self) -> float:
+        return self.deadline - asyncio.get_running_loop().time()
+
+    async def fetch(self, url: str) -> Optional[str]:
+        if url in self.prefetched:
+            logger.debug("✅ Captured from browser: %s", url)
+            return self.prefetched[url]
+        remaining = self._remaining()
+        if remaining <= 0:
+            logger.warning("⏱️ Budget exhausted, skipping: %s", url)
+            return None
+        session = self.session or get_session()
+        timeout = aiohttp.ClientTimeout(total=min(self.fetch_timeout, remaining))
+        cache = get_http_cache()
+        async with self.semaphore:
+            try:
+                if cache is not None:
+                    cached = await cache.fetch(session, url, timeout=timeout)
+                    if cached is not None:
+                        logger.debug("✅ %s: %s", "Cached" if cached.from_cache else "Downloaded", url)
+                        return cached.text()
+                    logger.warning("❌ Failed: %s", url)
+                    return None
+                async with session.get(url, timeout=timeout) as response:
+                    if response.status == 200:
+                        text = await response.text(errors="replace")
+                        logger.debug("✅ Downloaded: %s", url)
+                        return text
+                    logger.warning("❌ Failed (%d): %s", response.status, url)
+            except asyncio.TimeoutError:
+                logger.warning("❌ Timed out: %s", url)
+            except Exception as e:
+                logger.warning("❌ Error downloading %s: %s", url, e)
+        return None
+
+    async def resolve(self, url: str, ancestors: Set[str] = frozenset(), depth: int = 0) -> Optional[str]:
+        """Fetch one sheet and recursively inline its @import rules."""
+        css = await self.fetch(url)
+        if css is None:
+            return None
+        css = absolutize_urls(css, url)
+
+        # @import rules may only appear at the top of a sheet
+        imports = []
+        pos = _LEADING_RE.match(css).end()
+        while True:
+            m = _IMPORT_RE.match(css, pos)
+            if not m:
+                break
+            imports.append(m)
+            pos = _LEADING_RE.match(css, m.end()).end()
+        if not imports:
+            return css
+
+        children = []
+        for m in imports:
+            child_url = urljoin(url, (m.group("u1") or m.group("u2") or "").strip())
+            if depth >= CSS_MAX_IMPORT_DEPTH or child_url in ancestors or child_url == url:
+                children.append(None)
+            else:
+                children.append(self.resolve(child_url, ancestors | {url}, depth + 1))
+        results = await asyncio.gather(*(c for c in children if c is not None))
+        results_iter = iter(results)
+
+        parts = [css[:imports[0].start()].strip()]  # keep leading @charset/@layer order
+        for m, child in zip(imports, children):
+            child_css = next(results_iter) if child is not None else None
+            if child_css:
+                parts.append(_wrap_import(child_css, m.group("cond")))
+        parts.append(css[pos:])
+        return "\n\n".join(p for p in parts if p)
+
+    async def fetch_all(self, urls: List[str]) -> List[str]:
+        """Return the resolved stylesheets in document order (failures dropped)."""
+        self.deadline = asyncio.get_running_loop().time() + self.budget
+        tasks = [asyncio.ensure_future(self.resolve(u)) for u in dict.fromkeys(urls)]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=self.budget)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("⏱️ Stylesheet budget of %ss exceeded; dropped %d sheet(s)", self.budget, len(pending))
+        return [t.result() for t in tasks if t in done and not t.exception() and t.result()]
@@ -1,36 +1,219 @@
-import math
-from typing import List
+# backend/summarize_utils.py
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Type
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "lead")
+SUMMARIZER_POOL = os.getenv("SUMMARIZER_POOL", "thread")            # thread | process
+SUMMARIZER_WORKERS = int(os.getenv("SUMMARIZER_WORKERS", str(min(4, os.cpu_count() or 1))))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "4096"))   # memoized chunk summaries
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ───────────────────────────── Chunking ─────────────────────────────
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END.split(text.strip()) if s]
+
 
 def chunk_text(text: str, max_words: int = 200) -> List[str]:
     """
-    Split text into chunks of up to max_words words each.
-    Returns a list of text chunks.
+    Split text into chunks of up to max_words words, cutting only between
+    sentences. A single sentence longer than max_words is split by words.
     """
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), max_words):
-        chunk = " ".join(words[i:i+max_words])
-        chunks.append(chunk)
+    chunks: List[str] = []
+    current: List[str] = []
+    count = 0
+    for sentence in split_sentences(text):
+        words = sentence.split()
+        if count and count + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current, count = [], 0
+        while len(words) > max_words:
+            chunks.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if words:
+            current.extend(words)
+            count += len(words)
+    if current:
+        chunks.append(" ".join(current))
     return chunks
 
 
-def summarize_chunk(chunk: str) -> str:
+# ───────────────────────────── Backends ─────────────────────────────
+
+class Summarizer:
     """
-    Placeholder summarizer. Replace with a real LLM or summarizer as needed.
-    For now, just returns the first 2 sentences or 50 words.
+    A summarizer backend. Subclasses implement `summarize` and are made
+    available by name with @register_summarizer. Set `parallel` on
+    backends heavy enough that running chunks in the worker pool pays off.
     """
-    import re
-    sentences = re.split(r'(?<=[.!?]) +', chunk)
-    if len(sentences) > 1:
-        return " ".join(sentences[:2])
-    else:
-        # fallback: first 50 words
+    name = ""
+    parallel = False
+
+    def summarize(self, chunk: str) -> str:
+        raise NotImplementedError
+
+
+_BACKENDS: Dict[str, Type[Summarizer]] = {}
+_instances: Dict[str, Summarizer] = {}
+
+
+def register_summarizer(name: str) -> Callable[[Type[Summarizer]], Type[Summarizer]]:
+    def register(cls: Type[Summarizer]) -> Type[Summarizer]:
+        cls.name = name
+        _BACKENDS[name] = cls
+        return cls
+    return register
+
+
+def get_summarizer(name: Optional[str] = None) -> Summarizer:
+    """The shared instance of a registered backend (SUMMARIZER_BACKEND by default)."""
+    name = name or SUMMARIZER_BACKEND
+    if name not in _instances:
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown summarizer backend: {name} (registered: {', '.join(sorted(_BACKENDS))})")
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+@register_summarizer("lead")
+class LeadSummarizer(Summarizer):
+    """
+    Placeholder summarizer: the first 2 sentences, or the first 50 words
+    when the chunk is a single sentence.
+    """
+
+    def summarize(self, chunk: str) -> str:
+        sentences = split_sentences(chunk)
+        if len(sentences) > 1:
+            return " ".join(sentences[:2])
         return " ".join(chunk.split()[:50])
 
 
-def summarize_chunks(chunks: List[str]) -> List[str]:
+# ───────────────────────────── Memo cache ─────────────────────────────
+
+class SummaryCache:
+    """
+    LRU of summaries keyed by a hash of backend name and whitespace-
+    normalized chunk text, so boilerplate repeated across pages (footers,
+    cookie notices) is summarized once per process.
+    """
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(backend: str, chunk: str) -> str:
+        normalized = _WHITESPACE.sub(" ", chunk).strip()
+        return hashlib.sha256(f"{backend}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+summary_cache = SummaryCache()
+
+
+# ───────────────────────────── Pool ─────────────────────────────
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_summarizer_pool() -> Executor:
+    """Worker pool for parallel backends, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if SUMMARIZER_POOL == "process":
+                _executor = ProcessPoolExecutor(max_workers=SUMMARIZER_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=SUMMARIZER_WORKERS, thread_name_prefix="summarize")
+    return _executor
+
+
+def close_summarizer_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _summarize_with(backend: str, chunk: str) -> str:
+    # Module-level so process workers can unpickle it; each worker keeps its own
+    # instance (backends registered outside this module must be imported there too)
+    return get_summarizer(backend).summarize(chunk)
+
+
+# ───────────────────────────── API ─────────────────────────────
+
+def summarize_chunks(chunks: List[str], backend: Optional[str] = None) -> List[str]:
     """
-    Summarize each chunk using summarize_chunk.
-    Returns a list of summaries.
+    Summarize each chunk with the chosen backend, in order. Chunks already
+    in the memo cache (or repeated within `chunks`) are summarized once;
+    the rest run in the worker pool when the backend is `parallel`.
     """
-    return [summarize_chunk(chunk) for chunk in chunks] 
\ No newline at end of file
+    summarizer = get_summarizer(backend)
+    keys = [SummaryCache.key(summarizer.name, chunk) for chunk in chunks]
+    summaries: Dict[str, str] = {}
+    pending: Dict[str, str] = {}   # key -> chunk, first occurrence only
+    for key, chunk in zip(keys, chunks):
+        if key in summaries or key in pending:
+            continue
+        cached = summary_cache.get(key)
+        if cached is not None:
+            summaries[key] = cached
+        else:
+            pending[key] = chunk
+
+    if summarizer.parallel and len(pending) > 1 and SUMMARIZER_WORKERS > 1:
+        results = get_summarizer_pool().map(_summarize_with, [summarizer.name] * len(pending), pending.values())
+    else:
+        results = map(summarizer.summarize, pending.values())
+    for key, summary in zip(pending, results):
+        summary_cache.put(key, summary)
+        summaries[key] = summary
+    return [summaries[key] for key in keys]
+
+
+def summarize_chunk(chunk: str) -> str:
+    return summarize_chunks([chunk])[0]
@@ -0,0 +1,60 @@
+# backend/tests/conftest.py
+#
+# Every store the tests touch lives in a temporary directory, the model is
+# the local fake and the scraper returns a fixed page (no browser).
+
+import asyncio
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="cloner-tests-")
+for _name in ("ARTIFACTS_DIR", "HTTP_CACHE_DIR", "GENERATION_CACHE_DIR", "ASSET_CACHE_DIR", "BATCH_DIR"):
+    os.environ[_name] = os.path.join(_TMP, _name.lower())
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["CPU_POOL_WORKERS"] = "0"   # threads; no worker processes to spawn
+os.environ["ASSETS_ENABLED"] = "0"     # test_assets runs the asset stage against a local server
+
+import pytest
+
+PAGE_HTML = (
+    "<html><head><title>Example</title></head><body>"
+    "<header class='site-header'><nav><a href='/'>Home</a><a href='/about'>About</a></nav></header>"
+    "<section class='hero'><h1>Welcome to Example</h1><p>We make example pages for tests and demos.</p>"
+    "<img src='/hero.png' alt='Hero'><a class='button' href='/start'>Start</a></section></body></html>"
+)
+
+
+@pytest.fixture
+def fake_scrape(monkeypatch):
+    """pipeline.scrape_website returning PAGE_HTML for any URL; the calls are recorded."""
+    import pipeline
+    import scraper
+    from page_analysis import add_summaries, extract_page
+
+    calls = []
+
+    async def scrape(url, intercept=None, limits=None, artifacts=None):
+        calls.append(url)
+        summary, selectors = extract_page(PAGE_HTML)
+        add_summaries(summary)
+        return scraper.WebsiteContext(
+            url=url, title="Example", stylesheets=[], scripts=[], images=[url + "hero.png"], summary=summary,
+            css_contents=".hero { color: red } .unused { color: blue }", html=PAGE_HTML,
+            used_selectors=selectors,
+        )
+
+    monkeypatch.setattr(pipeline, "scrape_website", scrape)
+    return calls
+
+
+@pytest.fixture
+def client(fake_scrape, monkeypatch):
+    """The API with its lifespan running, without warming real browsers."""
+    from fastapi.testclient import TestClient
+
+    import browser_pool
+    import main
+
+    monkeypatch.setattr(browser_pool.BrowserPool, "start", lambda self: asyncio.sleep(0))
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,39 @@
+# backend/tests/test_artifacts.py
+
+import asyncio
+from pathlib import Path
+
+from artifacts import ArtifactStore
+
+
+def test_open_jobs_are_never_swept(tmp_path):
+    store = ArtifactStore(tmp_path, retention=0, max_jobs=0, gc_interval=3600)
+
+    async def run():
+        running = await store.open("running")
+        done = await store.open("done")
+        done.close()
+        removed = await store.sweep()
+        return running, removed
+
+    running, removed = asyncio.run(run())
+    assert removed == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["running"]
+
+    running.close()
+    assert store.gc() == 1
+    assert store.stats()["jobs"] == 0
+
+
+def test_stats_do_not_touch_the_disk(tmp_path, monkeypatch):
+    store = ArtifactStore(tmp_path, gc_interval=3600)
+    asyncio.run(store.sweep())
+    asyncio.run(store.open("a"))
+    asyncio.run(store.open("a"))
+
+    def fail(self):
+        raise AssertionError("stats() listed the artifact directory")
+
+    monkeypatch.setattr(Path, "iterdir", fail)
+    assert store.stats()["jobs"] == 1
+    assert store.stats()["active"] == 1
@@ -0,0 +1,183 @@
+# backend/tests/test_assets.py
+#
+# The asset stage against a real local static file server.
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import zlib
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from struct import pack
+
+import aiohttp
+import pytest
+
+import assets
+from artifacts import JobArtifacts
+
+
+def png(width: int, height: int, rgb: tuple) -> bytes:
+    """A valid PNG, built without Pillow."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return pack(">I", len(data)) + kind + data + pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes(rgb) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+HERO = png(40, 20, (200, 30, 30))
+AVATAR = png(8, 8, (0, 0, 255))
+WIDE = png(16, 8, (0, 128, 0))
+LOGO = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1 1"><rect width="1" height="1"/></svg>'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A `python -m http.server` equivalent serving a few images; yields its base URL."""
+    root = tmp_path / "site"
+    (root / "img").mkdir(parents=True)
+    files = {"img/hero.png": HERO, "img/hero-copy.png": HERO, "img/avatar.png": AVATAR,
+             "img/wide.png": WIDE, "img/logo.svg": LOGO, "notes.txt": b"not an image"}
+    for name, data in files.items():
+        (root / name).write_bytes(data)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+GENERATED_HTML = (
+    "<html><body>"
+    "<img class='hero' src=\"/img/hero.png?v=1&amp;x=2\" alt='Hero'>"
+    "<img src='img/hero-copy.png'>"
+    "<picture><source srcset=\"/img/wide.png 2x, img/avatar.png 1x\" type='image/png'>"
+    "<img src=img/avatar.png srcset=\"/img/avatar.png 480w, /img/wide.png 800w\" sizes='50vw'></picture>"
+    "<img src=\"data:image/png;base64,AAAA\"><img src='/notes.txt'><img src='/img/missing.png'>"
+    "<img src='/img/logo.svg'>"
+    "</body></html>"
+)
+GENERATED_CSS = ".banner { background: url('/img/wide.png') no-repeat } .x { color: red }"
+
+
+def localize(site: str, job_dir: Path) -> dict:
+    async def run() -> dict:
+        async with aiohttp.ClientSession() as session:
+            stage = assets.AssetStage(site, session=session, fetch_timeout=5, budget=10)
+            stage.prefetch([site + "img/hero.png", site + "img/unused.png"])
+            result = {"html": GENERATED_HTML, "css": GENERATED_CSS, "combined_html": GENERATED_HTML}
+            return await stage.localize(JobArtifacts(job_dir), result)
+
+    return asyncio.run(run())
+
+
+def digest_name(data: bytes, ext: str) -> str:
+    return f"assets/{hashlib.sha256(data).hexdigest()[:20]}.{ext}"
+
+
+def test_localize_against_a_static_server(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "Image", None)   # the fallback: images kept as downloaded
+    job_dir = tmp_path / "job"
+    localized = localize(site, job_dir)
+
+    hero, avatar, wide, logo = (digest_name(HERO, "png"), digest_name(AVATAR, "png"),
+                                digest_name(WIDE, "png"), digest_name(LOGO, "svg"))
+
+    # One file per distinct image; the two hero URLs share one
+    files = sorted(str(p.relative_to(job_dir)) for p in (job_dir / "assets").iterdir())
+    assert files == sorted([hero, avatar, wide, logo])
+    for name, data in ((hero, HERO), (avatar, AVATAR), (wide, WIDE), (logo, LOGO)):
+        assert (job_dir / name).read_bytes() == data
+
+    html = localized["html"]
+    assert f'class=\'hero\' src="{hero}"' in html
+    assert f'<img src="{hero}">' in html
+    assert f'srcset="{wide} 2x, {avatar} 1x"' in html
+    assert f'<img src="{avatar}" srcset="{avatar} 480w, {wide} 800w" sizes=\'50vw\'>' in html
+    # Left alone: data: URLs, non-images and failed downloads
+    assert 'src="data:image/png;base64,AAAA"' in html
+    assert "src='/notes.txt'" in html and "src='/img/missing.png'" in html
+    assert localized["css"] == f'.banner {{ background: url("{wide}") no-repeat }} .x {{ color: red }}'
+    assert localized["combined_html"] == html
+
+    manifest = json.loads((job_dir / "assets.json").read_text())
+    assert manifest == {
+        site + "img/hero.png?v=1&x=2": {"file": hero, "bytes": len(HERO), "original_bytes": len(HERO)},
+        site + "img/hero-copy.png": {"file": hero, "bytes": len(HERO), "original_bytes": len(HERO)},
+        site + "img/wide.png": {"file": wide, "bytes": len(WIDE), "original_bytes": len(WIDE)},
+        site + "img/avatar.png": {"file": avatar, "bytes": len(AVATAR), "original_bytes": len(AVATAR)},
+        site + "img/logo.svg": {"file": logo, "bytes": len(LOGO), "original_bytes": len(LOGO)},
+    }
+
+
+def test_no_pillow_keeps_images_as_downloaded(monkeypatch):
+    monkeypatch.setattr(assets, "Image", None)
+    assert assets.optimize_image(HERO, "png", "webp", 80, 10) == (HERO, "png")
+
+
+def test_pillow_downscales_and_reencodes():
+    pytest.importorskip("PIL")
+    data, kind = assets.optimize_image(HERO, "png", "webp", 80, 10)
+    assert kind == "webp" and assets.sniff_image(data) == "webp"
+
+
+def test_sniff_image():
+    assert assets.sniff_image(HERO) == "png"
+    assert assets.sniff_image(LOGO) == "svg"
+    assert assets.sniff_image(b"not an image", "text/plain") is None
+
+
+def test_localize_after_a_slow_generation_still_downloads_new_images(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "Image", None)
+
+    async def run() -> dict:
+        async with aiohttp.ClientSession() as session:
+            stage = assets.AssetStage(site, session=session, fetch_timeout=5, budget=0.5)
+            stage.prefetch([site + "img/hero.png"])
+            await asyncio.sleep(0.8)   # the model takes longer than the whole prefetch budget
+            result = {"html": GENERATED_HTML, "css": GENERATED_CSS, "combined_html": GENERATED_HTML}
+            return await stage.localize(JobArtifacts(tmp_path / "job"), result)
+
+    localized = asyncio.run(run())
+    wide = digest_name(WIDE, "png")
+    # Not prefetched: the CSS background and the images only the generated page uses
+    assert localized["css"] == f'.banner {{ background: url("{wide}") no-repeat }} .x {{ color: red }}'
+    assert digest_name(AVATAR, "png") in localized["html"]
+    assert digest_name(HERO, "png") in localized["html"]
+
+
+def test_failed_prepare_cancels_the_prefetch(fake_scrape, monkeypatch):
+    import pipeline
+
+    stages = []
+
+    class RecordingStage(assets.AssetStage):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stages.append(self)
+
+    def broken_fingerprint(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(pipeline, "ASSETS_ENABLED", True)
+    monkeypatch.setattr(pipeline, "AssetStage", RecordingStage)
+    monkeypatch.setattr(pipeline, "page_fingerprint", broken_fingerprint)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await pipeline.prepare_prompt("https://example.invalid/")
+        tasks = list(stages[0]._downloads.values())
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return tasks
+
+    tasks = asyncio.run(run())
+    assert tasks and all(task.cancelled() for task in tasks)
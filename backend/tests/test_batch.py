@@ -0,0 +1,29 @@
+# backend/tests/test_batch.py
+
+import asyncio
+import json
+
+import pytest
+
+from batch import BATCH_MAX_CONCURRENCY, RESULTS_FILE, SUMMARY_FILE, Batch
+
+
+def test_batch_results_are_recorded_and_resumed(fake_scrape, tmp_path):
+    urls = ["https://a.example/", "https://b.example/"]
+
+    summary = asyncio.run(Batch(urls, tmp_path, concurrency=2).run())
+    assert (summary["succeeded"], summary["failed"], summary["skipped"]) == (2, 0, 0)
+    records = [json.loads(line) for line in (tmp_path / RESULTS_FILE).read_text().splitlines()]
+    assert sorted(r["url"] for r in records) == urls
+    assert json.loads((tmp_path / SUMMARY_FILE).read_text()) == summary
+
+    resumed = asyncio.run(Batch(urls, tmp_path).run())
+    assert (resumed["succeeded"], resumed["skipped"]) == (0, 2)
+    assert sorted(fake_scrape) == urls
+
+
+@pytest.mark.parametrize("field", ["concurrency", "browser_concurrency", "css_concurrency", "llm_concurrency"])
+@pytest.mark.parametrize("value", [0, -1, BATCH_MAX_CONCURRENCY + 1])
+def test_batch_concurrency_out_of_range_is_rejected(client, field, value):
+    response = client.post("/batch", json={"urls": ["https://example.com/"], field: value})
+    assert response.status_code == 422
@@ -0,0 +1,60 @@
+# backend/tests/test_browser_pool.py
+
+import asyncio
+
+from browser_pool import BrowserBackend, BrowserPool
+
+
+class FakeBrowser:
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+class SlowBackend(BrowserBackend):
+    name = "slow"
+
+    def __init__(self):
+        self.launched = 0
+
+    async def launch(self, playwright):
+        self.launched += 1
+        await asyncio.sleep(0.01)
+        return FakeBrowser()
+
+
+def test_concurrent_top_ups_never_launch_past_the_pool_size():
+    backend = SlowBackend()
+    pool = BrowserPool(backend, min_size=2, max_size=2)
+    pool._playwright = object()   # skip starting Playwright
+
+    async def run():
+        # Two start()s, a scheduled top-up and a borrower, all at once
+        pool._schedule_replenish()
+        borrowed, *_ = await asyncio.gather(pool.acquire(), pool.start(), pool.start(), pool._replenishing)
+        return borrowed
+
+    asyncio.run(run())
+    assert backend.launched == 2
+    assert pool.size == 2
+
+
+def test_unhealthy_releases_and_borrowers_stay_within_max_size():
+    backend = SlowBackend()
+    pool = BrowserPool(backend, min_size=2, max_size=2)
+    pool._playwright = object()
+
+    async def run():
+        await pool.start()
+        first, second = await asyncio.gather(pool.acquire(), pool.acquire())
+        # Both come back broken; their replacements race a new borrower
+        await asyncio.gather(pool.release(first, healthy=False), pool.release(second, healthy=False))
+        borrowed = await pool.acquire()
+        await asyncio.wait({pool._replenishing})
+        return borrowed
+
+    asyncio.run(run())
+    assert pool.size == 2
+    assert backend.launched == 4
@@ -0,0 +1,66 @@
+# backend/tests/test_fences.py
+
+import random
+
+import pytest
+
+from llm import FAKE_RESPONSE, FenceParser, extract_code
+
+# Well-formed replies (every fence but a trailing ```css is closed before
+# the next one opens); on those the two parsers must agree exactly
+REPLIES = [
+    FAKE_RESPONSE,
+    "```html <div>x</div>\n```\n```css .a { color: red }\n```",
+    "Here you go:\n\n```HTML\n<p>upper-case language</p>\n```\n\n```Css\np { margin: 0 }\n```\nDone.",
+    "```html\r\n<main>crlf</main>\r\n```\r\n```css\r\nmain { display: grid }\r\n```",
+    "```js\nconsole.log('ignored')\n```\n```html\n<p>after js</p>\n```\n```css\np{}\n```",
+    "```html\n<p>first</p>\n```\n```html\n<p>second</p>\n```\n```css\n.a{}\n```",
+    "Use `inline` code, then:\n```html\n<b>bold</b>\n```\n```css\nb { font-weight: 700 }",   # css never closed
+    "```html\n<p>no css at all</p>\n```",
+    "```html\n<p>html never closed</p>\n",
+    "```htmlx\n<p>not html</p>\n```\n```html5 <p>nor this</p>\n```",
+    "```html\n\n\n   <p>leading blank lines</p>   \n\n```",
+    "```html <section>one line</section>```\n```css\n.x{}\n```",
+    "no fences at all",
+    "",
+]
+
+
+def parse(chunks):
+    parser = FenceParser()
+    pieces = {"html": [], "css": []}
+    for chunk in chunks:
+        for lang, piece in parser.feed(chunk):
+            pieces[lang].append(piece)
+    for lang, piece in parser.close():
+        pieces[lang].append(piece)
+    return parser, pieces
+
+
+def random_split(text: str, rng: random.Random):
+    cuts = sorted(rng.sample(range(1, len(text)), k=min(len(text) - 1, rng.randint(0, 12)))) if len(text) > 1 else []
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("reply", REPLIES)
+def test_fence_parser_matches_extract_code_under_random_chunking(reply):
+    rng = random.Random(reply)
+    expected = {lang: extract_code(lang, reply) for lang in ("html", "css")}
+    for chunk_size in (1, 2, 3, 7, len(reply) or 1):
+        parser, _ = parse([reply[i:i + chunk_size] for i in range(0, len(reply), chunk_size)] or [""])
+        assert {lang: parser.result(lang) for lang in expected} == expected, chunk_size
+    for _ in range(200):
+        chunks = random_split(reply, rng)
+        parser, pieces = parse(chunks)
+        assert {lang: parser.result(lang) for lang in expected} == expected, chunks
+        # Streamed pieces add up to the result
+        for lang, result in expected.items():
+            if result:
+                assert "".join(pieces[lang]).strip() == result
+
+
+def test_rest_of_the_opening_line_is_body():
+    reply = "```html <div>x</div>\n```"
+    assert extract_code("html", reply) == "<div>x</div>"
+    parser, _ = parse([reply])
+    assert parser.result("html") == "<div>x</div>"
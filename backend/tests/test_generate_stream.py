@@ -0,0 +1,43 @@
+# backend/tests/test_generate_stream.py
+
+import json
+import os
+from typing import List, Tuple
+
+from jobs import get_job_manager
+
+
+def sse_events(text: str) -> List[Tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_runs_as_a_job_and_writes_artifacts(client):
+    response = client.post("/generate/stream", json={"url": "https://stream.example/", "bypass_cache": True})
+    assert response.status_code == 200
+    events = sse_events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "progress" and kinds[-1] == "done", events[-1]
+    assert "html" in kinds and "css" in kinds
+    assert set(events[-1][1]) == {"combined_html", "html", "css"}
+
+    job_dir = next(data["artifacts_dir"] for kind, data in events if kind == "progress" and data["artifacts_dir"])
+    assert os.path.exists(os.path.join(job_dir, "recreated_combined.html"))
+
+
+def test_stream_cache_hit_writes_artifacts_like_generate(client):
+    client.post("/generate", json={"url": "https://cached.example/"})
+    events = sse_events(client.post("/generate/stream", json={"url": "https://cached.example/"}).text)
+    assert events[-1][0] == "done"
+    assert not [kind for kind, _ in events if kind in ("html", "css")]   # nothing generated
+    job_dir = next(data["artifacts_dir"] for kind, data in events if kind == "progress" and data["artifacts_dir"])
+    assert os.path.exists(os.path.join(job_dir, "recreated_page.html"))
+
+
+def test_stream_is_rejected_when_the_job_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(get_job_manager(), "max_queue", 0)
+    response = client.post("/generate/stream", json={"url": "https://full.example/"})
+    assert response.status_code == 429
@@ -0,0 +1,21 @@
+# backend/tests/test_generation_cache.py
+
+import generation_cache
+from generation_cache import GenerationCache, page_fingerprint
+
+RESULT = {"combined_html": "<html></html>", "html": "<div></div>", "css": ""}
+
+
+def test_page_link_is_only_followed_under_the_same_prompt_config(tmp_path, monkeypatch):
+    cache = GenerationCache(tmp_path)
+    page_fp = page_fingerprint("<html><body>Page</body></html>", "body{}")
+    cache.put("prompt-fp", RESULT)
+    cache.link_page("https://a.example/", page_fp, "prompt-fp", "model-a")
+
+    assert cache.get_for_page("https://a.example/", page_fp, "model-a") == RESULT
+    assert cache.get_for_page("https://a.example/", page_fp, "model-b") is None
+
+    monkeypatch.setattr(generation_cache, "SYSTEM_PROMPT", "New instructions")
+    assert cache.get_for_page("https://a.example/", page_fp, "model-a") is None
+    monkeypatch.undo()
+    assert cache.get_for_page("https://a.example/", page_fp, "model-a") == RESULT
@@ -0,0 +1,92 @@
+# backend/tests/test_html_stream.py
+#
+# Streamed extraction (pages over STREAM_EXTRACT_THRESHOLD) against the
+# bs4 tree walk. Only the main content text (html_stream's own heuristic,
+# not trafilatura) and component detection may differ.
+
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.parity import PARITY_PAGES
+from components import image_components
+from conftest import PAGE_HTML
+from html_document import HTMLDocument
+from html_stream import MAIN_TEXT_MIN_WORDS
+from page_analysis import summarize_document
+from recreate_site import build_summary_and_minimal_html
+from summarize_utils import chunk_text
+
+CAPTURED = Path(__file__).resolve().parent.parent / "generated" / "context.json"
+PAGES = {**PARITY_PAGES, "test_page": PAGE_HTML}
+if CAPTURED.exists():
+    PAGES["captured"] = json.loads(CAPTURED.read_text())["html"]
+
+# Derived from the main text, not from the buckets
+MAIN_TEXT_KEYS = {"main_content_text", "main_content_chunks", "main_content_summaries"}
+
+
+def _both(html):
+    tree = HTMLDocument(html, streaming=False, parser="bs4")
+    stream = HTMLDocument(html, streaming=True)
+    return (tree, summarize_document(tree, summarize=False)), (stream, summarize_document(stream, summarize=False))
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_streamed_buckets_match_the_tree_walk(name):
+    (tree, expected), (stream, got) = _both(PAGES[name])
+
+    for key in expected.keys() - MAIN_TEXT_KEYS - {"components"}:
+        assert got[key] == expected[key], key
+    assert stream.used_selectors == tree.used_selectors
+    # Not detected, rather than detected as absent
+    assert got["components"] is None
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_streamed_main_text_stays_within_the_page_text(name):
+    (tree, expected), (_, got) = _both(PAGES[name])
+
+    page_words = set(tree.root.get_text(" ", strip=True).split())
+    text = got["main_content_text"] or ""
+    assert set(text.split()) <= page_words
+    assert all(len(line.split()) >= MAIN_TEXT_MIN_WORDS for line in text.splitlines())
+    assert got["main_content_chunks"] == (chunk_text(text, max_words=200) if text else [])
+    # Short lines (menus, labels) are dropped; any prose trafilatura finds means some text here
+    prose = [line for line in (expected["main_content_text"] or "").splitlines() if len(line.split()) >= MAIN_TEXT_MIN_WORDS]
+    assert bool(text) or not prose
+
+
+def test_streamed_pages_fall_back_to_image_rows_for_components():
+    html = PARITY_PAGES["cards_and_components"]
+    (_, tree_summary), (_, stream_summary) = _both(html)
+    logos = [c for c in tree_summary["components"] if c["type"] == "logos"]
+
+    summary, _ = build_summary_and_minimal_html({"title": "Cards", "images": ["/hero.png"], "summary": stream_summary})
+    assert summary["components"] == image_components(stream_summary["images_detailed"])
+    fallback = summary["components"]
+    assert [(c["container_tag"], c["count"]) for c in fallback] == [(c["container_tag"], c["count"]) for c in logos]
+    assert [i["img"] for i in fallback[0]["items"]] == [i["img"] for i in logos[0]["items"]]
+
+    # A tree-walked page with no components gets none invented
+    (_, plain), _ = _both(PARITY_PAGES["entities_and_comments"])
+    summary, _ = build_summary_and_minimal_html({"title": "Plain", "images": ["/hero.png"], "summary": plain})
+    assert "components" not in summary
+
+
+def test_comments_do_not_split_streamed_text():
+    html = "<html><body><p>Five words or more here, <!-- c --> and more after it.</p><img alt src=x></body></html>"
+    (_, expected), (_, got) = _both(html)
+    assert got["paragraphs"] == expected["paragraphs"] == ["Five words or more here,  and more after it."]
+    assert got["images_detailed"][0]["alt"] == ""
+    assert got["main_content_text"] == got["paragraphs"][0]
+
+
+def test_only_matching_end_tags_close_elements_past_the_depth_limit(monkeypatch):
+    import html_stream
+    monkeypatch.setattr(html_stream, "STREAM_MAX_DEPTH", 3)   # html, body, section
+    html = "<html><body><section><span>Deep <b>text</em> here</section><p>After the section ends, this paragraph starts.</p></body></html>"
+    (_, expected), (_, got) = _both(html)
+    assert got["section_headers"] == expected["section_headers"] == ["Deeptext here"]
+    assert got["paragraphs"] == expected["paragraphs"] == ["After the section ends, this paragraph starts."]
@@ -0,0 +1,27 @@
+# backend/tests/test_http_cache.py
+
+import pytest
+
+from http_cache import freshness_deadline
+
+NOW = 1_700_000_000.0   # Tue, 14 Nov 2023 22:13:20 GMT
+
+
+@pytest.mark.parametrize("expires", ["0", "-1", "soon", "", "Tue, 14 Nov 2023 23:13:20 -0000", "Tue, 14 Nov 2023 23:13:20"])
+def test_unparseable_or_zoneless_expires_is_stale(expires):
+    assert freshness_deadline({"Expires": expires}, NOW) == NOW
+
+
+def test_expires_is_read_against_the_server_date():
+    headers = {"Expires": "Tue, 14 Nov 2023 23:13:20 GMT"}
+    assert freshness_deadline(headers, NOW) == NOW + 3600
+    # Server clock an hour behind ours: still fresh for an hour
+    headers["Date"] = "Tue, 14 Nov 2023 21:13:20 GMT"
+    assert freshness_deadline(headers, NOW) == NOW + 2 * 3600
+    headers["Date"] = "Tue, 14 Nov 2023 22:13:20 GMT"
+    assert freshness_deadline(headers, NOW) == NOW + 3600
+
+
+def test_max_age_wins_over_expires():
+    headers = {"Cache-Control": "public, max-age=60", "Expires": "0"}
+    assert freshness_deadline(headers, NOW) == NOW + 60
@@ -0,0 +1,65 @@
+# backend/tests/test_interception.py
+
+import asyncio
+
+from interception import InterceptOptions, NetworkRecorder, is_tracker, site_of
+
+
+class FakeRequest:
+    def __init__(self, url: str, resource_type: str, navigation: bool = False):
+        self.url = url
+        self.resource_type = resource_type
+        self._navigation = navigation
+
+    def is_navigation_request(self) -> bool:
+        return self._navigation
+
+
+class FakeRoute:
+    def __init__(self, request: FakeRequest):
+        self.request = request
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = "continue"
+
+    async def abort(self):
+        self.outcome = "abort"
+
+    async def fulfill(self, status: int, body: str):
+        self.outcome = "stub"
+
+
+def route(recorder: NetworkRecorder, url: str, resource_type: str, navigation: bool = False) -> str:
+    fake = FakeRoute(FakeRequest(url, resource_type, navigation))
+    asyncio.run(recorder._route(fake))
+    return fake.outcome
+
+
+def test_company_sites_are_not_trackers():
+    for url in ("https://www.linkedin.com/", "https://sentry.io/welcome/",
+                "https://www.hubspot.com/products", "https://www.bing.com/", "https://segment.com/"):
+        assert not is_tracker(url), url
+
+
+def test_analytics_endpoints_are_trackers():
+    for url in ("https://www.google-analytics.com/g/collect", "https://bat.bing.com/bat.js",
+                "https://o1.ingest.sentry.io/api/1/envelope/", "https://js.hs-scripts.com/1.js",
+                "https://px.ads.linkedin.com/collect"):
+        assert is_tracker(url), url
+
+
+def test_registrable_domain():
+    assert site_of("https://www.shop.example.co.uk/x") == "example.co.uk"
+    assert site_of("https://px.ads.linkedin.com/collect") == "linkedin.com"
+    assert not is_tracker("https://px.ads.linkedin.com/collect", site="linkedin.com")
+
+
+def test_navigation_is_never_blocked():
+    recorder = NetworkRecorder(InterceptOptions(block_types=frozenset({"document", "font"}), block_trackers=True))
+    assert route(recorder, "https://bat.bing.com/", "document", navigation=True) == "continue"
+    assert route(recorder, "https://www.google-analytics.com/frame", "document") == "continue"
+    assert route(recorder, "https://bat.bing.com/bat.js", "script") == "stub"
+    assert route(recorder, "https://bat.bing.com/pixel.gif", "image") == "abort"
+    assert route(recorder, "https://example.com/a.woff2", "font") == "abort"
+    assert recorder.blocked == 3
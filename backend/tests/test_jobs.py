@@ -0,0 +1,69 @@
+# backend/tests/test_jobs.py
+
+import asyncio
+
+import pytest
+
+from jobs import TERMINAL, Job, JobManager, QueueFull
+
+
+def test_events_deliver_the_terminal_snapshot_when_the_job_ends_between_events():
+    async def run():
+        job = Job("https://example.com/", bypass_cache=False)
+        job.status = "running"
+        events = job.events()
+        assert (await events.__anext__())["status"] == "running"
+
+        # Both changes land while the consumer is busy with the previous event
+        job.set_stage("done")
+        job._finish("succeeded", result={"html": "<p>x</p>", "css": "", "combined_html": "<p>x</p>"})
+
+        received = [snapshot async for snapshot in events]
+        return received
+
+    received = asyncio.run(run())
+    assert [s["stage"] for s in received] == ["done", "done"]
+    assert received[-1]["status"] == "succeeded"
+    assert received[-1]["result"]["html"] == "<p>x</p>"
+
+
+def test_events_of_a_finished_job_end_after_one_snapshot():
+    async def run():
+        job = Job("https://example.com/", bypass_cache=False)
+        job._finish("failed", error="boom", status_code=502)
+        return [snapshot async for snapshot in job.events()]
+
+    received = asyncio.run(run())
+    assert len(received) == 1
+    assert received[0]["status"] in TERMINAL
+
+
+def test_joining_a_running_job_replays_the_chunks_written_so_far():
+    async def run():
+        job = Job("https://example.com/", bypass_cache=False)
+        job.status = "running"
+        job.publish_chunk("html", "<div>")
+        events = job.stream_events()
+        received = [await events.__anext__() for _ in range(2)]
+        job.publish_chunk("css", "p{}")
+        received.append(await events.__anext__())
+        await events.aclose()
+        return received
+
+    received = asyncio.run(run())
+    assert [event for event, _ in received] == ["progress", "html", "css"]
+    assert [data["chunk"] for _, data in received[1:]] == ["<div>", "p{}"]
+
+
+def test_jobs_cancelled_while_queued_free_their_queue_slot():
+    async def run():
+        manager = JobManager(workers=0, max_queue=1)
+        job, _ = manager.submit("https://a.example/")
+        with pytest.raises(QueueFull):
+            manager.submit("https://b.example/")
+        manager.cancel(job.id)
+        assert manager.queue_depth == 0
+        manager.submit("https://b.example/")
+        assert manager.queue_depth == 1
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+# backend/tests/test_output.py
+
+import json
+
+import output
+from output import render_output
+
+HTML = """<html>
+  <head><title>Card</title></head>
+  <body>
+    <!-- generated -->
+    <div class="card">
+      <h1>Title</h1>
+      <pre>  keep   this  </pre>
+    </div>
+  </body>
+</html>"""
+
+CSS = """/* card styles */
+.card {
+    color: red;
+    padding: 4px 8px;
+}
+
+.unused {
+    color: blue;
+}
+"""
+
+
+def test_every_field_of_the_full_shape_is_minified():
+    result, _ = render_output(HTML, CSS)
+
+    assert result["css"] == ".card{color:red;padding:4px 8px}"
+    assert "<!--" not in result["html"] and "\n  <div" not in result["html"]
+    assert "<pre>  keep   this  </pre>" in result["html"]
+    # The preview page is built from the same minified parts, not minified separately
+    assert f"<style>{result['css']}</style>" in result["combined_html"]
+    assert result["combined_html"].count("<h1>Title</h1>") == 1
+
+    body = json.dumps(result)
+    assert len(body) < len(json.dumps({"combined_html": result["combined_html"], "html": HTML, "css": CSS}))
+
+
+def test_parts_are_kept_as_written_without_minify(monkeypatch):
+    monkeypatch.setattr(output, "OUTPUT_MINIFY", False)
+    monkeypatch.setattr(output, "OUTPUT_PRUNE_CSS", False)
+
+    result, _ = render_output(HTML, CSS)
+
+    assert result["html"] == HTML
+    assert result["css"] == CSS
+
+
+def test_minify_keeps_attribute_values_and_raw_elements_as_written():
+    html = (
+        '<div  title="two  spaces\n and a break"\n     data-x=\'a   b\'>\n  <p>Some    text</p>\n'
+        '  <textarea>  typed\n\n   text </textarea>\n  <img alt="a  >  b"  src="x.png">\n'
+        '  <script>if (a < b) { x  =  "</div>"; }</script>\n  <!--[if IE]><p>old</p><![endif]-->\n</div>'
+    )
+    minified = output.minify_html(html)
+
+    assert '<div title="two  spaces\n and a break" data-x=\'a   b\'>' in minified
+    assert "<p>Some text</p>" in minified
+    assert "<textarea>  typed\n\n   text </textarea>" in minified
+    assert '<img alt="a  >  b" src="x.png">' in minified
+    assert '<script>if (a < b) { x  =  "</div>"; }</script>' in minified
+    assert "<!--[if IE]>" in minified
@@ -0,0 +1,41 @@
+# backend/tests/test_parsers.py
+#
+# Every installed HTML parser backend against the bs4 reference
+# (benchmarks.parity under pytest). Backends that are not installed
+# (the `fast-html` extra) are skipped.
+
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import CAPTURED_CONTEXT, Sample, captured_sample, synthetic_sample
+from benchmarks.parity import PARITY_PAGES, REFERENCE, compare
+from html_document import HTMLDocument, clear_document_cache, get_document
+from html_parsers import available_parsers, get_parser
+
+SAMPLES = [Sample(name, html, "") for name, html in PARITY_PAGES.items()] + [synthetic_sample(20, 0)]
+if CAPTURED_CONTEXT.exists():
+    SAMPLES.append(captured_sample())
+
+
+@pytest.mark.parametrize("backend", ["lxml", "selectolax"])
+@pytest.mark.parametrize("sample", SAMPLES, ids=lambda s: s.name)
+def test_backend_matches_the_reference(backend, sample):
+    if backend not in available_parsers():
+        pytest.skip(f"{backend} is not installed")
+    assert compare(sample, backend) == []
+
+
+def test_reference_extracts_from_the_soup_itself():
+    root = get_parser(REFERENCE).parse(PARITY_PAGES["cards_and_components"])
+    assert isinstance(root, BeautifulSoup)   # no second tree built from it
+    summary = HTMLDocument(PARITY_PAGES["cards_and_components"], streaming=False, parser=REFERENCE).buckets
+    assert [c["type"] for c in summary.components] == ["pricing", "logos"]
+
+
+def test_get_document_keeps_only_the_latest_page():
+    first, second = PARITY_PAGES["cards_and_components"], PARITY_PAGES["entities_and_comments"]
+    doc = get_document(first)
+    assert get_document(first[:-1] + first[-1]) is doc   # equal text, another string object
+    assert get_document(second) is not doc
+    assert get_document(first) is not doc           # evicted by the second page
+    clear_document_cache()
@@ -0,0 +1,79 @@
+# backend/tests/test_prompt_cache.py
+
+import asyncio
+import json
+
+import pytest
+
+import llm
+from prompt_builder import SYSTEM_PROMPT
+from recreate_site import format_prompt
+
+SITES = [
+    ({"title": "Bakery", "headings": ["Fresh bread daily"], "paragraphs": ["Sourdough and rye."]},
+     "<header><h1>Bakery</h1></header>", ".hero { color: brown }"),
+    ({"title": "Law firm", "headings": ["Counsel you can trust"], "paragraphs": ["Since 1950."]},
+     "<header><h1>Law firm</h1></header><section class='team'></section>", ".team { display: grid }"),
+]
+
+
+@pytest.fixture
+def fake():
+    client = llm.FakeAnthropic()
+    llm.set_client(client)
+    yield client
+    llm.set_client(None)
+
+
+def test_system_prefix_is_byte_stable_across_sites(fake):
+    usages = []
+    record = fake.record
+    fake.record = lambda request: usages.append(record(request)) or usages[-1]   # usage as reported
+    prompts = [format_prompt(html, summary, css) for summary, html, css in SITES]
+    assert prompts[0] != prompts[1]
+
+    async def run():
+        for prompt in prompts:
+            await llm.generate(prompt)
+
+    asyncio.run(run())
+    assert len(fake.requests) == 2
+    assert len(fake.prefixes) == 1
+    assert usages[0]["cache_creation_input_tokens"] > 0 and usages[0]["cache_read_input_tokens"] == 0
+    assert usages[1]["cache_read_input_tokens"] > 0
+    # Only the static instructions are in the prefix, none of the per-site prompt
+    assert json.loads(fake.prefixes[0]) == [
+        {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}},
+    ]
+
+
+def test_build_request_marks_the_system_block_cacheable():
+    request = llm.build_request("per-site prompt")
+    assert request["system"] == [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    assert request["messages"] == [{"role": "user", "content": "per-site prompt"}]
+
+
+def test_build_request_without_prompt_caching(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PROMPT_CACHE", False)
+    request = llm.build_request("per-site prompt")
+    assert "cache_control" not in request["system"][0]
+
+
+def test_the_fake_never_caches_a_prefix_below_the_model_minimum(fake):
+    short = {"type": "text", "text": "Recreate the page.", "cache_control": {"type": "ephemeral"}}
+    request = {"model": llm.LLM_MODEL, "system": [short], "messages": [{"role": "user", "content": "x"}]}
+    usages = [fake.record(request) for _ in range(2)]
+    assert all(u["cache_read_input_tokens"] == 0 and u["cache_creation_input_tokens"] == 0 for u in usages)
+    assert fake.prefixes == []
+
+
+def test_system_prompt_reaches_the_minimum_cacheable_length():
+    assert llm.is_cacheable(SYSTEM_PROMPT, llm.LLM_MODEL)
+    # Counted at the conservative rate, with room for edits
+    assert len(SYSTEM_PROMPT) / llm.CACHE_CHARS_PER_TOKEN >= 1.1 * llm.cache_min_tokens(llm.LLM_MODEL)
+
+
+def test_build_request_leaves_short_prefixes_unmarked(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MODEL", "claude-3-5-haiku-20241022")   # 2048-token minimum
+    assert "cache_control" not in llm.build_request("per-site prompt")["system"][0]
+    assert "cache_control" not in llm.build_request("p", system="Short instructions.")["system"][0]
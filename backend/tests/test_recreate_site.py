@@ -0,0 +1,33 @@
+# backend/tests/test_recreate_site.py
+
+import asyncio
+
+import pytest
+
+import recreate_site
+from artifacts import SUFFIXES, get_artifact_store
+
+
+@pytest.fixture
+def cli(fake_scrape, monkeypatch):
+    """recreate_site.main with the conftest page instead of a browser."""
+    import pipeline
+    monkeypatch.setattr(recreate_site, "scrape_website", pipeline.scrape_website)
+    return recreate_site.main
+
+
+def test_cli_writes_a_compressed_context_per_run(cli):
+    store = get_artifact_store()
+    before = set(store.root.iterdir()) if store.root.exists() else set()
+
+    asyncio.run(cli("https://a.example/"))
+    asyncio.run(cli("https://b.example/"))
+
+    runs = sorted(set(store.root.iterdir()) - before, key=lambda p: p.stat().st_mtime)
+    assert len(runs) == 2
+    for run, url in zip(runs, ["https://a.example/", "https://b.example/"]):
+        written = {p.name for p in run.iterdir()}
+        assert f"context.json{SUFFIXES[store.codec]}" in written
+        assert {"recreated_page.html", "styles.css"} <= written
+        artifacts = asyncio.run(store.open(run.name))
+        assert artifacts.read_json("context.json")["url"] == url
@@ -0,0 +1,32 @@
+# backend/tests/test_screenshots.py
+
+import io
+
+import pytest
+
+from screenshots import ScreenshotOptions, encode
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(width, height):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["png", "jpeg", "webp"])
+def test_tall_pages_are_scaled_down_not_cropped(fmt):
+    options = ScreenshotOptions(mode="full", format=fmt, max_dimension=1000)
+
+    data, scale = encode(_png(800, 4000), options)
+
+    assert scale == 0.25
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.size == (200, 1000)
+        assert image.format == {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}[fmt]
+
+
+def test_shots_within_the_limit_are_kept_as_captured():
+    raw = _png(800, 600)
+    assert encode(raw, ScreenshotOptions(mode="full", format="png", max_dimension=1000)) == (raw, 1.0)
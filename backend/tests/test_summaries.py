@@ -0,0 +1,51 @@
+# backend/tests/test_summaries.py
+
+import asyncio
+
+from conftest import PAGE_HTML
+from cpu_pool import CPUPool
+from page_analysis import add_summaries, extract_page
+from summarize_utils import summarize_chunks, summary_cache
+
+TEXT_PAGE = (
+    "<html><body><article><h1>Shipping notes</h1>"
+    "<p>Orders placed before noon leave the warehouse the same day. Orders placed later leave the next morning.</p>"
+    "<p>Every parcel is tracked from the warehouse to the door, and tracking links are sent by email.</p>"
+    "</article></body></html>"
+)
+
+
+def test_pages_parsed_in_worker_processes_are_summarized_through_the_parent_memo():
+    summary_cache.clear()
+    before = summary_cache.stats()
+
+    async def run():
+        pool = CPUPool(workers=1)
+        try:
+            return [await pool.run(extract_page, TEXT_PAGE) for _ in range(2)]
+        finally:
+            pool.close()
+
+    pages = asyncio.run(run())
+    # The workers only chunk; nothing was summarized on either side yet
+    assert summary_cache.stats() == before
+    assert all(summary["main_content_chunks"] and summary["main_content_summaries"] == [] for summary, _ in pages)
+
+    first, second = (add_summaries(summary) for summary, _ in pages)
+    chunks = first["main_content_chunks"]
+    after = summary_cache.stats()
+    assert after["misses"] - before["misses"] == len(chunks)
+    assert after["hits"] - before["hits"] == len(chunks)
+    assert first["main_content_summaries"] == second["main_content_summaries"] == summarize_chunks(chunks)
+
+
+def test_health_reports_the_summaries_of_scraped_pages(client):
+    summary_cache.clear()
+    before = client.get("/health").json()["summaries"]
+
+    for _ in range(2):
+        add_summaries(extract_page(PAGE_HTML)[0])
+
+    summaries = client.get("/health").json()["summaries"]
+    assert summaries["hits"] > before["hits"]
+    assert summaries["entries"] >= 1